@@ -1,92 +1,319 @@
 # Importing the necessary modules
 # --------------------------------
 
-from extract.spotify_extract import extracting_spotify_data
-from extract.grammys_extract import extracting_grammys_data
+from extract.spotify_extract import extracting_spotify_data, streaming_spotify_data
+from extract.grammys_extract import extracting_grammys_data, reading_grammys_watermark
 
-from transform.spotify_transform import transforming_spotify_data
+from transform import spotify_transform, grammys_transform, lookups
+from transform.spotify_transform import transforming_spotify_data, transforming_spotify_chunks
 from transform.grammys_transform import transforming_grammys_data
-from transform.merge import merging_datasets
+from transform.merge import merging_datasets, fuzzy_merge
+from transform.compact import compact_frame
+from transform.grammys_pushdown import transforming_grammys_in_database
+from transform.out_of_core import transforming_spotify_out_of_core, transforming_grammys_out_of_core, merging_datasets_out_of_core
+from transform.transform_cache import TransformCache, cached_transform, fingerprinting_file, fingerprinting_table, fingerprinting_code
 
-from load_and_store.load import loading_merged_data
-from load_and_store.store import storing_merged_data
+from database.db_operations import creating_engine
+from database.pipeline_state import reading_watermark, writing_watermark
+
+from load_and_store.sinks import get_sink
+
+from artifacts.artifact_store import writing_artifact, reading_artifact, referencing_artifact, run_directory, removing_run_artifacts, pruning_artifacts
+
+from validation.data_quality import ValidationError, compacting_and_validating as compact_and_validate
 
 import os
-import json
-import pandas as pd
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
 
+# Cleaning the Grammys data inside PostgreSQL instead of in the transform task
+grammys_pushdown = os.getenv("GRAMMYS_PUSHDOWN", "false").lower() == "true"
+
+# Execution backend of the transform and merge tasks: "pandas" (in memory) or "duckdb" (out of core over Parquet)
+transform_backend = os.getenv("TRANSFORM_BACKEND", "pandas").lower()
+
+# The duckdb backend scans the extracted artifacts, so they are always written as Parquet
+raw_format = "parquet" if transform_backend == "duckdb" else None
+
+# Processing only the Grammy rows added or updated since the last run, from the watermarks of the pipeline state table
+pipeline_watermarks = os.getenv("PIPELINE_WATERMARKS", "false").lower() == "true"
+
+spotify_path = "./data/spotify_dataset.csv"
+
+# Streaming the Spotify file in chunks of this many rows, each one reduced as it is read, 0 reads the file whole
+spotify_chunksize = int(os.getenv("SPOTIFY_CHUNKSIZE", "0"))
+
+# Targets of the merged data (see load_and_store.sinks), each one written by its own parallel task
+pipeline_sinks = [name.strip() for name in os.getenv("PIPELINE_SINKS", "database,drive").split(",") if name.strip()]
+
 # Creating tasks functions
 # ------------------------
+# The DataFrames are handed over between tasks as columnar artifacts of the run.
+# Only the artifact reference (path, format and schema fingerprint) goes through XCom.
+# The extract tasks add the fingerprint of their source to the reference, so the transform
+# tasks can reuse the cached result when neither the source nor the transform code changed.
+# Every DataFrame is compacted (smaller numeric dtypes, categories, booleans) before it is written.
+# With the duckdb backend the transform and merge tasks read and write the Parquet artifacts
+# with DuckDB (see transform.out_of_core), so the data never has to fit in the worker memory.
+# With watermarks, a run where the Spotify file did not change only extracts the new Grammy rows:
+# the clean Spotify data comes from the transform cache, the new nominations are merged with it,
+# and the sinks apply just those rows. The watermarks are stored once every sink succeeded.
+# Every in-memory DataFrame is validated before it is handed over (see validation.data_quality):
+# a broken rule, or a stage that returned no data, raises ValidationError and fails the task
+# right away. The out-of-core artifacts of the duckdb backend are not loaded, so they are not validated.
 
-def extract_spotify():
+def plan_run():
     try:
-        df = extracting_spotify_data("./data/spotify_dataset.csv") 
-        return df.to_json(orient="records")
+        if not pipeline_watermarks:
+            return {"incremental": False}
+        
+        engine = creating_engine()
+        watermarks = {
+            "spotify": {"fingerprint": fingerprinting_file(spotify_path)},
+            "grammys": reading_grammys_watermark(engine)
+        }
+        
+        grammys_state = reading_watermark(engine, "grammys")
+        incremental = (reading_watermark(engine, "spotify") == watermarks["spotify"]
+                       and grammys_state is not None
+                       and transform_backend == "pandas"
+                       and not grammys_pushdown)
+        
+        logging.info(f"{'Incremental' if incremental else 'Full'} run planned, Grammys watermark {grammys_state} -> {watermarks['grammys']}.")
+        
+        return {"incremental": incremental, "since": grammys_state if incremental else None, "watermarks": watermarks}
     except Exception as e:
-        logging.error(f"Error extracting data: {e}")
+        logging.error(f"Error planning the run: {e}")
+
+def transform_out_of_core(function, name, run_id, *sources):
+    """
+    Runs an out-of-core transform over the Parquet artifacts of the sources and returns the reference of its output.
+
+    """
+    destination = os.path.join(run_directory(run_id), f"{name}.parquet")
+
+    if function(*[source["path"] for source in sources], destination) is None:
+        return None
 
-def extract_grammys():
+    return referencing_artifact(destination, name)
+
+def extract_spotify(run_id, plan=None):
     try:
-        df = extracting_grammys_data()
-        return df.to_json(orient="records")
+        plan = plan or {}
+        
+        # The file did not change since the last run, so the transform reads its cached result
+        if plan.get("incremental"):
+            return {"name": "spotify_raw", "source_fingerprint": plan["watermarks"]["spotify"]["fingerprint"]}
+        
+        source_fingerprint = plan["watermarks"]["spotify"]["fingerprint"] if "watermarks" in plan else fingerprinting_file(spotify_path)
+        
+        # The raw file never sits whole in memory, so the chunks are transformed as they are read
+        if spotify_chunksize and transform_backend != "duckdb":
+            df = transforming_spotify_chunks(streaming_spotify_data(spotify_path, spotify_chunksize))
+            df = compact_and_validate(df, "spotify_clean")
+            
+            ref = writing_artifact(df, "spotify_clean", run_id)
+            ref["transformed"] = True
+            ref["source_fingerprint"] = source_fingerprint
+            
+            return ref
+        
+        df = compact_and_validate(extracting_spotify_data(spotify_path), "spotify_raw")
+        
+        ref = writing_artifact(df, "spotify_raw", run_id, fmt=raw_format)
+        ref["source_fingerprint"] = source_fingerprint
+        
+        return ref
+    except ValidationError:
+        raise
     except Exception as e:
         logging.error(f"Error extracting data: {e}")
+
+def extract_grammys(run_id, plan=None):
+    try:
+        plan = plan or {}
         
-def transform_spotify(df):
+        if plan.get("incremental"):
+            since = plan["since"]
+            df = extracting_grammys_data(watermark=since["year"], updated_after=since["updated_at"], until=plan["watermarks"]["grammys"])
+            df = compact_and_validate(df, "grammys_delta", exclude=["artist"])
+            
+            ref = writing_artifact(df, "grammys_delta", run_id, fmt=raw_format)
+            ref["delta"] = True
+            
+            return ref
+        
+        if grammys_pushdown:
+            df = compact_and_validate(transforming_grammys_in_database(), "grammys_clean")
+            
+            ref = writing_artifact(df, "grammys_clean", run_id, fmt=raw_format)
+            ref["transformed"] = True
+            
+            return ref
+        
+        # The artist column is filled and rewritten row by row in the transform
+        df = compact_and_validate(extracting_grammys_data(), "grammys_raw", exclude=["artist"])
+        
+        ref = writing_artifact(df, "grammys_raw", run_id, fmt=raw_format)
+        ref["source_fingerprint"] = fingerprinting_table(creating_engine(), "grammy_awards_raw")
+        
+        return ref
+    except ValidationError:
+        raise
+    except Exception as e:
+        logging.error(f"Error extracting data: {e}")
+
+def transform_spotify(ref, run_id):
     try:
-        json_df = json.loads(df)
+        # Already transformed while the file was streamed
+        if ref.get("transformed"):
+            return ref
         
-        raw_df = pd.DataFrame(json_df)
-        df = transforming_spotify_data(raw_df)
+        if transform_backend == "duckdb":
+            return transform_out_of_core(transforming_spotify_out_of_core, "spotify_clean", run_id, ref)
         
-        return df.to_json(orient="records")
+        df = cached_transform(
+            TransformCache(),
+            transforming_spotify_data,
+            lambda: reading_artifact(ref) if "path" in ref else compact_frame(extracting_spotify_data(spotify_path), name="spotify_raw"),
+            ref["source_fingerprint"],
+            fingerprinting_code(spotify_transform, lookups)
+        )
+        df = compact_and_validate(df, "spotify_clean")
+
+        return writing_artifact(df, "spotify_clean", run_id)
+    except ValidationError:
+        raise
     except Exception as e:
         logging.error(f"Error transforming data: {e}")
-        
-def transform_grammys(df):
+
+def transform_grammys(ref, run_id):
     try:
-        json_df = json.loads(df)
+        # Already cleaned by the SQL pushdown
+        if ref.get("transformed"):
+            return ref
         
-        raw_df = pd.DataFrame(json_df)
-        df = transforming_grammys_data(raw_df)
+        if transform_backend == "duckdb":
+            return transform_out_of_core(transforming_grammys_out_of_core, "grammys_clean", run_id, ref)
         
-        return df.to_json(orient="records")
+        # The new nominations are few, so they skip the transform cache
+        if ref.get("delta"):
+            if ref["rows"] == 0:
+                return ref
+            
+            df = compact_and_validate(transforming_grammys_data(reading_artifact(ref)), "grammys_clean")
+            
+            ref = writing_artifact(df, "grammys_clean", run_id)
+            ref["delta"] = True
+            
+            return ref
+        
+        df = cached_transform(
+            TransformCache(),
+            transforming_grammys_data,
+            lambda: reading_artifact(ref),
+            ref["source_fingerprint"],
+            fingerprinting_code(grammys_transform, lookups)
+        )
+        df = compact_and_validate(df, "grammys_clean")
+
+        return writing_artifact(df, "grammys_clean", run_id)
+    except ValidationError:
+        raise
     except Exception as e:
         logging.error(f"Error transforming data: {e}")
-        
-def merge_data(spotify_df, grammys_df):
+
+def merge_data(spotify_ref, grammys_ref, run_id):
     try:
-        spotify_json = json.loads(spotify_df)
-        grammys_json = json.loads(grammys_df)
-        
-        spotify_df = pd.DataFrame(spotify_json)
-        grammys_df = pd.DataFrame(grammys_json)
+        if transform_backend == "duckdb":
+            if fuzzy_merge:
+                logging.info("The duckdb backend merges on the exact titles only, FUZZY_MATCHING needs the pandas backend.")
+            
+            return transform_out_of_core(merging_datasets_out_of_core, "merged_data", run_id, spotify_ref, grammys_ref)
         
-        df = merging_datasets(spotify_df, grammys_df)
+        if grammys_ref.get("delta"):
+            if grammys_ref["rows"] == 0:
+                logging.info("No new Grammy nominations since the last run.")
+                return {"name": "merged_data", "rows": 0, "delta": True}
+            
+            grammys_df = reading_artifact(grammys_ref)
+            df = merging_datasets(reading_artifact(spotify_ref), grammys_df, how="inner")
+            
+            ref = writing_artifact(compact_and_validate(df, "merged_data"), "merged_data", run_id)
+            ref["delta"] = True
+            # The events are pulled whole, so the sinks replace all of their rows, matched or not
+            ref["events"] = sorted(grammys_df["title"].dropna().astype(str).unique().tolist())
+            
+            return ref
         
-        return df.to_json(orient="records")
+        spotify_df = reading_artifact(spotify_ref)
+        grammys_df = reading_artifact(grammys_ref)
+
+        df = compact_and_validate(merging_datasets(spotify_df, grammys_df), "merged_data")
+
+        return writing_artifact(df, "merged_data", run_id)
+    except ValidationError:
+        raise
     except Exception as e:
         logging.error(f"Error merging data: {e}")
+
+def sink_data(ref, sink_name, run_id=None):
+    # A failed sink fails its task, so the watermarks are not committed and the artifacts are kept
+    try:
+        if ref.get("delta"):
+            if ref["rows"] == 0 and not ref.get("events"):
+                return {"sink": sink_name, "rows": 0, "result": "unchanged"}
+            
+            result = get_sink(sink_name).write_delta(reading_artifact(ref), run_id, ref.get("events"))
+        else:
+            result = get_sink(sink_name).write(reading_artifact(ref))
         
-def load_data(df):
+        # The load functions log their errors and return no result
+        if result is None:
+            raise RuntimeError(f"The {sink_name} sink returned no result, check the log above.")
+
+        return {"sink": sink_name, "rows": ref["rows"], "result": result}
+    except Exception as e:
+        logging.error(f"Error writing data to the {sink_name} sink: {e}")
+        raise
+
+def failing_sinks(sink_results):
+    """
+    Returns the results of the sinks that failed. The sink tasks raise on failure, so in the DAG the tasks
+    downstream of a failed sink do not run, and this only guards the callers that collect the results themselves.
+    
+    """
+    return [result for result in sink_results if result is None or result["result"] is None]
+
+def commit_state(plan, sink_results):
     try:
-        json_df = json.loads(df)
+        if not plan or "watermarks" not in plan:
+            return None
         
-        df = pd.DataFrame(json_df)
-        loading_merged_data(df, "merged_data")
+        # A failed sink keeps the previous watermarks, so the next run processes the same rows again
+        failed = failing_sinks(sink_results)
+        if failed:
+            logging.error(f"{len(failed)} sinks failed, the watermarks are not updated.")
+            return None
         
-        return df.to_json(orient="records")
-    except Exception as e:
-        logging.error(f"Error loading data: {e}")
+        engine = creating_engine()
+        for source, watermark in plan["watermarks"].items():
+            writing_watermark(engine, source, watermark)
         
-def store_data(df):
+        return plan["watermarks"]
+    except Exception as e:
+        logging.error(f"Error storing the pipeline state: {e}")
+
+def clean_artifacts(run_id, sink_results):
     try:
-        json_df = json.loads(df)
+        # The artifacts of a run with a failed sink are kept, so its tasks can be cleared and run again
+        failed = failing_sinks(sink_results)
+        if failed:
+            logging.error(f"{len(failed)} sinks failed, the artifacts of run {run_id} are kept.")
+        else:
+            removing_run_artifacts(run_id)
         
-        df = pd.DataFrame(json_df)
-        storing_merged_data("merged_data", df)
+        return {"removed": not failed, "pruned": pruning_artifacts()}
     except Exception as e:
-        logging.error(f"Error storing data: {e}")
\ No newline at end of file
+        logging.error(f"Error removing the artifacts of run {run_id}: {e}")
@@ -32,49 +32,66 @@ default_args = {
 def workshop2_dag():
     """
     This DAG is going to execute the ETL pipeline for the Global Terrorism Analysis project.
+    The tasks exchange references to columnar artifacts of the run (see artifacts.artifact_store),
+    the run_id is received from the Airflow context.
     
     """
     
+    @task
+    def run_planning():
+        return plan_run()
+    
+    plan = run_planning()
+    
     @task 
-    def spotify_extraction():
-        return extract_spotify()
+    def spotify_extraction(plan, run_id=None):
+        return extract_spotify(run_id, plan)
     
-    spotify_raw_data = spotify_extraction()
+    spotify_raw_data = spotify_extraction(plan)
         
     @task
-    def grammys_extraction():
-        return extract_grammys()
+    def grammys_extraction(plan, run_id=None):
+        return extract_grammys(run_id, plan)
     
-    grammys_raw_data = grammys_extraction()
+    grammys_raw_data = grammys_extraction(plan)
     
     @task
-    def spotify_transformation(raw_df):
-        return transform_spotify(raw_df)
+    def spotify_transformation(raw_df, run_id=None):
+        return transform_spotify(raw_df, run_id)
     
     spotify_data = spotify_transformation(spotify_raw_data)
     
     @task
-    def grammys_transformation(raw_df):
-        return transform_grammys(raw_df)
+    def grammys_transformation(raw_df, run_id=None):
+        return transform_grammys(raw_df, run_id)
     
     grammys_data = grammys_transformation(grammys_raw_data)
     
     @task
-    def data_merging(spotify_df, grammys_df):
-        return merge_data(spotify_df, grammys_df)
+    def data_merging(spotify_df, grammys_df, run_id=None):
+        return merge_data(spotify_df, grammys_df, run_id)
     
     df = data_merging(spotify_data, grammys_data)
     
+    # Every sink consumes the merged artifact directly, so the load and the upload run in parallel
+    @task
+    def data_sinking(df, sink_name, run_id=None):
+        return sink_data(df, sink_name, run_id)
+    
+    sink_results = [data_sinking.override(task_id=f"data_sinking_{sink_name}")(df, sink_name) for sink_name in pipeline_sinks]
+    
+    # The watermarks move forward only after every sink wrote the data of the run
     @task
-    def data_loading(df):
-        return load_data(df)
+    def state_committing(plan, sink_results):
+        return commit_state(plan, sink_results)
     
-    data_load = data_loading(df)
+    committed_state = state_committing(plan, sink_results)
     
+    # The artifacts of the run are removed last, and those of the failed runs once they are ARTIFACTS_RETENTION_DAYS old
     @task
-    def data_storing(df):
-        return store_data(df)
+    def artifacts_cleaning(sink_results, run_id=None):
+        return clean_artifacts(run_id, sink_results)
     
-    data_store = data_storing(data_load)
+    committed_state >> artifacts_cleaning(sink_results)
     
 workshop2_dag = workshop2_dag()
\ No newline at end of file
@@ -0,0 +1,199 @@
+from dotenv import load_dotenv
+from monitoring.profiling import recording_bytes
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Reading the environment variables
+load_dotenv("./env/.env")
+
+artifacts_path = os.getenv("ARTIFACTS_PATH", "./data/artifacts")
+artifacts_format = os.getenv("ARTIFACTS_FORMAT", "arrow")
+
+# Days the artifacts of a run that failed before removing them are kept
+artifacts_retention_days = float(os.getenv("ARTIFACTS_RETENTION_DAYS", "7"))
+
+## ----- Functions ----- ##
+
+def fingerprinting_schema(df):
+    """
+    Returns a short hash of the column names and dtypes of a DataFrame.
+
+    """
+    signature = "|".join(f"{name}:{dtype}" for name, dtype in df.dtypes.items())
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()[:16]
+
+def naming_run(run_id):
+    """
+    Returns the run_id with only the characters that are safe in a file name.
+
+    """
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(run_id))
+
+def run_directory(run_id, root=None):
+    """
+    Returns the directory where the artifacts of a pipeline run are written.
+
+    """
+    return os.path.join(root or artifacts_path, naming_run(run_id))
+
+## ----- Artifact stores ----- ##
+
+class ParquetArtifactStore:
+    """
+    Stores artifacts as Parquet files. Smaller on disk, read back memory-mapped.
+
+    """
+    extension = "parquet"
+
+    def write_table(self, table, path):
+        pq.write_table(table, path)
+
+    def read_table(self, path):
+        return pq.read_table(path, memory_map=True)
+
+class ArrowArtifactStore:
+    """
+    Stores artifacts as Arrow IPC files. Read back zero-copy from a memory map.
+
+    """
+    extension = "arrow"
+
+    def write_table(self, table, path):
+        with pa.OSFile(path, "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def read_table(self, path):
+        with pa.memory_map(path, "r") as source:
+            return ipc.open_file(source).read_all()
+
+# New formats are plugged in by adding a class with write_table/read_table here
+artifact_stores = {
+    "parquet": ParquetArtifactStore,
+    "arrow": ArrowArtifactStore
+}
+
+def get_artifact_store(fmt):
+    """
+    Returns the artifact store registered for the given format.
+
+    """
+    if fmt not in artifact_stores:
+        raise ValueError(f"Unknown artifact format: {fmt}. Available formats: {list(artifact_stores)}.")
+    return artifact_stores[fmt]()
+
+## ----- Artifact hand-off ----- ##
+
+def writing_artifact(df, name, run_id, fmt=None, root=None):
+    """
+    Writes a DataFrame as a columnar artifact of the run and returns its reference.
+    The reference is a small dict (path, format, schema fingerprint and shape) meant to be passed through XCom.
+
+    """
+    fmt = fmt or artifacts_format
+    store = get_artifact_store(fmt)
+
+    directory = run_directory(run_id, root)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.{store.extension}")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    store.write_table(table, path)
+    recording_bytes(os.path.getsize(path))
+
+    logging.info(f"Artifact {name} written to {path} ({df.shape[0]} rows, {os.path.getsize(path)} bytes).")
+
+    return {
+        "name": name,
+        "path": path,
+        "format": fmt,
+        "fingerprint": fingerprinting_schema(df),
+        "rows": df.shape[0],
+        "columns": df.shape[1]
+    }
+
+def referencing_artifact(path, name):
+    """
+    Returns the reference of a Parquet artifact written outside writing_artifact (e.g. by DuckDB).
+    The schema fingerprint and the shape are read from the Parquet footer, without loading the data.
+
+    """
+    metadata = pq.read_metadata(path)
+    df = metadata.schema.to_arrow_schema().empty_table().to_pandas(split_blocks=True)
+    recording_bytes(os.path.getsize(path))
+
+    logging.info(f"Artifact {name} referenced at {path} ({metadata.num_rows} rows, {os.path.getsize(path)} bytes).")
+
+    return {
+        "name": name,
+        "path": path,
+        "format": "parquet",
+        "fingerprint": fingerprinting_schema(df),
+        "rows": metadata.num_rows,
+        "columns": df.shape[1]
+    }
+
+def reading_artifact(ref):
+    """
+    Reads back the DataFrame of an artifact reference, keeping the original dtypes.
+
+    """
+    store = get_artifact_store(ref["format"])
+    table = store.read_table(ref["path"])
+
+    df = table.to_pandas(split_blocks=True)
+
+    fingerprint = fingerprinting_schema(df)
+    if fingerprint != ref["fingerprint"]:
+        raise ValueError(f"Artifact {ref['path']} does not match its schema fingerprint ({fingerprint} != {ref['fingerprint']}).")
+
+    logging.info(f"Artifact {ref['name']} read from {ref['path']} ({df.shape[0]} rows).")
+
+    return df
+
+def removing_run_artifacts(run_id, root=None):
+    """
+    Removes every artifact written by a pipeline run.
+
+    """
+    directory = run_directory(run_id, root)
+    shutil.rmtree(directory, ignore_errors=True)
+    logging.info(f"Artifacts of run {run_id} removed from {directory}.")
+
+def pruning_artifacts(max_age_days=None, root=None):
+    """
+    Removes the run directories not modified for max_age_days days, left by the runs that failed
+    before removing their artifacts. Returns the names of the removed run directories.
+
+    """
+    max_age_days = artifacts_retention_days if max_age_days is None else max_age_days
+    root = root or artifacts_path
+
+    if not os.path.isdir(root):
+        return []
+
+    limit = time.time() - max_age_days * 24 * 3600
+    removed = []
+
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+
+        if os.path.isdir(directory) and os.path.getmtime(directory) < limit:
+            shutil.rmtree(directory, ignore_errors=True)
+            removed.append(name)
+
+    if removed:
+        logging.info(f"Artifacts of {len(removed)} runs older than {max_age_days:g} days removed from {root}.")
+
+    return removed
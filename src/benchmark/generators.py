@@ -0,0 +1,160 @@
+from transform.lookups import categories, roles_of_interest
+
+import numpy as np
+import pandas as pd
+
+# Sample of the genres of the Spotify dataset, plus one without a category in the genre mapping
+spotify_genres = [
+    "rock", "alt-rock", "metal", "punk", "indie", "pop", "k-pop", "j-pop", "synth-pop", "edm", "house",
+    "techno", "trance", "dubstep", "hip-hop", "r-n-b", "reggaeton", "salsa", "samba", "latin", "indian",
+    "french", "blues", "jazz", "soul", "funk", "disney", "kids", "anime", "acoustic", "classical", "piano",
+    "ambient", "chill", "sad", "sleep", "country", "folk", "singer-songwriter", "world-music", "unknown-genre"
+]
+
+grammys_categories = list(categories) + [
+    "Record Of The Year", "Album Of The Year", "Song Of The Year", "Best New Artist",
+    "Best Pop Solo Performance", "Best Rock Album", "Best Rap Song", "Best Latin Pop Album"
+]
+
+first_names = ["John", "Ana", "Maria", "David", "Laura", "James", "Sofia", "Carlos", "Emma", "Luis", "Mei", "Omar"]
+last_names = ["Smith", "Lopez", "Garcia", "Brown", "Kim", "Martin", "Rossi", "Silva", "Chen", "Haddad", "Novak"]
+ensembles = ["Berliner Philharmoniker", "London Symphony Orchestra", "The Beatles", "Various Artists", "(Various Artists)"]
+other_roles = ["producer", "engineer", "mixer", "songwriter", "arranger", "conductor"]
+
+## ----- Functions ----- ##
+
+def generating_names(rng, size):
+    """
+    Returns size person names.
+
+    """
+    return [f"{first} {last}" for first, last in zip(rng.choice(first_names, size), rng.choice(last_names, size))]
+
+def generating_workers(rng, size):
+    """
+    Returns size strings shaped like the workers column of the Grammys dataset: credits separated by
+    semicolons, some with a role after a comma ("John Smith, artist"), some in parentheses, and a few
+    with irregular spacing around the separators.
+
+    """
+    names = generating_names(rng, size * 3) + list(ensembles)
+    roles = list(roles_of_interest) + other_roles
+
+    workers = []
+    for credits in rng.integers(1, 5, size):
+        parts = []
+        for kind in rng.random(credits):
+            name = names[rng.integers(len(names))]
+            if kind < 0.35:
+                parts.append(f"{name}, {roles[rng.integers(len(roles))]}")
+            elif kind < 0.45:
+                parts.append(f"({name})")
+            elif kind < 0.5:
+                parts.append(f"{name} ,{roles[rng.integers(len(roles))]}s")
+            else:
+                parts.append(name)
+        workers.append(["; ", ";", " ; "][rng.integers(3)].join(parts))
+
+    return workers
+
+def generating_titles(rng, size, numbers):
+    """
+    Returns size song titles from a vocabulary shared by both generators, so the datasets partially match.
+    The vocabulary holds 400 * numbers titles, which keeps the matches per title steady as the frames grow.
+
+    """
+    words = np.array(["love", "night", "fire", "dream", "heart", "rain", "blue", "gold", "road", "home",
+                      "light", "wild", "summer", "river", "shadow", "city", "dance", "moon", "stars", "time"])
+    first, second = rng.choice(words, size), rng.choice(words, size)
+    suffixes = rng.integers(0, numbers, size).astype(str)
+    return pd.Series(first).str.title() + " " + pd.Series(second) + " " + pd.Series(suffixes)
+
+## ----- Generators ----- ##
+
+def generating_spotify_data(rows, seed=0, duplicate_ratio=0.3, null_ratio=0.001, title_numbers=None):
+    """
+    Generates a DataFrame with the columns of the Spotify dataset. About duplicate_ratio of the rows
+    repeat an earlier track_id (with another genre, as in the dataset), or an earlier track_name
+    and artists pair with another popularity, and null_ratio of the rows have a null field.
+    The vocabularies are sampled from pools, so 10M rows are generated in seconds. Frames generated
+    in parts pass the title_numbers of the whole dataset (see generating_titles).
+
+    """
+    rng = np.random.default_rng(seed)
+
+    unique_tracks = max(int(rows * (1 - duplicate_ratio)), 1)
+    track_numbers = np.where(rng.random(rows) < duplicate_ratio, rng.integers(0, unique_tracks, rows), np.arange(rows) % unique_tracks)
+
+    # Some duplicated tracks get their own id but keep the name and artists
+    renamed = rng.random(rows) < duplicate_ratio / 3
+
+    titles = generating_titles(rng, unique_tracks, title_numbers or max(rows // 10, 200))
+    artist_pool = np.array(generating_names(rng, max(unique_tracks // 4, 1)), dtype=object)
+    track_artists = artist_pool[rng.integers(0, len(artist_pool), unique_tracks)]
+    album_pool = np.array([f"Album {number}" for number in range(max(unique_tracks // 8, 1))], dtype=object)
+
+    track_ids = pd.Series(np.char.add("trk", track_numbers.astype(str)), dtype=object)
+    track_ids[renamed] = np.char.add("alt", np.flatnonzero(renamed).astype(str))
+
+    df = pd.DataFrame({
+        "Unnamed: 0": np.arange(rows),
+        "track_id": track_ids,
+        "artists": track_artists[track_numbers],
+        "album_name": album_pool[track_numbers % len(album_pool)],
+        "track_name": titles.to_numpy()[track_numbers],
+        "popularity": np.where(renamed, rng.integers(0, 101, rows), track_numbers % 101),
+        "duration_ms": rng.integers(30000, 600000, rows),
+        "explicit": rng.random(rows) < 0.1,
+        "danceability": rng.random(rows).round(3),
+        "energy": rng.random(rows).round(3),
+        "key": rng.integers(0, 12, rows),
+        "loudness": (rng.random(rows) * -30).round(3),
+        "mode": rng.integers(0, 2, rows),
+        "speechiness": rng.random(rows).round(4),
+        "acousticness": rng.random(rows).round(4),
+        "instrumentalness": rng.random(rows).round(4),
+        "liveness": rng.random(rows).round(3),
+        "valence": rng.random(rows).round(3),
+        "tempo": (60 + rng.random(rows) * 140).round(3),
+        "time_signature": rng.choice([3, 4, 5], rows),
+        "track_genre": rng.choice(spotify_genres, rows)
+    })
+
+    for column in ["artists", "album_name", "track_name"]:
+        df.loc[rng.random(rows) < null_ratio, column] = None
+
+    return df
+
+def generating_grammys_data(rows, seed=0, null_ratio=0.05, title_numbers=None):
+    """
+    Generates a DataFrame with the columns extracted from the Grammys table. The nominees share the
+    title vocabulary of generating_spotify_data, and the artist is null in half of the rows, so the
+    workers cascade of the transform runs on them. About null_ratio of the rows have neither artist nor workers.
+
+    """
+    rng = np.random.default_rng(seed)
+
+    workers_pool = np.array(generating_workers(rng, min(max(rows // 10, 1), 50000)), dtype=object)
+    artist_pool = np.array(generating_names(rng, 1000) + list(ensembles), dtype=object)
+
+    years = rng.integers(1958, 2020, rows)
+    artists = artist_pool[rng.integers(0, len(artist_pool), rows)]
+    artists[rng.random(rows) < 0.5] = None
+
+    workers = workers_pool[rng.integers(0, len(workers_pool), rows)]
+    missing = rng.random(rows) < null_ratio
+    artists[missing] = None
+    workers[missing] = None
+
+    nominees = generating_titles(rng, rows, title_numbers or max(rows // 10, 200)).to_numpy()
+    nominees[rng.random(rows) < null_ratio / 10] = None
+
+    return pd.DataFrame({
+        "year": years,
+        "title": pd.Series(years - 1957).astype(str) + "th Annual GRAMMY Awards",
+        "category": rng.choice(grammys_categories, rows),
+        "nominee": nominees,
+        "artist": artists,
+        "workers": workers,
+        "winner": rng.random(rows) < 0.9
+    })
@@ -0,0 +1,161 @@
+from benchmark.generators import spotify_genres, grammys_categories, generating_workers
+from transform.lookups import genre_category_mapping, excluded_categories, mapping_genres
+from transform.grammys_transform import resolving_artists
+
+import numpy as np
+import pandas as pd
+import re
+
+## ----- Previous lookup path ----- ##
+
+# Copied verbatim from src/transform/grammys_transform.py of the baseline commit 32741f1, before transform.lookups
+
+def extract_artist(workers):
+    """
+    Extracts the artist name from the 'workers' column if it's within parentheses.
+    
+    """
+    if pd.isna(workers):
+        return None
+    match = re.search(r'\((.*?)\)', workers)
+    if match:
+        return match.group(1)
+    return None
+
+def move_workers_to_artist(row):
+    """
+    Moves the value from 'workers' to 'artist' if 'artist' is NaN and 'workers' doesn't contain ';' or ','.
+    
+    """
+    if pd.isna(row["artist"]) and pd.notna(row["workers"]):
+        workers = row["workers"]
+        if not re.search(r'[;,]', workers):
+            return workers
+    return row["artist"]
+
+def extract_artists_before_semicolon(workers, roles):
+    """
+    Extracts the first segment of 'workers' before the semicolon if it doesn't contain roles of interest.
+    
+    """
+    if pd.isna(workers):
+        return None
+    parts = workers.split(';')
+    first_part = parts[0].strip()
+    if ',' not in first_part and not any(role in first_part.lower() for role in roles):
+        return first_part
+    return None
+
+def extract_roles_based_on_interest(workers, roles):
+    """
+    Extracts names associated with specific roles from 'workers' and assigns them to 'artist'.
+    
+    """
+    if pd.isna(workers):
+        return None
+    roles_pattern = '|'.join(roles)
+    pattern = r'([^;]+)\s*,\s*(?:' + roles_pattern + r')'
+    matches = re.findall(pattern, workers, flags=re.IGNORECASE)
+    return ", ".join(matches).strip() if matches else None
+
+# Define the categories to filter out
+categories = [
+    "Best Classical Vocal Soloist Performance",
+    "Best Classical Vocal Performance",
+    "Best Small Ensemble Performance (With Or Without Conductor)",
+    "Best Classical Performance - Instrumental Soloist Or Soloists (With Or Without Orchestra)",
+    "Most Promising New Classical Recording Artist",
+    "Best Classical Performance - Vocal Soloist (With Or Without Orchestra)",
+    "Best New Classical Artist",
+    "Best Classical Vocal Soloist",
+    "Best Performance - Instrumental Soloist Or Soloists (With Or Without Orchestra)",
+    "Best Classical Performance - Vocal Soloist"
+]
+
+# Define roles of interest
+roles_of_interest = [
+    "artist",
+    "artists",
+    "composer",
+    "conductor",
+    "conductor/soloist",
+    "choir director",
+    "chorus master",
+    "graphic designer",
+    "soloist",
+    "soloists",
+    "ensembles"
+]
+
+# The baseline built the genre mapping as a plain dict on every call of transforming_spotify_data
+flat_genre_mapping = dict(genre_category_mapping)
+
+## ----- Functions ----- ##
+
+def resolving_artists_row_wise(df):
+    """
+    Resolves the null artists with the four df.apply steps of the baseline transforming_grammys_data.
+
+    """
+    df["artist"] = df.apply(
+        lambda row: extract_artist(row["workers"]) if pd.isna(row["artist"]) else row["artist"],
+        axis=1
+    )
+    
+    df["artist"] = df.apply(move_workers_to_artist, axis=1)
+    
+    df["artist"] = df.apply(
+        lambda row: extract_artists_before_semicolon(row["workers"], roles_of_interest)
+        if pd.isna(row["artist"]) else row["artist"],
+        axis=1
+    )
+    
+    df["artist"] = df.apply(
+        lambda row: extract_roles_based_on_interest(row["workers"], roles_of_interest)
+        if pd.isna(row["artist"]) else row["artist"],
+        axis=1
+    )
+    
+    return df["artist"]
+
+def mapping_genres_with_dict(track_genre):
+    """
+    Maps the track genres with the dict of genre_category_mapping, as the baseline transform did before transform.lookups.
+
+    """
+    return track_genre.map(flat_genre_mapping)
+
+def filtering_categories(category, excluded):
+    """
+    Returns which values of category are in the excluded categories.
+
+    """
+    return category.isin(excluded)
+
+def building_lookup_cases(size, seed):
+    """
+    Generates the lookup inputs of the given size and returns the micro-benchmark cases of the previous
+    and the current lookup paths as (stage, rows in, function, making_args), in pairs. The artists are
+    resolved from workers alone, so every row goes through the cascade.
+
+    """
+    rng = np.random.default_rng(seed)
+
+    track_genre = pd.Series(rng.choice(spotify_genres, size))
+    category = pd.Series(rng.choice(grammys_categories, size))
+    workers = pd.Series(generating_workers(rng, size))
+    artists = pd.DataFrame({"artist": None, "workers": workers})
+
+    genres_object = track_genre.astype(object)
+    genres_categorical = track_genre.astype("category")
+
+    return [
+        ("genres_dict_object", size, mapping_genres_with_dict, lambda: (genres_object,)),
+        ("genres_codes_object", size, mapping_genres, lambda: (genres_object,)),
+        ("genres_dict_categorical", size, mapping_genres_with_dict, lambda: (genres_categorical,)),
+        ("genres_codes_categorical", size, mapping_genres, lambda: (genres_categorical,)),
+        ("categories_list", size, filtering_categories, lambda: (category, categories)),
+        ("categories_frozenset", size, filtering_categories, lambda: (category, excluded_categories)),
+        ("artists_row_wise", size, resolving_artists_row_wise, lambda: (artists.copy(),)),
+        ("artists_vectorized", size, resolving_artists, lambda: (artists.copy(),))
+    ]
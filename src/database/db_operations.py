@@ -1,9 +1,16 @@
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect, BigInteger, Boolean, Integer, Float, String, Text, DateTime, MetaData, Table, Column
+from sqlalchemy import create_engine, inspect, MetaData, Table, Column
+from sqlalchemy.schema import CreateTable
 from sqlalchemy_utils import database_exists, create_database
 
+from monitoring.profiling import recording_bytes
+from database.schema_inference import infering_sql_type, infering_schema, table_schema
+
+import io
 import os
+import time
 import logging
+import threading
 
 import pandas as pd
 
@@ -20,51 +27,121 @@ port = os.getenv("PG_PORT")
 
 database = os.getenv("PG_DATABASE")
 
+pool_size = int(os.getenv("PG_POOL_SIZE", "5"))
+max_overflow = int(os.getenv("PG_MAX_OVERFLOW", "10"))
+
+# Engines shared by the whole process, keyed on the process id and the URL.
+# The process id keeps a forked worker from reusing the pooled connections of its parent.
+engines = {}
+engines_lock = threading.Lock()
+
 # Creating the connection engine from the URL made up of the environment variables
-def creating_engine():
-    url = f"postgresql://{user}:{password}@{host}:{port}/{database}"
-    engine = create_engine(url)
+def creating_engine(url=None):
+    """
+    Returns the pooled engine of the process for the URL, creating it on the first call.
+    The database is bootstrapped (created if missing) only when the engine is created.
     
-    if not database_exists(url):
-        create_database(url)
-        logging.info("Database created")
+    """
+    url = url or f"postgresql://{user}:{password}@{host}:{port}/{database}"
+    key = (os.getpid(), url)
     
-    logging.info("Engine created. You can now connect to the database.")
+    start = time.perf_counter()
+    
+    with engines_lock:
+        engine = engines.get(key)
+        
+        if engine is not None:
+            logging.info(f"Reusing the pooled engine ({time.perf_counter() - start:.4f}s).")
+            return engine
+        
+        if url.startswith("postgresql"):
+            engine = create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+        else:
+            engine = create_engine(url, pool_pre_ping=True)
+        
+        if not database_exists(url):
+            create_database(url)
+            logging.info("Database created")
+        
+        engines[key] = engine
+    
+    logging.info(f"Engine created in {time.perf_counter() - start:.4f}s. You can now connect to the database.")
     
     return engine
 
 def disposing_engine(engine):
+    """
+    Closes the pooled connections of the engine and removes it from the engines of the process.
+    
+    """
+    with engines_lock:
+        for key in [key for key, value in engines.items() if value is engine]:
+            del engines[key]
+    
     engine.dispose()
     logging.info("Engine disposed.")
 
 # Defining a function to infer the SQLAlchemy types from Pandas Dtypes
 def infering_types(dtype, column_name, df):
-    if "int" in dtype.name:
-        return Integer
-    elif "float" in dtype.name:
-        return Float
-    elif "object" in dtype.name:
-        max_len = df[column_name].astype(str).str.len().max()
-        if max_len > 255:
-            logging.info(f"Adjusting column {column_name} to Text due to length {max_len}.")
-            return Text
-        else:
-            return String(255)
-    elif "datetime" in dtype.name:
-        return DateTime
-    elif "bool" in dtype.name:
-        return Boolean
-    else:
-        return Text
+    """
+    Returns the SQLAlchemy type of the column (see database.schema_inference).
+    
+    """
+    return infering_sql_type(df[column_name])
 
 
+# Streaming a DataFrame into a table with COPY FROM STDIN through a DBAPI cursor
+def copying_chunks(cursor, df, table_name, preparer, chunksize=100000):
+    """
+    Renders the DataFrame in chunks of chunksize rows into an in-memory CSV buffer and copies them into the table.
+    
+    """
+    columns = ", ".join(preparer.quote(column) for column in df.columns)
+    copy_sql = f"COPY {preparer.quote(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    
+    for start in range(0, df.shape[0], chunksize):
+        buffer = io.StringIO()
+        df.iloc[start:start + chunksize].to_csv(buffer, index=False, header=False, na_rep="\\N")
+        recording_bytes(buffer.tell())
+        buffer.seek(0)
+        
+        cursor.copy_expert(copy_sql, buffer)
+
+# Loading a DataFrame in bulk into an existing table
+def bulk_loading_data(engine, df, table_name, chunksize=100000):
+    """
+    Loads the DataFrame into an existing table in chunks of chunksize rows.
+    On PostgreSQL every chunk is rendered into an in-memory CSV buffer and streamed with COPY FROM STDIN,
+    other dialects (e.g. SQLite) fall back to batched INSERTs through to_sql.
+    
+    """
+    if engine.dialect.name != "postgresql":
+        df.to_sql(table_name, con=engine, if_exists="append", index=False, chunksize=chunksize)
+        return
+    
+    connection = engine.raw_connection()
+    
+    try:
+        cursor = connection.cursor()
+        copying_chunks(cursor, df, table_name, engine.dialect.identifier_preparer, chunksize)
+        cursor.close()
+        connection.commit()
+        
+        logging.info(f"{df.shape[0]} rows copied to table {table_name}.")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
 # Creating table and loading the raw data
 def load_raw_data(engine, df, table_name):
     
     logging.info(f"Creating table {table_name} from Pandas DataFrame.")
     
     try:   
-        df.to_sql(table_name, con=engine, if_exists="replace", index=False)
+        df.head(0).to_sql(table_name, con=engine, if_exists="replace", index=False)
+        bulk_loading_data(engine, df, table_name)
     
         logging.info(f"Table {table_name} created successfully.")
     
@@ -79,20 +156,167 @@ def load_clean_data(engine, df, table_name):
     try:
         if not inspect(engine).has_table(table_name):
             metadata = MetaData()
+            schema = table_schema(engine, df, table_name)
             columns = [Column(name,
-                            infering_types(dtype, name, df),
+                            schema[name],
                             primary_key=(name == "id")) \
-                                for name, dtype in df.dtypes.items()]
+                                for name in df.columns]
             
             table = Table(table_name, metadata, *columns)
             table.create(engine)
             
             logging.info(f"Table {table_name} created successfully.")
 
-            df.to_sql(table_name, con=engine, if_exists="append", index=False)
+            bulk_loading_data(engine, df, table_name)
 
             logging.info(f"Data loaded to table {table_name}.")
+            
+            return df.shape[0]
         else:
             logging.error(f"Table {table_name} already exists.")
     except Exception as e:
-        logging.error(f"Error creating table {table_name}: {e}")
\ No newline at end of file
+        logging.error(f"Error creating table {table_name}: {e}")
+
+# Hashing the content of every row
+def hashing_rows(df, columns):
+    """
+    Returns a signed 64-bit content hash per row of the given columns.
+    Integer and float columns are widened first, so a downcast alone does not change the hash.
+    
+    """
+    canonical = {}
+    for column in columns:
+        series = df[column]
+        if series.dtype.kind in "iu":
+            series = series.astype("int64")
+        elif series.dtype.kind == "f":
+            series = series.astype("float64")
+        canonical[column] = series
+    
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(canonical), index=False)
+    return hashes.to_numpy().view("int64")
+
+# Upserting only the new and changed rows into the clean data table
+def load_incremental_data(engine, df, table_name, key_columns, snapshot=False):
+    """
+    Loads the DataFrame incrementally into a table keyed on key_columns and returns the load stats.
+    The rows are staged with COPY in a temporary table together with a content hash, then
+    INSERT ... ON CONFLICT DO UPDATE writes only the rows whose hash changed. The table is created
+    on the first load with key_columns as primary key and a row_hash column.
+    
+    A snapshot load holds every row of the table, so in the same transaction it deletes the rows whose
+    key is missing from the DataFrame, and creates the table again when the live one has no row_hash
+    column or another primary key (e.g. a table of load_clean_data). Raises ValueError when key_columns
+    do not identify every row, or when the live table does not fit a load that is not a snapshot.
+    
+    Returns:
+        dict: Number of inserted, updated and unchanged rows, and of deleted rows for a snapshot load.
+    
+    """
+    logging.info(f"Loading {table_name} incrementally on key {key_columns}.")
+    
+    if engine.dialect.name != "postgresql":
+        raise ValueError(f"Incremental loads need a PostgreSQL engine, got {engine.dialect.name}.")
+    
+    # A repeated key would be upserted twice in the same statement, or its rows lost
+    duplicated = int(df.duplicated(subset=key_columns).sum())
+    if duplicated:
+        raise ValueError(f"{duplicated} rows repeat the key {key_columns} of table {table_name}, the key must identify every row.")
+    
+    value_columns = [column for column in df.columns if column not in key_columns]
+    
+    df = df.assign(row_hash=hashing_rows(df, list(df.columns)))
+    
+    inspector = inspect(engine)
+    exists = inspector.has_table(table_name)
+    mismatch = None
+    
+    if exists:
+        primary_key = inspector.get_pk_constraint(table_name)["constrained_columns"]
+        
+        if "row_hash" not in [column["name"] for column in inspector.get_columns(table_name)]:
+            mismatch = "has no row_hash column, it was not created by an incremental load"
+        elif primary_key != list(key_columns):
+            mismatch = f"is keyed on {primary_key}, not on {key_columns}"
+    
+    if mismatch is not None and not snapshot:
+        raise ValueError(f"Table {table_name} {mismatch}, a full load creates it again.")
+    
+    if mismatch is not None:
+        logging.info(f"Table {table_name} {mismatch}, the full load creates it again.")
+        schema = infering_schema(df)
+    else:
+        # Inferred on the first load only, and checked against the live table on the next ones
+        schema = table_schema(engine, df, table_name)
+    
+    preparer = engine.dialect.identifier_preparer
+    target = preparer.quote(table_name)
+    staging = preparer.quote(f"{table_name}_staging")
+    
+    # Created in the transaction of the load, so a failed load keeps the previous table
+    statements = []
+    if mismatch is not None:
+        statements.append(f"DROP TABLE {target}")
+    if mismatch is not None or not exists:
+        columns = [Column(name,
+                        schema[name],
+                        primary_key=(name in key_columns)) \
+                            for name in df.columns]
+        
+        statements.append(str(CreateTable(Table(table_name, MetaData(), *columns)).compile(dialect=engine.dialect)))
+    
+    columns = ", ".join(preparer.quote(column) for column in df.columns)
+    keys = ", ".join(preparer.quote(column) for column in key_columns)
+    updates = ", ".join(f"{preparer.quote(column)} = EXCLUDED.{preparer.quote(column)}"
+                        for column in value_columns + ["row_hash"])
+    matches = " AND ".join(f"{staging}.{preparer.quote(column)} = {target}.{preparer.quote(column)}"
+                           for column in key_columns)
+    
+    upsert_sql = f"""
+        WITH upserted AS (
+            INSERT INTO {target} ({columns})
+            SELECT {columns} FROM {staging}
+            ON CONFLICT ({keys}) DO UPDATE SET {updates}
+            WHERE {target}.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+    """
+    delete_sql = f"DELETE FROM {target} WHERE NOT EXISTS (SELECT 1 FROM {staging} WHERE {matches})"
+    
+    connection = engine.raw_connection()
+    
+    try:
+        cursor = connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging} (LIKE {target}) ON COMMIT DROP")
+        copying_chunks(cursor, df, f"{table_name}_staging", preparer)
+        
+        cursor.execute(upsert_sql)
+        inserted, updated = cursor.fetchone()
+        
+        if snapshot:
+            cursor.execute(delete_sql)
+            deleted = cursor.rowcount
+        
+        cursor.close()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    
+    if statements:
+        logging.info(f"Table {table_name} created successfully.")
+    
+    stats = {"inserted": inserted, "updated": updated, "unchanged": df.shape[0] - inserted - updated}
+    if snapshot:
+        stats["deleted"] = deleted
+    
+    logging.info(f"Incremental load of {table_name} completed: {stats['inserted']} inserted, {stats['updated']} updated, {stats['unchanged']} unchanged"
+                 + (f", {deleted} deleted." if snapshot else "."))
+    
+    return stats
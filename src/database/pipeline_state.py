@@ -0,0 +1,53 @@
+from sqlalchemy import text
+
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Table of the target database where the watermark of every source is kept between runs
+state_table = "pipeline_state"
+
+## ----- Functions ----- ##
+
+def creating_state_table(engine):
+    """
+    Creates the pipeline state table if it does not exist yet.
+
+    """
+    with engine.begin() as connection:
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {state_table} (
+                source VARCHAR(255) PRIMARY KEY,
+                watermark TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+def reading_watermark(engine, source):
+    """
+    Returns the watermark stored for the source, or None when the source was never processed.
+
+    """
+    creating_state_table(engine)
+
+    with engine.connect() as connection:
+        row = connection.execute(text(f"SELECT watermark FROM {state_table} WHERE source = :source"), {"source": source}).first()
+
+    return json.loads(row[0]) if row is not None else None
+
+def writing_watermark(engine, source, watermark):
+    """
+    Stores the watermark of the source, replacing the previous one.
+
+    """
+    creating_state_table(engine)
+
+    with engine.begin() as connection:
+        connection.execute(text(f"""
+            INSERT INTO {state_table} (source, watermark, updated_at)
+            VALUES (:source, :watermark, CURRENT_TIMESTAMP)
+            ON CONFLICT (source) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = EXCLUDED.updated_at
+        """), {"source": source, "watermark": json.dumps(watermark)})
+
+    logging.info(f"Watermark of {source} stored: {watermark}.")
@@ -0,0 +1,137 @@
+from sqlalchemy import inspect, BigInteger, Boolean, DateTime, Float, Integer, Numeric, REAL, String, Text
+from sqlalchemy.types import to_instance
+
+import threading
+import logging
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Strings up to this length are stored as VARCHAR, longer ones as TEXT
+max_varchar_length = 255
+
+# The frames are downcast per batch (see transform.compact), so the narrow integers share
+# INTEGER and a later batch with wider values still fits the table
+integer_types = {
+    "int8": Integer, "int16": Integer, "int32": Integer, "uint8": Integer, "uint16": Integer,
+    "int64": BigInteger, "uint32": BigInteger
+}
+
+# Inferred schema of every table loaded by the process, keyed on (database URL, table name)
+schema_cache = {}
+schema_lock = threading.Lock()
+
+## ----- Functions ----- ##
+
+def measuring_strings(values):
+    """
+    Returns the length of the longest value, measured on the strings themselves without copying them.
+    Values that are not strings are measured on their text representation, as they are loaded.
+
+    """
+    values = pd.Series(values).dropna().to_numpy()
+
+    try:
+        return max(map(len, values), default=0)
+    except TypeError:
+        return max(map(len, map(str, values)), default=0)
+
+def infering_sql_type(series):
+    """
+    Returns the SQLAlchemy type of a column from its dtype. Numpy and nullable integers are mapped
+    alike, float32 is stored as REAL, and categorical columns are typed on their categories,
+    so only the categories are measured.
+
+    """
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        return infering_sql_type(pd.Series(dtype.categories))
+
+    if pd.api.types.is_bool_dtype(dtype):
+        return Boolean
+
+    if pd.api.types.is_integer_dtype(dtype):
+        # Nullable integers (Int64, UInt8...) share the numpy names in lowercase
+        name = dtype.name.lower()
+        return integer_types.get(name, Numeric(20, 0))
+
+    if pd.api.types.is_float_dtype(dtype):
+        return REAL if dtype.itemsize <= 4 else Float
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return DateTime(timezone=getattr(dtype, "tz", None) is not None)
+
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        max_len = measuring_strings(series)
+        if max_len > max_varchar_length:
+            logging.info(f"Adjusting column {series.name} to Text due to length {max_len}.")
+            return Text
+        return String(max_varchar_length)
+
+    return Text
+
+def infering_schema(df):
+    """
+    Returns the SQLAlchemy type of every column of the DataFrame.
+
+    """
+    return {column: infering_sql_type(df[column]) for column in df.columns}
+
+def fingerprinting_dtypes(df):
+    """
+    Returns the column names and dtypes of the DataFrame, which the cached schemas are keyed on.
+
+    """
+    return tuple((column, str(dtype)) for column, dtype in df.dtypes.items())
+
+def matching_live_table(engine, table_name, schema):
+    """
+    Checks the schema against the live table: same columns, and types of the same family
+    (integer, numeric, string, boolean or datetime). Returns None when the table does not exist.
+
+    """
+    inspector = inspect(engine)
+
+    if not inspector.has_table(table_name):
+        return None
+
+    live_types = {column["name"]: column["type"] for column in inspector.get_columns(table_name)}
+
+    if set(live_types) != set(schema):
+        return False
+
+    return all(live_types[column]._type_affinity is to_instance(sql_type)._type_affinity
+               for column, sql_type in schema.items())
+
+## ----- Table schema ----- ##
+
+def table_schema(engine, df, table_name):
+    """
+    Returns the SQLAlchemy types of the columns of the table where the DataFrame is loaded.
+    The schema is inferred once per table and dtypes, and reused while it matches the live table,
+    so repeated loads skip the inference. Raises ValueError when the DataFrame does not match the live table.
+
+    """
+    key = (str(engine.url), table_name)
+    fingerprint = fingerprinting_dtypes(df)
+
+    with schema_lock:
+        cached = schema_cache.get(key)
+
+    if cached is not None and cached["fingerprint"] == fingerprint:
+        schema = cached["schema"]
+        logging.info(f"Reusing the cached schema of table {table_name}.")
+    else:
+        schema = infering_schema(df)
+
+    matches = matching_live_table(engine, table_name, schema)
+
+    if matches is False:
+        raise ValueError(f"The columns of the DataFrame do not match the live table {table_name}.")
+
+    with schema_lock:
+        schema_cache[key] = {"fingerprint": fingerprint, "schema": schema}
+
+    return schema
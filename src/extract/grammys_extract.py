@@ -1,26 +1,85 @@
-from database.db_operations import creating_engine, disposing_engine
+from database.db_operations import creating_engine
+from monitoring.profiling import profiled
+
+from sqlalchemy import text
 
 import pandas as pd
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+# Columns used by the Grammys transformation. img, published_at and updated_at never leave the database.
+grammys_columns = ["year", "title", "category", "nominee", "artist", "workers", "winner"]
+
+## ----- Functions ----- ##
+
+def reading_grammys_watermark(engine=None):
+    """
+    Returns the current watermark of the Grammy Awards table: its latest year and update time.
+
+    """
+    engine = engine or creating_engine()
+
+    query = "SELECT max(year), max(CAST(updated_at AS timestamptz)) FROM grammy_awards_raw"
+
+    with engine.connect() as connection:
+        year, updated_at = connection.execute(text(query)).one()
+
+    return {
+        "year": int(year) if year is not None else None,
+        "updated_at": updated_at.isoformat() if updated_at is not None else None
+    }
+
 ## ----- Grammys Extract ----- ##
 
-def extracting_grammys_data():
+@profiled()
+def extracting_grammys_data(columns=grammys_columns, chunksize=10000, watermark=None, updated_after=None, until=None):
     """
-    Extracting data from the Spotify CSV file and return it as a DataFrame.   
+    Extracting data from the Grammy Awards table and return it as a DataFrame.
+    Only the given columns are selected and the rows are streamed through a server-side cursor
+    in chunks of chunksize rows. With a watermark only the Grammy events (titles) with a row of a
+    later year, or updated after updated_after, are pulled, with every row of the event, so the
+    merged rows of an event can be replaced as a whole. until (see reading_grammys_watermark) bounds
+    the rows pulled, so the rows added while the pipeline runs are left for the next run.
 
     """
     engine = creating_engine()
     
     try:
         logging.info("Extracting data from the Grammy Awards table.")
-        df = pd.read_sql_table("grammy_awards_raw", engine)
-        logging.info("Data extracted from the Grammy Awards table.")
+        
+        preparer = engine.dialect.identifier_preparer
+        query = f"SELECT {', '.join(preparer.quote(column) for column in columns)} FROM grammy_awards_raw"
+        params = {}
+        conditions = []
+        
+        if until is not None and until["year"] is not None:
+            conditions.append("year <= :until_year")
+            params["until_year"] = until["year"]
+        if until is not None and until["updated_at"] is not None:
+            conditions.append("(updated_at IS NULL OR CAST(updated_at AS timestamptz) <= CAST(:until_updated_at AS timestamptz))")
+            params["until_updated_at"] = until["updated_at"]
+        
+        since = []
+        if watermark is not None:
+            since.append("year > :watermark")
+            params["watermark"] = watermark
+        if updated_after is not None:
+            since.append("CAST(updated_at AS timestamptz) > CAST(:updated_after AS timestamptz)")
+            params["updated_after"] = updated_after
+        if since:
+            touched = " AND ".join([f"({' OR '.join(since)})"] + conditions)
+            conditions.append(f"title IN (SELECT title FROM grammy_awards_raw WHERE {touched})")
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        with engine.connect().execution_options(stream_results=True) as connection:
+            chunks = pd.read_sql(text(query), connection, params=params, chunksize=chunksize)
+            df = pd.concat(chunks, ignore_index=True)
+        
+        logging.info(f"Data extracted from the Grammy Awards table. {df.shape[0]} rows and {df.shape[1]} columns.")
         
         return df
     except Exception as e:
         logging.error(f"Error extracting data from the Grammy Awards table: {e}.")
-    finally:
-        disposing_engine(engine)
\ No newline at end of file
@@ -1,11 +1,39 @@
+from monitoring.profiling import profiled
+
 import os
 import pandas as pd
+import pyarrow.csv as pacsv
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+# Explicit schema of the columns read by the streaming extraction
+spotify_dtypes = {
+    "track_id": "object",
+    "artists": "object",
+    "album_name": "object",
+    "track_name": "object",
+    "popularity": "int32",
+    "duration_ms": "int32",
+    "explicit": "bool",
+    "danceability": "float32",
+    "energy": "float32",
+    "key": "int8",
+    "loudness": "float32",
+    "mode": "int8",
+    "speechiness": "float32",
+    "acousticness": "float32",
+    "instrumentalness": "float32",
+    "liveness": "float32",
+    "valence": "float32",
+    "tempo": "float32",
+    "time_signature": "int8",
+    "track_genre": "category"
+}
+
 ## ----- Spotify Extract ----- ##
 
+@profiled()
 def extracting_spotify_data(path):
     """
     Extracting data from the Spotify CSV file and return it as a DataFrame.   
@@ -18,4 +46,43 @@ def extracting_spotify_data(path):
         logging.info(f"Data extracted from {path}.")
         return df
     except Exception as e:
-        logging.error(f"Error extracting data: {e}.")
\ No newline at end of file
+        logging.error(f"Error extracting data: {e}.")
+
+def streaming_spotify_data(path, chunksize=100000, engine="c"):
+    """
+    Extracting data from the Spotify CSV file as typed DataFrame chunks of at most chunksize rows.
+    Only the columns of spotify_dtypes are read. With engine="pyarrow" the file is parsed
+    by the Arrow CSV streaming reader instead of the pandas C parser.
+
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}. Make sure you entered the correct absolute path.")
+
+    logging.info(f"Streaming data from {path} in chunks of {chunksize} rows ({engine} engine).")
+
+    if engine == "pyarrow":
+        chunks = _reading_arrow_chunks(path, chunksize)
+    else:
+        chunks = pd.read_csv(path, usecols=list(spotify_dtypes), dtype=spotify_dtypes, chunksize=chunksize)
+
+    total_rows = 0
+    for chunk in chunks:
+        total_rows += chunk.shape[0]
+        yield chunk
+
+    logging.info(f"Data streamed from {path}. {total_rows} rows extracted.")
+
+def _reading_arrow_chunks(path, chunksize):
+    """
+    Reads the CSV file with the pyarrow streaming reader and yields pandas chunks.
+
+    """
+    reader = pacsv.open_csv(
+        path,
+        convert_options=pacsv.ConvertOptions(include_columns=list(spotify_dtypes), strings_can_be_null=True)
+    )
+
+    for batch in reader:
+        for offset in range(0, batch.num_rows, chunksize):
+            chunk = batch.slice(offset, chunksize).to_pandas()
+            yield chunk.astype(spotify_dtypes)
@@ -1,12 +1,39 @@
-from database.db_operations import creating_engine, load_clean_data, disposing_engine
+from database.db_operations import creating_engine, load_clean_data, load_incremental_data, hashing_rows
+from transform.merge import not_applicable
+from monitoring.profiling import profiled
+
+from sqlalchemy import text, bindparam
 
 import pandas as pd
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+# Natural key of the merged data: a track is nominated once per Grammy event and category, but for the
+# repeated nominations of the Grammys table (same nominee, other artist), which merge into rows sharing the key
+merged_data_key = ["track_id", "title", "category"]
+
+def keying_merged_rows(df):
+    """
+    Replaces the positional id of the merge by a hash of merged_data_key and of the rank of the row among
+    the rows sharing its key (ordered by content), so a row keeps its id across runs whatever the
+    order and the number of the merged rows. The incremental loads are keyed on this id.
+
+    """
+    content = pd.Series(hashing_rows(df, [column for column in df.columns if column != "id"]), index=df.index)
+    
+    rank = (df[merged_data_key]
+            .assign(content=content)
+            .sort_values("content", kind="stable")
+            .groupby(merged_data_key, observed=True, sort=False, dropna=False)
+            .cumcount()
+            .reindex(df.index))
+    
+    return df.assign(id=hashing_rows(df[merged_data_key].assign(rank=rank), merged_data_key + ["rank"]))
+
 # Loading the merged data to the database
-def loading_merged_data(df: pd.DataFrame, table_name: str) -> None:
+@profiled()
+def loading_merged_data(df: pd.DataFrame, table_name: str, mode: str = "create") -> dict:
     """
     This function takes a merged DataFrame and a table name as input, 
     and loads the DataFrame into the specified table in the database. 
@@ -16,9 +43,13 @@ def loading_merged_data(df: pd.DataFrame, table_name: str) -> None:
     Parameters:
         df (pd.DataFrame): The merged DataFrame to be loaded into the database.
         table_name (str): The name of the table where the data will be loaded.
+        mode (str): "create" loads the data into a new table, "incremental" upserts
+            only the new and changed rows keyed on their stable id (see keying_merged_rows)
+            and deletes the rows missing from the merge, so the table matches a full rebuild.
     
     Returns:
-        None
+        dict: The inserted, updated, unchanged and deleted row counts of an incremental load, the
+            inserted rows of a new table, or None when the load failed.
 
     """
     
@@ -27,8 +58,142 @@ def loading_merged_data(df: pd.DataFrame, table_name: str) -> None:
     engine = creating_engine()
     
     try:
-        df = load_clean_data(engine, df, table_name)    
+        if mode == "incremental":
+            return load_incremental_data(engine, keying_merged_rows(df), table_name, ["id"], snapshot=True)
+        
+        loaded = load_clean_data(engine, df, table_name)
+        
+        if loaded is not None:
+            return {"inserted": loaded}
     except Exception as e:
         logging.error(f"Error loading clean data to the database: {e}.")
-    finally:
-        disposing_engine(engine)
\ No newline at end of file
+
+def deleting_stale_rows(engine, table_name, events, ids):
+    """
+    Deletes the rows of the given Grammy events whose id is not in ids, and returns them.
+    
+    """
+    if not events:
+        return pd.DataFrame(columns=["track_id"])
+    
+    query = text(f"""
+        DELETE FROM {engine.dialect.identifier_preparer.quote(table_name)}
+        WHERE title IN :events AND NOT (id = ANY(:ids))
+        RETURNING *
+    """).bindparams(bindparam("events", expanding=True))
+    
+    with engine.begin() as connection:
+        return pd.read_sql(query, connection, params={"events": events, "ids": ids})
+
+def restoring_placeholders(engine, table_name, stale):
+    """
+    Loads the "Not applicable" row of every track of the stale rows that has no row left,
+    as the full merge gives the tracks without a nomination. Returns the number of tracks restored.
+    
+    """
+    if stale.empty:
+        return 0
+    
+    query = text(f"""
+        SELECT DISTINCT track_id FROM {engine.dialect.identifier_preparer.quote(table_name)}
+        WHERE track_id IN :track_ids
+    """).bindparams(bindparam("track_ids", expanding=True))
+    
+    with engine.connect() as connection:
+        kept = pd.read_sql(query, connection, params={"track_ids": stale["track_id"].unique().tolist()})["track_id"]
+    
+    placeholders = (stale[~stale["track_id"].isin(kept)]
+                    .drop_duplicates("track_id")
+                    .drop(columns="row_hash")
+                    .assign(title=not_applicable, category=not_applicable, is_nominated=False))
+    
+    if placeholders.empty:
+        return 0
+    
+    load_incremental_data(engine, keying_merged_rows(placeholders), table_name, ["id"])
+    
+    return placeholders.shape[0]
+
+def applying_merged_delta(merged, df, events=None):
+    """
+    Returns the full merged data with the merged rows of an incremental run applied, as loading_merged_delta
+    applies them to the table: the rows of the events of the run and the "Not applicable" rows of the tracks
+    of df are replaced by df, and a track left without any nomination gets its "Not applicable" row back.
+    The rows are numbered again from 0 in their new order, as the merge numbers them.
+    
+    """
+    events = df["title"].astype(str).unique().tolist() if events is None else list(events)
+    
+    in_events = merged["title"].astype(str).isin(events)
+    replaced = ((merged["title"] == not_applicable) & (merged["category"] == not_applicable)
+                & merged["track_id"].isin(df["track_id"]))
+    
+    kept = merged[~in_events & ~replaced]
+    stale = merged[in_events]
+    
+    placeholders = (stale[~stale["track_id"].isin(kept["track_id"]) & ~stale["track_id"].isin(df["track_id"])]
+                    .drop_duplicates("track_id")
+                    .assign(title=not_applicable, category=not_applicable, is_nominated=False))
+    
+    refreshed = pd.concat([kept, df, placeholders], ignore_index=True)
+    
+    if "id" in refreshed.columns:
+        refreshed["id"] = range(refreshed.shape[0])
+    
+    return refreshed
+
+# Loading the merged rows of an incremental run to the database
+@profiled()
+def loading_merged_delta(df: pd.DataFrame, table_name: str, events: list = None) -> dict:
+    """
+    Upserts the merged rows of an incremental run (the nominations of the Grammy events with new or
+    updated rows), keyed on their stable id like the full loads, and deletes the rows those tracks had
+    without a nomination, whose title and category were "Not applicable". The run pulls its events
+    whole, so the rows of those events missing from df are stale (their nominee, title or category
+    changed) and are deleted too. A track left without any nomination gets its "Not applicable" row back.
+    
+    Parameters:
+        df (pd.DataFrame): The merged rows of the new and changed nominations.
+        table_name (str): The name of the table where the merged data is loaded.
+        events (list): The titles of the Grammy events pulled by the run, the titles of df by default.
+    
+    Returns:
+        dict: The inserted, updated, unchanged, replaced, deleted and restored row counts.
+    
+    """
+    
+    logging.info(f"Loading {df.shape[0]} new merged rows to the database.")
+    
+    engine = creating_engine()
+    target = engine.dialect.identifier_preparer.quote(table_name)
+    
+    try:
+        # The merge numbers the rows of the run from 0, which would overwrite the rows holding those ids
+        df = keying_merged_rows(df)
+        events = df["title"].astype(str).unique().tolist() if events is None else list(events)
+        
+        if df.shape[0]:
+            stats = load_incremental_data(engine, df, table_name, ["id"])
+        else:
+            stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+        
+        track_ids = df["track_id"].astype(str).unique().tolist()
+        query = text(f"""
+            DELETE FROM {target}
+            WHERE title = :placeholder AND category = :placeholder AND track_id IN :track_ids
+        """).bindparams(bindparam("track_ids", expanding=True))
+        
+        with engine.begin() as connection:
+            stats["replaced"] = connection.execute(query, {"placeholder": not_applicable, "track_ids": track_ids}).rowcount if track_ids else 0
+        
+        logging.info(f"{stats['replaced']} rows without a nomination replaced by their new nominations.")
+        
+        stale = deleting_stale_rows(engine, table_name, events, df["id"].tolist())
+        stats["deleted"] = stale.shape[0]
+        stats["restored"] = restoring_placeholders(engine, table_name, stale)
+        
+        logging.info(f"{stats['deleted']} stale rows of the updated events deleted, {stats['restored']} tracks without a nomination left restored.")
+        
+        return stats
+    except Exception as e:
+        logging.error(f"Error loading the new merged rows to the database: {e}.")
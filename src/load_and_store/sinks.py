@@ -0,0 +1,94 @@
+from load_and_store.load import loading_merged_data, loading_merged_delta, applying_merged_delta
+import load_and_store.store as store
+
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+## ----- Sinks ----- ##
+
+class DatabaseSink:
+    """
+    Loads the merged data into a PostgreSQL table ("incremental" upserts only the new and changed rows).
+
+    """
+
+    def __init__(self, table_name="merged_data", mode="incremental"):
+        self.table_name = table_name
+        self.mode = mode
+
+    def write(self, df):
+        return loading_merged_data(df, self.table_name, mode=self.mode)
+
+    def write_delta(self, df, run_id=None, events=None):
+        return loading_merged_delta(df, self.table_name, events)
+
+class DriveSink:
+    """
+    Uploads the merged data to the Google Drive folder as a compressed file.
+    The merged rows of an incremental run are applied to that file in place (see applying_merged_delta),
+    so it always holds every nomination. The "<title>_delta_<run_id>" files of earlier releases are applied
+    first, oldest first, and deleted once the refreshed file is uploaded; a full upload deletes them too.
+
+    """
+
+    def __init__(self, title="merged_data", fmt="csv.gz"):
+        self.title = title
+        self.fmt = fmt
+
+    def write(self, df):
+        service, http = store.getting_drive_service()
+        deltas = self.listing_deltas(service, http)
+        
+        response = store.storing_merged_data(self.title, df, fmt=self.fmt, service=service, http=http)
+        self.pruning_deltas(service, http, deltas)
+        
+        return response
+
+    def write_delta(self, df, run_id=None, events=None):
+        service, http = store.getting_drive_service()
+        
+        existing = store.finding_drive_file(service, f"{self.title}.{self.fmt}", store.folder_id, http)
+        if existing is None:
+            raise ValueError(f"There is no {self.title}.{self.fmt} on Google Drive to apply the delta to, run a full load first.")
+        
+        merged = store.reading_drive_file(service, existing["id"], self.fmt, http)
+        
+        deltas = self.listing_deltas(service, http)
+        for delta in deltas:
+            merged = applying_merged_delta(merged, store.reading_drive_file(service, delta["id"], self.fmt, http))
+        
+        merged = applying_merged_delta(merged, df, events)
+        
+        response = store.storing_merged_data(self.title, merged, fmt=self.fmt, service=service, http=http)
+        self.pruning_deltas(service, http, deltas)
+        
+        return response
+
+    def listing_deltas(self, service, http):
+        files = store.listing_drive_files(service, f"{self.title}_delta_", store.folder_id, http)
+        return [file for file in files if file["title"].endswith(f".{self.fmt}")]
+
+    def pruning_deltas(self, service, http, deltas):
+        for delta in deltas:
+            store.deleting_drive_file(service, delta["id"], http)
+        
+        if deltas:
+            logging.info(f"{len(deltas)} delta files applied to {self.title}.{self.fmt} deleted from Google Drive.")
+
+# New targets are plugged in by adding a class with write and write_delta(df, run_id, events) methods here.
+# Every sink reads the merged artifact on its own, so they all run in parallel.
+sinks = {
+    "database": DatabaseSink,
+    "drive": DriveSink
+}
+
+def get_sink(name, **options):
+    """
+    Returns the sink registered under the given name, created with the given options.
+
+    """
+    if name not in sinks:
+        raise ValueError(f"Unknown sink: {name}. Available sinks: {list(sinks)}.")
+
+    return sinks[name](**options)
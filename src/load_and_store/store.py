@@ -1,10 +1,23 @@
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
+from googleapiclient.http import MediaFileUpload
+
+from monitoring.profiling import profiled, recording_bytes
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 from dotenv import load_dotenv
 import os
+import threading
+import io
+import gzip
+import hashlib
+import tempfile
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
@@ -17,6 +30,23 @@ settings_file = rf"{os.getenv('SETTINGS_PATH')}"
 credentials_file = rf"{os.getenv('CREDENTIALS_FILE_PATH')}"
 folder_id = os.getenv("FOLDER_ID")
 
+# Size of every chunk of the resumable uploads, a multiple of 256 KB
+upload_chunksize = int(os.getenv("DRIVE_CHUNK_SIZE", str(8 * 1024 ** 2)))
+upload_retries = 5
+
+upload_mimetypes = {
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Authenticated Drive session of every process and HTTP connection of every thread
+drive_sessions = {}
+drive_lock = threading.Lock()
+thread_connections = threading.local()
+
+# The access token is refreshed when it expires within this margin, before a long upload starts
+token_refresh_margin = timedelta(minutes=5)
+
 # Function to authenticate Google Drive using PyDrive2.
 def auth_drive():
     """
@@ -62,35 +92,265 @@ def auth_drive():
     except Exception as e:
         logging.error(f"Authentication error: {e}", exc_info=True)
 
-# Function to upload a merged DataFrame to Google Drive as a CSV file.
-def storing_merged_data(title, df):
+# Function to get the authenticated Drive session of the process.
+def getting_drive_auth():
+    """
+    Returns the authenticated GoogleAuth of the process, authenticating only on the first call.
+    The access token is refreshed (and the credentials file saved) when it expires within token_refresh_margin.
+    
+    """
+    key = os.getpid()
+    
+    with drive_lock:
+        gauth = drive_sessions.get(key)
+        
+        if gauth is None:
+            drive = auth_drive()
+            if drive is None:
+                raise RuntimeError("Google Drive authentication failed, check the log above.")
+            
+            gauth = drive.auth
+            if gauth.service is None:
+                gauth.Authorize()
+            
+            drive_sessions[key] = gauth
+        elif token_expiring(gauth):
+            logging.info("Access token about to expire, refreshing token.")
+            gauth.Refresh()
+            gauth.SaveCredentialsFile(credentials_file)
+    
+    return gauth
+
+def token_expiring(gauth):
+    """
+    Checks whether the access token is missing, expired or expires within token_refresh_margin.
+    
+    """
+    credentials = gauth.credentials
+    
+    if credentials is None or credentials.access_token is None:
+        return True
+    if credentials.token_expiry is None:
+        return False
+    
+    # oauth2client keeps token_expiry as a naive UTC datetime
+    return credentials.token_expiry - datetime.now(timezone.utc).replace(tzinfo=None) < token_refresh_margin
+
+# Function to get the Drive API service and the HTTP connection of the current thread.
+def getting_drive_service():
     """
-    Stores a given DataFrame as a CSV file on Google Drive.
+    Returns the Google Drive API (v2) service of the process and the authorized HTTP connection of the
+    current thread. The service is shared by every thread, but httplib2 connections are not thread-safe,
+    so every request is executed with the connection of its thread, reused across calls.
+    
+    """
+    gauth = getting_drive_auth()
+    
+    if getattr(thread_connections, "pid", None) != os.getpid():
+        thread_connections.http = gauth.Get_Http_Object()
+        thread_connections.pid = os.getpid()
+    
+    return gauth.service, thread_connections.http
+
+# Function to write a DataFrame to a compressed file in chunks.
+def writing_upload_file(df, path, fmt="csv.gz", chunksize=100000):
+    """
+    Writes the DataFrame to path in chunks of chunksize rows, as gzip-compressed CSV ("csv.gz") or Parquet ("parquet").
+    The gzip header holds no file name or timestamp, so the same data always gives the same bytes and MD5.
+    
+    """
+    # At least one chunk is written, so an empty DataFrame still gets its header or schema
+    starts = range(0, max(df.shape[0], 1), chunksize)
+    
+    if fmt == "csv.gz":
+        with open(path, "wb") as raw_file, \
+             gzip.GzipFile(filename="", mode="wb", fileobj=raw_file, mtime=0) as compressed_file, \
+             io.TextIOWrapper(compressed_file, encoding="utf-8", newline="") as text_file:
+            for start in starts:
+                df.iloc[start:start + chunksize].to_csv(text_file, index=False, header=(start == 0))
+    elif fmt == "parquet":
+        schema = pa.Schema.from_pandas(df.iloc[:chunksize], preserve_index=False)
+        
+        with pq.ParquetWriter(path, schema) as writer:
+            for start in starts:
+                writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunksize], schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f"Unknown upload format: {fmt}. Available formats: {list(upload_mimetypes)}.")
+
+# Function to compute the MD5 checksum Drive reports for a file.
+def hashing_file(path, block_size=1024 ** 2):
+    """
+    Returns the MD5 hex digest of a file, the checksum Drive keeps in md5Checksum.
+    
+    """
+    digest = hashlib.md5()
+    
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    
+    return digest.hexdigest()
+
+# Function to find a file by title in the Drive folder.
+def finding_drive_file(service, title, folder, http=None):
+    """
+    Returns the id and md5Checksum of the file with the given title in the Drive folder, or None.
+    
+    """
+    escaped_title = title.replace("\\", "\\\\").replace("'", "\\'")
+    query = f"title = '{escaped_title}' and '{folder}' in parents and trashed = false"
+    
+    items = service.files().list(q=query, fields="items(id, md5Checksum)").execute(http=http).get("items", [])
+    
+    return items[0] if items else None
+
+# Function to list the files of the Drive folder whose title starts with a prefix.
+def listing_drive_files(service, prefix, folder, http=None):
+    """
+    Returns the id, title and createdDate of the files of the Drive folder whose title starts with prefix, oldest first.
+    
+    """
+    escaped_prefix = prefix.replace("\\", "\\\\").replace("'", "\\'")
+    query = f"title contains '{escaped_prefix}' and '{folder}' in parents and trashed = false"
+    
+    items = service.files().list(q=query, fields="items(id, title, createdDate)").execute(http=http).get("items", [])
+    
+    # "contains" also matches the prefix in the middle of a title
+    items = [item for item in items if item["title"].startswith(prefix)]
+    
+    return sorted(items, key=lambda item: (item.get("createdDate", ""), item["title"]))
+
+# Function to read a file of the Drive folder into a DataFrame.
+def reading_drive_file(service, file_id, fmt="csv.gz", http=None):
+    """
+    Downloads the file with the given id and returns its content, written by writing_upload_file, as a DataFrame.
+    
+    """
+    content = io.BytesIO(service.files().get_media(fileId=file_id).execute(http=http))
+    
+    if fmt == "csv.gz":
+        return pd.read_csv(content, compression="gzip")
+    if fmt == "parquet":
+        return pd.read_parquet(content)
+    
+    raise ValueError(f"Unknown upload format: {fmt}. Available formats: {list(upload_mimetypes)}.")
+
+# Function to delete a file of the Drive folder.
+def deleting_drive_file(service, file_id, http=None):
+    """
+    Deletes the file with the given id from Drive.
+    
+    """
+    service.files().delete(fileId=file_id).execute(http=http)
+
+# Function to upload a file to Drive with a resumable chunked upload.
+def uploading_file(service, path, title, mimetype, folder, existing=None, chunksize=None, http=None):
+    """
+    Uploads the file in chunks of chunksize bytes with a resumable upload, retrying the failed chunks.
+    Updates the content of the existing file when one is given, otherwise creates a new file in the folder.
+    
+    """
+    media = MediaFileUpload(path, mimetype=mimetype, chunksize=chunksize or upload_chunksize, resumable=True)
+    
+    if existing is not None:
+        request = service.files().update(fileId=existing["id"], media_body=media)
+    else:
+        request = service.files().insert(
+            body={
+                "title": title,
+                "parents": [{"kind": "drive#fileLink", "id": folder}],
+                "mimeType": mimetype
+            },
+            media_body=media
+        )
+    
+    response = None
+    while response is None:
+        status, response = request.next_chunk(http=http, num_retries=upload_retries)
+        
+        if status is not None:
+            logging.info(f"Uploaded {status.progress():.0%} of {title}.")
+    
+    return response
+
+# Function to upload a merged DataFrame to Google Drive as a compressed file.
+@profiled()
+def storing_merged_data(title, df, fmt="csv.gz", service=None, http=None, chunksize=100000):
+    """
+    Stores a given DataFrame as a compressed file on Google Drive.
+    The DataFrame is written in chunks to a temporary file, which is uploaded with a resumable
+    chunked upload. The upload is skipped when the file on Drive already has the same content.
     
     Parameters:
-        title (str): The title of the file to be stored on Google Drive.
-        df (pandas.DataFrame): The DataFrame to be stored as a CSV file.
-        folder_id (str): The ID of the Google Drive folder where the file will be stored.
+        title (str): The title of the file on Google Drive, without the extension of the format.
+        df (pandas.DataFrame): The DataFrame to be stored.
+        fmt (str): "csv.gz" for gzip-compressed CSV or "parquet".
+        service: The Google Drive API service, the cached one of the process by default.
+        http: The HTTP connection used for the requests of the service.
+        chunksize (int): Rows written to the temporary file at a time.
     
     Returns:
-        None
+        dict: The Drive metadata of the stored file.
     
     """
     
-    drive = auth_drive()
+    if fmt not in upload_mimetypes:
+        raise ValueError(f"Unknown upload format: {fmt}. Available formats: {list(upload_mimetypes)}.")
+    
+    if service is None:
+        service, http = getting_drive_service()
+    file_title = f"{title}.{fmt}"
     
-    logging.info(f"Storing {title} on Google Drive.")
+    logging.info(f"Storing {file_title} on Google Drive.")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, file_title)
+        
+        writing_upload_file(df, path, fmt, chunksize)
+        recording_bytes(os.path.getsize(path))
+        
+        checksum = hashing_file(path)
+        existing = finding_drive_file(service, file_title, folder_id, http)
+        
+        if existing is not None and existing.get("md5Checksum") == checksum:
+            logging.info(f"File {file_title} is unchanged on Google Drive, upload skipped.")
+            return existing
+        
+        response = uploading_file(service, path, file_title, upload_mimetypes[fmt], folder_id, existing, http=http)
+    
+    logging.info(f"File {file_title} uploaded successfully (MD5 {checksum}).")
+    
+    return response
+
+# Function to upload several DataFrames to Google Drive in parallel.
+def storing_datasets(frames, fmt="csv.gz", service=None, max_workers=4):
+    """
+    Stores several DataFrames on Google Drive in parallel from one authenticated session.
+    
+    Parameters:
+        frames (dict): The DataFrames to be stored, keyed on their titles.
+        fmt (str): "csv.gz" for gzip-compressed CSV or "parquet".
+        service: The Google Drive API service, the cached one of the process by default.
+        max_workers (int): Uploads running at the same time.
+    
+    Returns:
+        dict: The Drive metadata of every stored file, keyed on its title.
+    
+    """
     
-    csv_file = df.to_csv(index=False) 
+    # Authenticating once before the threads start, so they all share the session.
+    # Every thread then runs its requests on its own HTTP connection (see getting_drive_service),
+    # also with a given service, whose own connection would be shared by the threads otherwise.
+    getting_drive_auth()
     
-    file = drive.CreateFile({
-        "title": title,
-        "parents": [{"kind": "drive#fileLink", "id": folder_id}],
-        "mimeType": "text/csv"
-    })
+    def storing_dataset(title):
+        thread_service, http = getting_drive_service()
+        return storing_merged_data(title, frames[title], fmt=fmt, service=service or thread_service, http=http)
     
-    file.SetContentString(csv_file)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        stored = executor.map(storing_dataset, frames)
+        responses = dict(zip(frames, stored))
     
-    file.Upload()
+    logging.info(f"{len(responses)} files stored on Google Drive.")
     
-    logging.info(f"File {title} uploaded successfully.")
\ No newline at end of file
+    return responses
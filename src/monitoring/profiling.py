@@ -0,0 +1,213 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from dotenv import load_dotenv
+
+import os
+import json
+import time
+import resource
+import threading
+import tracemalloc
+import logging
+
+import psutil
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Reading the environment variables
+load_dotenv("./env/.env")
+
+# Optional JSON Lines file where the metrics of every stage are appended, besides the log
+metrics_path = os.getenv("METRICS_PATH")
+
+# tracemalloc slows down allocations, so the Python heap peak is only traced on demand
+trace_memory = os.getenv("PROFILING_TRACEMALLOC", "false").lower() == "true"
+
+# Seconds between the RSS samples taken while a stage runs, to find the peak of the stage itself
+rss_sample_seconds = float(os.getenv("PROFILING_RSS_SAMPLE_SECONDS", "0.01"))
+
+# Exporting every stage as an OpenTelemetry span (OTLP exporter, configured with the OTEL_* variables)
+export_spans = os.getenv("PROFILING_OTEL", "false").lower() == "true"
+
+metrics_logger = logging.getLogger("pipeline.metrics")
+
+# Metrics of the stage running in the current context, so nested code can add the bytes it serializes
+current_metrics = ContextVar("current_metrics", default=None)
+
+tracer = None
+
+## ----- Functions ----- ##
+
+def getting_tracer():
+    """
+    Returns the OpenTelemetry tracer of the pipeline, setting up the OTLP exporter on first use.
+
+    """
+    global tracer
+
+    if tracer is None:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        if not isinstance(trace.get_tracer_provider(), TracerProvider):
+            provider = TracerProvider(resource=Resource.create({"service.name": "etl-workshop-2"}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+
+        tracer = trace.get_tracer("etl-workshop-2")
+
+    return tracer
+
+def counting_rows(value):
+    """
+    Returns the rows of a DataFrame, the total rows of a list or tuple of DataFrames, or None.
+
+    """
+    if isinstance(value, pd.DataFrame):
+        return value.shape[0]
+
+    if isinstance(value, (list, tuple)):
+        rows = [counting_rows(item) for item in value]
+        rows = [count for count in rows if count is not None]
+        return sum(rows) if rows else None
+
+    return None
+
+def recording_bytes(nbytes):
+    """
+    Adds nbytes to the bytes serialized by the stage running in the current context, if any.
+
+    """
+    metrics = current_metrics.get()
+
+    if metrics is not None:
+        metrics["bytes_serialized"] += nbytes
+
+def sampling_rss(process, peak, stopping):
+    """
+    Keeps in peak["rss"] the highest RSS of the process, sampled every rss_sample_seconds until stopping is set.
+
+    """
+    while not stopping.wait(rss_sample_seconds):
+        peak["rss"] = max(peak["rss"], process.memory_info().rss)
+
+def emitting_metrics(metrics):
+    """
+    Emits the metrics of a stage as one JSON line in the log and in the METRICS_PATH file.
+
+    """
+    line = json.dumps(metrics)
+    metrics_logger.info(line)
+
+    if metrics_path:
+        with open(metrics_path, "a") as file:
+            file.write(line + "\n")
+
+## ----- Profiling ----- ##
+
+@contextmanager
+def profiling(stage, rows_in=None):
+    """
+    Measures the wall time, CPU time, memory and bytes serialized of the code in the block and emits them as JSON.
+    The peak RSS of the stage is sampled by a thread while the block runs, and reported with its growth over the
+    RSS before the block. Yields the metrics dict, where the block can set rows_out or any other field.
+
+    """
+    process = psutil.Process()
+
+    metrics = {
+        "stage": stage,
+        "status": "ok",
+        "rows_in": rows_in,
+        "rows_out": None,
+        "bytes_serialized": 0
+    }
+
+    # Nested stages share the tracing started by the outermost one and report its peak so far
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    span = getting_tracer().start_as_current_span(stage) if export_spans else None
+    active_span = span.__enter__() if span is not None else None
+
+    token = current_metrics.set(metrics)
+
+    rss_before = process.memory_info().rss
+    peak = {"rss": rss_before}
+    stopping = threading.Event()
+    sampler = threading.Thread(target=sampling_rss, args=(process, peak, stopping), daemon=True)
+    sampler.start()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    try:
+        yield metrics
+    except Exception as e:
+        metrics["status"] = "error"
+        metrics["error"] = repr(e)
+        raise
+    finally:
+        metrics["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+        metrics["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+        stopping.set()
+        sampler.join()
+
+        rss_after = process.memory_info().rss
+        peak["rss"] = max(peak["rss"], rss_after)
+
+        metrics["rss_before_bytes"] = rss_before
+        metrics["rss_after_bytes"] = rss_after
+        metrics["peak_rss_bytes"] = peak["rss"]
+        metrics["peak_rss_delta_bytes"] = peak["rss"] - rss_before
+
+        # ru_maxrss is the peak of the whole process since it started, in kilobytes on Linux
+        metrics["process_peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        if trace_memory:
+            metrics["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+
+        current_metrics.reset(token)
+
+        if active_span is not None:
+            for key, value in metrics.items():
+                if value is not None:
+                    active_span.set_attribute(f"pipeline.{key}", value)
+            span.__exit__(None, None, None)
+
+        emitting_metrics(metrics)
+
+def profiled(stage=None):
+    """
+    Decorator that profiles every call of a pipeline function (see profiling).
+    The rows in are counted on the DataFrame arguments and the rows out on the returned DataFrame.
+
+    """
+    def decorator(function):
+        name = stage or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            rows_in = counting_rows(list(args) + list(kwargs.values()))
+
+            with profiling(name, rows_in=rows_in) as metrics:
+                result = function(*args, **kwargs)
+                metrics["rows_out"] = counting_rows(result)
+
+                # The data functions log their errors and return None instead of raising
+                if result is None and name.startswith(("extracting", "transforming", "merging")):
+                    metrics["status"] = "no_data"
+
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,330 @@
+# Benchmarks of the pipeline stages
+# ---------------------------------
+# Runs the transform, merge and load stages on seeded synthetic Spotify- and Grammys-shaped frames
+# (see benchmark.generators) and records the throughput (rows per second) and the peak Python heap of
+# every stage. The results are compared with the stored baselines, and the run fails when a stage is
+# slower or uses more memory than its baseline by more than the tolerance. With --backend duckdb the
+# frames are written as Parquet partitions, one generated part at a time, and the out-of-core transforms
+# (see transform.out_of_core) run over them, so the sizes can exceed the RAM. The load stage runs only
+# against the PostgreSQL database of --database-url, with COPY and with the to_sql INSERTs it replaced. Usage:
+#
+#   python src/run_benchmarks.py --sizes 10000 1000000 10000000 [--update-baseline] [--database-url postgresql://...]
+#   python src/run_benchmarks.py --backend duckdb --sizes 20000000 [--partition-rows 1000000]
+#   python src/run_benchmarks.py --fuzzy --sizes 10000 100000 [--fuzzy-nominees 10000]
+
+from benchmark.generators import generating_spotify_data, generating_grammys_data
+from benchmark.lookups import building_lookup_cases
+
+from transform.spotify_transform import transforming_spotify_data
+from transform.grammys_transform import transforming_grammys_data
+from transform.merge import merging_datasets
+from transform.out_of_core import transforming_spotify_out_of_core, transforming_grammys_out_of_core, merging_datasets_out_of_core
+
+from database.db_operations import creating_engine, load_clean_data
+from database.schema_inference import table_schema
+
+from sqlalchemy import text, MetaData, Table, Column
+
+import os
+import sys
+import json
+import functools
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import tracemalloc
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+default_work_directory = os.path.join(tempfile.gettempdir(), "etl_benchmark")
+
+## ----- Functions ----- ##
+
+def measuring(function, making_args, repeat=1):
+    """
+    Runs function on fresh arguments from making_args and returns the best wall time of repeat runs
+    and the peak of the Python heap allocated by one more traced run.
+
+    """
+    seconds = []
+    for _ in range(repeat):
+        args = making_args()
+        start = time.perf_counter()
+        function(*args)
+        seconds.append(time.perf_counter() - start)
+
+    # Traced apart from the timed runs, since tracemalloc slows down every allocation
+    args = making_args()
+    tracemalloc.start()
+    function(*args)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(seconds), peak_bytes
+
+def loading_with_to_sql(engine, df, table_name):
+    """
+    Loads the DataFrame as load_clean_data did before COPY: into the same new table, with the INSERTs of to_sql.
+
+    """
+    schema = table_schema(engine, df, table_name)
+    columns = [Column(name, schema[name], primary_key=(name == "id")) for name in df.columns]
+    Table(table_name, MetaData(), *columns).create(engine)
+
+    df.to_sql(table_name, con=engine, if_exists="append", index=False)
+
+def building_cases(size, seed, database_url):
+    """
+    Generates the frames of the given size and returns the benchmark cases as (stage, rows in, function, making_args).
+    The inputs of the merge and load stages are the outputs of the previous stages, as in the pipeline.
+    The load is benchmarked with COPY and with to_sql on the same PostgreSQL engine, and skipped without a database_url.
+
+    """
+    spotify_raw = generating_spotify_data(size, seed=seed)
+    grammys_raw = generating_grammys_data(size, seed=seed)
+
+    spotify_clean = transforming_spotify_data(spotify_raw.copy())
+    grammys_clean = transforming_grammys_data(grammys_raw.copy())
+    merged = merging_datasets(spotify_clean.copy(), grammys_clean.copy())
+
+    cases = [
+        ("transforming_spotify_data", size, transforming_spotify_data, lambda: (spotify_raw.copy(),)),
+        ("transforming_grammys_data", size, transforming_grammys_data, lambda: (grammys_raw.copy(),)),
+        ("merging_datasets", spotify_clean.shape[0] + grammys_clean.shape[0], merging_datasets,
+            lambda: (spotify_clean.copy(), grammys_clean.copy()))
+    ]
+
+    if database_url is None:
+        return cases
+
+    engine = creating_engine(database_url)
+
+    def making_load_args(table_name):
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        return engine, merged, table_name
+
+    return cases + [
+        ("load_clean_data", merged.shape[0], load_clean_data, lambda: making_load_args(f"benchmark_merged_{size}")),
+        ("load_clean_data_to_sql", merged.shape[0], loading_with_to_sql, lambda: making_load_args(f"benchmark_merged_{size}_to_sql"))
+    ]
+
+def building_fuzzy_cases(size, seed, nominees):
+    """
+    Returns the benchmark case of the fuzzy merge of size generated Spotify rows against a fixed set of
+    nominees generated Grammys rows. The blocking buckets keep the same size whatever the Spotify rows,
+    so the throughput should hold as the size grows. A third of the track names get a version suffix
+    or enclosed text, which only the fuzzy matching sees past.
+
+    """
+    rng = np.random.default_rng(seed)
+
+    grammys_clean = transforming_grammys_data(generating_grammys_data(nominees, seed=seed, title_numbers=max(nominees // 10, 200)))
+    spotify_clean = transforming_spotify_data(generating_spotify_data(size, seed=seed))
+
+    suffixes = np.array([" (Remastered)", " - Radio Edit", " [Live]", " - 2011 Remaster"], dtype=object)
+    decorated = rng.random(spotify_clean.shape[0]) < 1 / 3
+    track_name = spotify_clean["track_name"].astype(object).to_numpy(copy=True)
+    track_name[decorated] = track_name[decorated] + suffixes[rng.integers(0, len(suffixes), decorated.sum())]
+    spotify_clean["track_name"] = track_name
+
+    return [
+        ("merging_datasets_fuzzy", spotify_clean.shape[0], functools.partial(merging_datasets, fuzzy=True),
+            lambda: (spotify_clean.copy(), grammys_clean.copy()))
+    ]
+
+def writing_partitions(generating, directory, size, seed, partition_rows):
+    """
+    Writes size generated rows as Parquet partitions of partition_rows rows, generating one part at a time.
+    Every part has its own seed and shares the title vocabulary of the whole dataset.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    for number, start in enumerate(range(0, size, partition_rows)):
+        rows = min(partition_rows, size - start)
+        df = generating(rows, seed=seed + number, title_numbers=max(size // 10, 200))
+        df.to_parquet(os.path.join(directory, f"part-{number:05d}.parquet"), index=False)
+
+def building_out_of_core_cases(size, seed, work_directory, partition_rows):
+    """
+    Writes the Parquet partitions of the given size and returns the out-of-core benchmark cases.
+    The inputs of the merge are the outputs of the transforms, as in the pipeline.
+
+    """
+    directory = os.path.join(work_directory, str(size))
+    shutil.rmtree(directory, ignore_errors=True)
+
+    writing_partitions(generating_spotify_data, os.path.join(directory, "spotify_raw"), size, seed, partition_rows)
+    writing_partitions(generating_grammys_data, os.path.join(directory, "grammys_raw"), size, seed, partition_rows)
+
+    spotify_args = (os.path.join(directory, "spotify_raw"), os.path.join(directory, "spotify_clean.parquet"))
+    grammys_args = (os.path.join(directory, "grammys_raw"), os.path.join(directory, "grammys_clean.parquet"))
+    merge_args = (spotify_args[1], grammys_args[1], os.path.join(directory, "merged_data.parquet"))
+
+    spotify_rows = transforming_spotify_out_of_core(*spotify_args)
+    grammys_rows = transforming_grammys_out_of_core(*grammys_args)
+
+    return [
+        ("transforming_spotify_out_of_core", size, transforming_spotify_out_of_core, lambda: spotify_args),
+        ("transforming_grammys_out_of_core", size, transforming_grammys_out_of_core, lambda: grammys_args),
+        ("merging_datasets_out_of_core", spotify_rows + grammys_rows, merging_datasets_out_of_core, lambda: merge_args)
+    ]
+
+def running_benchmarks(sizes, seed=0, repeat=1, database_url=None, backend="pandas", work_directory=None, partition_rows=1000000,
+                       lookups=False, fuzzy=False, fuzzy_nominees=10000):
+    """
+    Runs every benchmark case of the backend for every size and returns the results keyed on "stage@size".
+    The peak memory of the duckdb cases is the Python heap only, DuckDB itself is bounded by DUCKDB_MEMORY_LIMIT.
+    With lookups, the micro-benchmark of the previous and current lookup paths runs instead (see benchmark.lookups).
+    With fuzzy, the fuzzy merge of every size against fuzzy_nominees nominees runs instead (see building_fuzzy_cases).
+    The load stage needs a PostgreSQL database_url, where COPY runs, and is skipped without one.
+
+    """
+    if database_url is not None and not database_url.startswith("postgresql"):
+        raise ValueError(f"The load benchmark compares COPY with to_sql on PostgreSQL, got {database_url}.")
+
+    if database_url is None and backend == "pandas" and not (lookups or fuzzy):
+        print("No --database-url given, the load benchmark is skipped.", flush=True)
+
+    results = {}
+
+    for size in sizes:
+        if lookups:
+            cases = building_lookup_cases(size, seed)
+        elif fuzzy:
+            cases = building_fuzzy_cases(size, seed, fuzzy_nominees)
+        elif backend == "duckdb":
+            cases = building_out_of_core_cases(size, seed, work_directory or default_work_directory, partition_rows)
+        else:
+            cases = building_cases(size, seed, database_url)
+
+        for stage, rows, function, making_args in cases:
+            seconds, peak_bytes = measuring(function, making_args, repeat)
+
+            results[f"{stage}@{size}"] = {
+                "rows": rows,
+                "seconds": round(seconds, 6),
+                "rows_per_second": round(rows / seconds, 1),
+                "peak_bytes": peak_bytes
+            }
+
+            print(f"{stage}@{size}: {rows / seconds:,.0f} rows/s, peak {peak_bytes / 1024 ** 2:,.1f} MB", flush=True)
+
+        if f"load_clean_data_to_sql@{size}" in results:
+            speedup = results[f"load_clean_data_to_sql@{size}"]["seconds"] / results[f"load_clean_data@{size}"]["seconds"]
+            print(f"load_clean_data@{size}: COPY is {speedup:,.1f}x as fast as to_sql on the same engine", flush=True)
+
+    return results
+
+def comparing_baselines(results, baselines, tolerance):
+    """
+    Returns the regressions of the results against the baselines: stages whose throughput dropped or
+    whose peak memory grew by more than tolerance.
+
+    """
+    regressions = []
+
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+
+        if result["rows_per_second"] < baseline["rows_per_second"] * (1 - tolerance):
+            regressions.append(f"{key}: {result['rows_per_second']:,.0f} rows/s, baseline {baseline['rows_per_second']:,.0f} rows/s")
+
+        if result["peak_bytes"] > baseline["peak_bytes"] * (1 + tolerance):
+            regressions.append(f"{key}: peak {result['peak_bytes']:,} bytes, baseline {baseline['peak_bytes']:,} bytes")
+
+    return regressions
+
+def reading_baselines(path):
+    """
+    Returns the stored baselines, or no baselines when the file does not exist yet.
+
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        return json.load(file)["results"]
+
+def writing_baselines(path, results):
+    """
+    Stores the results as baselines, keeping the baselines of the stages and sizes that were not run.
+
+    """
+    baselines = reading_baselines(path)
+    baselines.update(results)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with open(path, "w") as file:
+        json.dump({
+            "environment": {
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "machine": platform.machine(),
+                "cpus": os.cpu_count()
+            },
+            "results": baselines
+        }, file, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000], help="Rows of the generated frames.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generators.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage, the best one is kept.")
+    parser.add_argument("--database-url", default=None, help="PostgreSQL database of the load benchmark, which is skipped without it.")
+    parser.add_argument("--backend", default="pandas", choices=["pandas", "duckdb"], help="Execution backend of the transform stages.")
+    parser.add_argument("--work-directory", default=None, help="Directory of the Parquet partitions of the duckdb backend.")
+    parser.add_argument("--partition-rows", type=int, default=1000000, help="Rows of every Parquet partition of the duckdb backend.")
+    parser.add_argument("--lookups", action="store_true", help="Micro-benchmark the previous and current lookup paths instead of the stages.")
+    parser.add_argument("--fuzzy", action="store_true", help="Benchmark the fuzzy merge of every size against a fixed nominee set instead of the stages.")
+    parser.add_argument("--fuzzy-nominees", type=int, default=10000, help="Generated Grammys rows of the fuzzy merge benchmark.")
+    parser.add_argument("--baseline", default="./data/benchmarks/baselines.json", help="JSON file with the baselines.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative drop of throughput or growth of peak memory.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baselines.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the logs of the pipeline functions.")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = running_benchmarks(
+        args.sizes,
+        seed=args.seed,
+        repeat=args.repeat,
+        database_url=args.database_url,
+        backend=args.backend,
+        work_directory=args.work_directory,
+        partition_rows=args.partition_rows,
+        lookups=args.lookups,
+        fuzzy=args.fuzzy,
+        fuzzy_nominees=args.fuzzy_nominees
+    )
+
+    if args.update_baseline:
+        writing_baselines(args.baseline, results)
+        print(f"\nBaselines stored in {args.baseline}.")
+        return
+
+    regressions = comparing_baselines(results, reading_baselines(args.baseline), args.tolerance)
+
+    if regressions:
+        print("\nRegressions against the baselines")
+        print("---------------------------------")
+        for regression in regressions:
+            print(regression)
+        sys.exit(1)
+
+    print("\nNo regressions against the baselines.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# Local runner of the ETL pipeline
+# --------------------------------
+# Runs the same extract -> transform -> merge -> load -> store graph as workshop2_dag without Airflow.
+# The Spotify and Grammys branches run concurrently in a process pool, then the database load and the
+# Drive upload run concurrently in threads. The DataFrames are passed in memory between the stages,
+# and every one of them is compacted and validated first, as in the DAG (see validation.data_quality).
+# The merged data is loaded incrementally by default, as the DAG does, and the runner exits with
+# status 1 when a stage or a sink fails. Usage:
+#
+#   python src/run_pipeline.py --spotify-path ./data/spotify_dataset.csv [--spotify-chunksize 100000] [--fuzzy] [--skip-load] [--skip-store]
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from extract.spotify_extract import extracting_spotify_data, streaming_spotify_data
+from extract.grammys_extract import extracting_grammys_data
+
+from transform.spotify_transform import transforming_spotify_data, transforming_spotify_chunks
+from transform.grammys_transform import transforming_grammys_data
+from transform.merge import merging_datasets
+
+from load_and_store.sinks import get_sink
+
+from validation.data_quality import compacting_and_validating
+
+import sys
+import time
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+## ----- Functions ----- ##
+
+def timing_stage(timings, stage, function, *args, **kwargs):
+    """
+    Runs a stage of the pipeline and records its wall time in timings.
+    The stages and the sinks log their errors and return None, which fails the run.
+
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[stage] = time.perf_counter() - start
+
+    if result is None:
+        raise RuntimeError(f"Stage {stage} returned no result, check the log above.")
+
+    return result
+
+def running_spotify_branch(path, chunksize=None):
+    """
+    Extracts and transforms the Spotify data. Runs in a worker process. With a chunksize the file is
+    streamed in chunks reduced as they are read, so the extraction is timed within the transform.
+
+    """
+    timings = {}
+
+    if chunksize:
+        chunks = streaming_spotify_data(path, chunksize)
+        df = compacting_and_validating(timing_stage(timings, "transform_spotify (streamed)", transforming_spotify_chunks, chunks), "spotify_clean")
+        return df, timings
+
+    raw_df = compacting_and_validating(timing_stage(timings, "extract_spotify", extracting_spotify_data, path), "spotify_raw")
+    df = compacting_and_validating(timing_stage(timings, "transform_spotify", transforming_spotify_data, raw_df), "spotify_clean")
+    return df, timings
+
+def running_grammys_branch():
+    """
+    Extracts and transforms the Grammys data. Runs in a worker process.
+
+    """
+    timings = {}
+    # The artist column is filled and rewritten row by row in the transform
+    raw_df = compacting_and_validating(timing_stage(timings, "extract_grammys", extracting_grammys_data), "grammys_raw", exclude=["artist"])
+    df = compacting_and_validating(timing_stage(timings, "transform_grammys", transforming_grammys_data, raw_df), "grammys_clean")
+    return df, timings
+
+## ----- Pipeline ----- ##
+
+def running_pipeline(spotify_path, table_name="merged_data", load=True, store=True, load_mode="incremental", spotify_chunksize=None,
+                     fuzzy=None, fuzzy_threshold=None):
+    """
+    Runs the whole pipeline and returns the merged DataFrame and the wall time of every stage.
+    With a spotify_chunksize the Spotify file is streamed (see running_spotify_branch). The fuzzy
+    matching of the merge defaults to FUZZY_MATCHING and FUZZY_THRESHOLD, as in the DAG.
+    Every sink runs to the end, then a RuntimeError names the sinks that failed.
+
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        spotify_future = executor.submit(running_spotify_branch, spotify_path, spotify_chunksize)
+        grammys_future = executor.submit(running_grammys_branch)
+
+        spotify_df, spotify_timings = spotify_future.result()
+        grammys_df, grammys_timings = grammys_future.result()
+
+    timings.update(spotify_timings)
+    timings.update(grammys_timings)
+    timings["branches (concurrent)"] = time.perf_counter() - start
+
+    df = compacting_and_validating(timing_stage(timings, "merge", merging_datasets, spotify_df, grammys_df, fuzzy=fuzzy, fuzzy_threshold=fuzzy_threshold), "merged_data")
+
+    sinks = {}
+    if load:
+        sinks["database"] = get_sink("database", table_name=table_name, mode=load_mode)
+    if store:
+        sinks["drive"] = get_sink("drive", title=table_name)
+
+    if sinks:
+        sinks_start = time.perf_counter()
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=len(sinks)) as executor:
+            futures = {name: executor.submit(timing_stage, timings, f"sink_{name}", sink.write, df) for name, sink in sinks.items()}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error writing data to the {name} sink: {e}")
+                    failed.append(name)
+
+        timings["sinks (concurrent)"] = time.perf_counter() - sinks_start
+
+        if failed:
+            raise RuntimeError(f"The {', '.join(failed)} sinks failed, check the log above.")
+
+    timings["total"] = time.perf_counter() - start
+
+    return df, timings
+
+def printing_timings(timings):
+    """
+    Prints the wall time of every stage.
+
+    """
+    width = max(len(stage) for stage in timings)
+
+    print("\nStage timings")
+    print("-" * (width + 12))
+    for stage, seconds in timings.items():
+        print(f"{stage:<{width}}  {seconds:>8.3f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Spotify and Grammys ETL pipeline without Airflow.")
+    parser.add_argument("--spotify-path", default="./data/spotify_dataset.csv", help="Path to the Spotify CSV file.")
+    parser.add_argument("--spotify-chunksize", type=int, default=None, help="Stream the Spotify CSV file in chunks of this many rows instead of reading it whole.")
+    parser.add_argument("--fuzzy", action="store_true", default=None, help="Match the tracks without an exact match to their closest nominee (FUZZY_MATCHING).")
+    parser.add_argument("--fuzzy-threshold", type=float, default=None, help="Lowest similarity, from 0 to 1, of a fuzzy match (FUZZY_THRESHOLD).")
+    parser.add_argument("--table-name", default="merged_data", help="Table (and Drive file) where the merged data is loaded.")
+    parser.add_argument("--load-mode", default="incremental", choices=["create", "incremental"], help="How the merged data is loaded, incrementally as in the DAG by default.")
+    parser.add_argument("--skip-load", action="store_true", help="Do not load the merged data into the database.")
+    parser.add_argument("--skip-store", action="store_true", help="Do not upload the merged data to Google Drive.")
+    args = parser.parse_args()
+
+    try:
+        _, timings = running_pipeline(
+            args.spotify_path,
+            table_name=args.table_name,
+            load=not args.skip_load,
+            store=not args.skip_store,
+            load_mode=args.load_mode,
+            spotify_chunksize=args.spotify_chunksize,
+            fuzzy=args.fuzzy,
+            fuzzy_threshold=args.fuzzy_threshold
+        )
+    except Exception as e:
+        logging.error(f"The pipeline failed: {e}")
+        sys.exit(1)
+
+    printing_timings(timings)
+
+if __name__ == "__main__":
+    main()
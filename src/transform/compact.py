@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+## ----- Functions ----- ##
+
+def compacting_column(series, max_category_ratio, float_dtype):
+    """
+    Returns the most compact dtype representation of a column with the same values.
+
+    """
+    kind = series.dtype.kind
+
+    if kind == "i":
+        return pd.to_numeric(series, downcast="integer")
+    elif kind == "u":
+        return pd.to_numeric(series, downcast="unsigned")
+    elif kind == "f" and float_dtype is not None:
+        downcast = series.astype(float_dtype)
+
+        # Only when every value survives the round trip, so the downcast never shifts a value past a threshold
+        if np.array_equal(downcast.to_numpy().astype(series.dtype), series.to_numpy(), equal_nan=True):
+            return downcast
+    elif kind == "O":
+        inferred = pd.api.types.infer_dtype(series, skipna=False)
+
+        if inferred == "boolean":
+            return series.astype(bool)
+
+        if inferred in ("string", "mixed") and series.shape[0] > 0:
+            if series.nunique() / series.shape[0] <= max_category_ratio:
+                return series.astype("category")
+
+    return series
+
+## ----- Compact frame ----- ##
+
+def compact_frame(df, max_category_ratio=0.5, float_dtype="float32", exclude=None, name="DataFrame"):
+    """
+    Downcasts the integer columns to the smallest integer dtype, the float columns whose values are all
+    exact in float_dtype to it (None keeps them), boolean object columns to bool, and string columns with at most
+    max_category_ratio distinct values per row to category. The columns in exclude are kept as they are.
+    Logs the bytes saved per column and returns the compacted DataFrame.
+
+    """
+    exclude = set(exclude or [])
+
+    compacted = {}
+    total_before, total_after = 0, 0
+
+    for column in df.columns:
+        series = df[column]
+        before = series.memory_usage(deep=True, index=False)
+
+        if column not in exclude:
+            series = compacting_column(series, max_category_ratio, float_dtype)
+
+        after = series.memory_usage(deep=True, index=False)
+        compacted[column] = series
+
+        total_before += before
+        total_after += after
+
+        if after < before:
+            logging.info(f"{name}.{column}: {df[column].dtype} -> {series.dtype}, {before - after} bytes saved ({before} -> {after}).")
+
+    df = pd.DataFrame(compacted, index=df.index)
+
+    logging.info(f"{name} compacted from {total_before} to {total_after} bytes ({total_before - total_after} bytes saved).")
+
+    return df
@@ -0,0 +1,151 @@
+from rapidfuzz import fuzz, process
+
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Text in parentheses or brackets, e.g. "(Remastered)" or "[Live]"
+enclosed_pattern = r"\([^)]*\)|\[[^\]]*\]"
+
+# Version suffixes after a dash, e.g. "Song - 2011 Remaster" or "Song - Radio Edit"
+version_pattern = r"\s+-\s+.*\b(?:remaster(?:ed)?|version|edit|live|mix|mono|stereo|acoustic|demo|single)\b.*$"
+
+# Featured artists, as a suffix ("Song feat. X") or as a prefix up to a dash ("feat. X - Song")
+featured_pattern = r"(?:^|\s)(?:feat|ft|featuring)\b.*?(?:\s-\s|$)"
+
+# Everything that is not a letter, a digit or a space
+punctuation_pattern = r"[^\w\s]|_"
+
+# Leading articles, which would put "The Song" and "Song" in different blocking buckets
+article_pattern = r"^(?:the|a|an)\s+"
+
+# Titles scored against the candidates of their bucket at a time, which bounds the score matrix
+scoring_chunk_rows = 5000
+
+## ----- Functions ----- ##
+
+def normalizing_titles(titles):
+    """
+    Normalizes track titles for fuzzy matching: lowercase, without enclosed text, version suffixes,
+    featured artists, punctuation or a leading article, and with single spaces.
+
+    """
+    return (titles
+                .str.lower()
+                .str.replace(enclosed_pattern, " ", regex=True)
+                .str.replace(version_pattern, " ", regex=True)
+                .str.replace(featured_pattern, " ", regex=True)
+                .str.replace(punctuation_pattern, " ", regex=True)
+                .str.split()
+                .str.join(" ")
+                .str.replace(article_pattern, "", regex=True))
+
+def normalizing_artists(artists):
+    """
+    Normalizes artist names for fuzzy matching, joining the separators used by both datasets.
+
+    """
+    return (artists
+                .str.lower()
+                .str.replace(r"\bfeaturing\b|\bfeat\b|&|;|,|\band\b", " ", regex=True)
+                .str.replace(punctuation_pattern, " ", regex=True)
+                .str.split()
+                .str.join(" "))
+
+def blocking_keys(titles):
+    """
+    Returns the blocking key of every normalized title, its first token.
+
+    """
+    return titles.str.split(n=1).str[0]
+
+## ----- Blocking index ----- ##
+
+def building_blocking_index(grammys_df, key_column="nominee_clean", title_column="nominee", artist_column="artist"):
+    """
+    Builds the blocking index of the Grammy nominees: a dict from the first token of the normalized
+    title to the normalized titles, normalized artists and merge keys of the candidates of that bucket.
+
+    """
+    nominees = pd.DataFrame({
+        "title": normalizing_titles(grammys_df[title_column]),
+        "artist": normalizing_artists(grammys_df[artist_column]) if artist_column in grammys_df.columns else "",
+        "key": grammys_df[key_column]
+    }).dropna(subset=["title", "key"]).drop_duplicates()
+
+    nominees["artist"] = nominees["artist"].fillna("")
+    nominees["bucket"] = blocking_keys(nominees["title"])
+
+    index = {bucket: (candidates["title"].tolist(), candidates["artist"].tolist(), candidates["key"].to_numpy())
+             for bucket, candidates in nominees.dropna(subset=["bucket"]).groupby("bucket", sort=False)}
+
+    logging.info(f"Blocking index built with {len(nominees)} nominees in {len(index)} buckets.")
+
+    return index
+
+def scoring_bucket(titles, artists, candidates, threshold, artist_weight):
+    """
+    Scores the titles (and artists) of one bucket against all of its candidates with rapidfuzz
+    and returns the position of the best candidate of every title, -1 below the threshold (from 0 to 100).
+    The score is the title similarity from 0 to 100, blended with the artist similarity when
+    artists are given. Among equally scored candidates the first one is kept.
+
+    """
+    candidate_titles, candidate_artists, _ = candidates
+
+    # Titles that cannot reach the threshold even with a perfect artist score are cut by rapidfuzz
+    title_cutoff = (threshold - 100 * artist_weight) / (1 - artist_weight) if artists is not None else threshold
+    scores = process.cdist(titles, candidate_titles, scorer=fuzz.ratio, score_cutoff=max(title_cutoff, 0), dtype=np.float32, workers=-1)
+
+    if artists is not None:
+        artist_scores = process.cdist(artists, candidate_artists, scorer=fuzz.ratio, dtype=np.float32, workers=-1)
+        scores = np.where(scores > 0, (1 - artist_weight) * scores + artist_weight * artist_scores, 0)
+
+    best = scores.argmax(axis=1)
+    reached = scores[np.arange(len(titles)), best] >= threshold
+
+    return np.where(reached, best, -1)
+
+def fuzzy_matching(titles, index, threshold=0.9, artists=None, artist_weight=0.0):
+    """
+    Matches every title against the candidates of its bucket in the blocking index.
+    The score is the title similarity, blended with the artist similarity when artists are
+    given and artist_weight is greater than 0. Returns the merge key of the best candidate
+    scoring at least threshold, or None, for every title.
+
+    """
+    use_artist = artists is not None and artist_weight > 0
+
+    pairs = pd.DataFrame({
+        "title": normalizing_titles(titles),
+        "artist": normalizing_artists(artists).fillna("") if use_artist else ""
+    }, index=titles.index)
+
+    # Every distinct (title, artist) pair is scored once, bucket by bucket
+    unique_pairs = pairs.drop_duplicates().dropna(subset=["title"])
+    unique_pairs = unique_pairs.assign(bucket=blocking_keys(unique_pairs["title"])).dropna(subset=["bucket"])
+
+    # Scores from 0 to 100 as rapidfuzz, rounded so 0.9 is not read as 90.00000000000001
+    cutoff = round(threshold * 100, 6)
+
+    matches = {}
+    for bucket, group in unique_pairs.groupby("bucket", sort=False):
+        candidates = index.get(bucket)
+        if candidates is None:
+            continue
+
+        for start in range(0, group.shape[0], scoring_chunk_rows):
+            chunk = group.iloc[start:start + scoring_chunk_rows]
+            best = scoring_bucket(chunk["title"].tolist(), chunk["artist"].tolist() if use_artist else None,
+                                  candidates, cutoff, artist_weight if use_artist else 0.0)
+
+            for title, artist, position in zip(chunk["title"], chunk["artist"], best):
+                if position >= 0:
+                    matches[(title, artist)] = candidates[2][position]
+
+    logging.info(f"Fuzzy matching scored {len(unique_pairs)} distinct titles, {len(matches)} matched.")
+
+    keys = [matches.get(pair) for pair in pairs.itertuples(index=False, name=None)]
+    return pd.Series(keys, index=titles.index, dtype=object)
@@ -0,0 +1,91 @@
+from database.db_operations import creating_engine
+from transform.lookups import categories, roles_of_interest
+from monitoring.profiling import profiled
+
+from sqlalchemy import text, bindparam
+
+import pandas as pd
+import sys
+import logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Every character removed by Python's str.strip() in the pandas path, the Unicode spaces included.
+# btrim gets them as the :whitespace parameter, so no escape of a PostgreSQL string is involved
+whitespace = "".join(character for character in map(chr, range(sys.maxunicode + 1)) if character.isspace())
+
+## ----- Query ----- ##
+
+def building_grammys_query(table_name="grammy_awards_raw"):
+    """
+    Builds the PostgreSQL query equivalent to transforming_grammys_data. The artist cascade
+    (nominee when artist and workers are null, text in parentheses, workers without separators,
+    first segment before the semicolon, names with roles of interest) runs as one CASE expression.
+    The excluded categories and the whitespace trimmed by btrim are bound to the :categories and
+    :whitespace parameters, and the colon of the non-capturing group is escaped so it is not read as a parameter.
+
+    """
+    roles_pattern = "|".join(roles_of_interest)
+
+    query = f"""
+        WITH base AS (
+            SELECT
+                year, title, category, nominee, artist, workers,
+                winner AS is_nominated,
+                btrim(split_part(workers, ';', 1), :whitespace) AS first_part
+            FROM {table_name}
+            WHERE nominee IS NOT NULL
+              AND NOT (artist IS NULL AND workers IS NULL AND category IN :categories)
+        ),
+        resolved AS (
+            SELECT
+                year, title, category, nominee, is_nominated,
+                CASE
+                    WHEN artist IS NOT NULL THEN artist
+                    WHEN workers IS NULL THEN nominee
+                    WHEN workers ~ '(?n)\\((.*?)\\)' THEN substring(workers FROM '(?n)\\((.*?)\\)')
+                    WHEN workers !~ '[;,]' THEN workers
+                    WHEN strpos(first_part, ',') = 0 AND lower(first_part) !~ '{roles_pattern}' THEN first_part
+                    ELSE (
+                        SELECT btrim(string_agg(match[1], ', ' ORDER BY position), :whitespace)
+                        FROM regexp_matches(workers, '([^;]+)\\s*,\\s*(?\\:{roles_pattern})', 'gi')
+                             WITH ORDINALITY AS matches(match, position)
+                    )
+                END AS artist
+            FROM base
+        )
+        SELECT
+            year, title, category, nominee,
+            CASE WHEN artist = '(Various Artists)' THEN 'Various Artists' ELSE artist END AS artist,
+            is_nominated
+        FROM resolved
+        WHERE artist IS NOT NULL
+    """
+
+    return text(query).bindparams(bindparam("categories", value=list(categories), expanding=True),
+                                  bindparam("whitespace", value=whitespace))
+
+## ----- Grammys Transformations ----- ##
+
+@profiled()
+def transforming_grammys_in_database(table_name="grammy_awards_raw", chunksize=10000):
+    """
+    Cleans and transforms the Grammy Awards data inside PostgreSQL and returns the clean DataFrame.
+    Produces the same rows as extracting_grammys_data followed by transforming_grammys_data,
+    without shipping the dropped rows and columns to the worker.
+
+    """
+    engine = creating_engine()
+
+    try:
+        logging.info(f"Transforming the Grammy Awards data in the database ({table_name}).")
+
+        with engine.connect().execution_options(stream_results=True) as connection:
+            chunks = pd.read_sql(building_grammys_query(table_name), connection, chunksize=chunksize)
+            df = pd.concat(chunks, ignore_index=True)
+
+        logging.info(f"Transformation complete. The DataFrame now has {df.shape[0]} rows and {df.shape[1]} columns.")
+
+        return df
+    except Exception as e:
+        logging.error(f"An error has occurred: {e}")
@@ -1,3 +1,6 @@
+from monitoring.profiling import profiled
+from transform.lookups import excluded_categories, roles_contained_pattern, roles_extraction_pattern
+
 import pandas as pd
 import re
 import logging
@@ -54,37 +57,49 @@ def extract_roles_based_on_interest(workers, roles):
     matches = re.findall(pattern, workers, flags=re.IGNORECASE)
     return ", ".join(matches).strip() if matches else None
 
-# Define the categories to filter out
-categories = [
-    "Best Classical Vocal Soloist Performance",
-    "Best Classical Vocal Performance",
-    "Best Small Ensemble Performance (With Or Without Conductor)",
-    "Best Classical Performance - Instrumental Soloist Or Soloists (With Or Without Orchestra)",
-    "Most Promising New Classical Recording Artist",
-    "Best Classical Performance - Vocal Soloist (With Or Without Orchestra)",
-    "Best New Classical Artist",
-    "Best Classical Vocal Soloist",
-    "Best Performance - Instrumental Soloist Or Soloists (With Or Without Orchestra)",
-    "Best Classical Performance - Vocal Soloist"
-]
+# Precompiled patterns of the artist resolution cascade, the role patterns come from transform.lookups
+parentheses_pattern = re.compile(r'\((.*?)\)')
+separators_pattern = re.compile(r'[;,]')
 
-# Define roles of interest
-roles_of_interest = [
-    "artist",
-    "artists",
-    "composer",
-    "conductor",
-    "conductor/soloist",
-    "choir director",
-    "chorus master",
-    "graphic designer",
-    "soloist",
-    "soloists",
-    "ensembles"
-]
+def resolving_artists(df):
+    """
+    Fills the null values of 'artist' from 'workers' with the same cascade as extract_artist,
+    move_workers_to_artist, extract_artists_before_semicolon and extract_roles_based_on_interest.
+    Every step runs vectorized and only over the rows that are still null.
+    
+    """
+    artist = df["artist"].astype(object).reset_index(drop=True)
+    workers = df["workers"].reset_index(drop=True)
+    
+    # First step: artist within parentheses
+    pending = artist.isna() & workers.notna()
+    artist[pending] = workers[pending].str.extract(parentheses_pattern, expand=False)
+    
+    # Second step: workers without separators
+    pending = artist.isna() & workers.notna()
+    candidates = workers[pending]
+    moved = candidates[~candidates.str.contains(separators_pattern)]
+    artist[moved.index] = moved
+    
+    # Third step: first segment before the semicolon without roles of interest
+    pending = artist.isna() & workers.notna()
+    first_part = workers[pending].str.split(";", n=1).str[0].str.strip()
+    valid = ~first_part.str.contains(",", regex=False) & ~first_part.str.lower().str.contains(roles_contained_pattern)
+    artist[first_part[valid].index] = first_part[valid]
+    
+    # Fourth step: names associated with the roles of interest
+    pending = artist.isna() & workers.notna()
+    matches = workers[pending].str.findall(roles_extraction_pattern)
+    matches = matches[matches.str.len() > 0]
+    artist[matches.index] = matches.str.join(", ").str.strip()
+    
+    artist.index = df.index
+    
+    return artist
 
 ## ----- Grammys Transformations ----- ##
 
+@profiled()
 def transforming_grammys_data(df):
     """
     Cleans and transforms the Grammy Awards data and returns the DataFrame.
@@ -96,7 +111,7 @@ def transforming_grammys_data(df):
         df = df.rename(columns={"winner": "is_nominated"})
         
         # Dropping unnecessary columns
-        df = df.drop(columns=["published_at", "updated_at", "img"])
+        df = df.drop(columns=["published_at", "updated_at", "img"], errors="ignore")
         
         # Dropping null values - Nominee case
         df = df.dropna(subset=["nominee"])
@@ -104,31 +119,14 @@ def transforming_grammys_data(df):
         # Dropping null values - Artist case
         both_null_values = df[df["artist"].isna() & df["workers"].isna()]
         
-        both_filtered = both_null_values[both_null_values["category"].isin(categories)]
+        both_filtered = both_null_values[both_null_values["category"].isin(excluded_categories)]
         
         both_null_values = both_null_values.drop(both_filtered.index)
         df = df.drop(both_filtered.index)
         
         df.loc[both_null_values.index, "artist"] = both_null_values["nominee"]
         
-        df["artist"] = df.apply(
-            lambda row: extract_artist(row["workers"]) if pd.isna(row["artist"]) else row["artist"],
-            axis=1
-        )
-        
-        df["artist"] = df.apply(move_workers_to_artist, axis=1)
-        
-        df["artist"] = df.apply(
-            lambda row: extract_artists_before_semicolon(row["workers"], roles_of_interest)
-            if pd.isna(row["artist"]) else row["artist"],
-            axis=1
-        )
-        
-        df["artist"] = df.apply(
-            lambda row: extract_roles_based_on_interest(row["workers"], roles_of_interest)
-            if pd.isna(row["artist"]) else row["artist"],
-            axis=1
-        )
+        df["artist"] = resolving_artists(df)
         
         df = df.dropna(subset=["artist"])
         
@@ -0,0 +1,170 @@
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+import re
+
+# Version of the lookup tables, bumped on every change of their contents. The transform cache
+# fingerprints this module (see transform.transform_cache), so a new version also invalidates it.
+lookups_version = "1"
+
+# Every table is built once at import and shared read-only by the pandas, pushdown and out-of-core transforms
+
+## ----- Spotify genres ----- ##
+
+# Categories of the track genres
+genre_mapping = MappingProxyType({
+    'Rock/Metal': (
+        'alt-rock', 'alternative', 'black-metal', 'death-metal', 'emo', 'grindcore',
+        'hard-rock', 'hardcore', 'heavy-metal', 'metal', 'metalcore', 'psych-rock',
+        'punk-rock', 'punk', 'rock-n-roll', 'rock', 'grunge', 'j-rock', 'goth',
+        'industrial', 'rockabilly', 'indie'
+    ),
+
+    'Pop': (
+        'pop', 'indie-pop', 'power-pop', 'k-pop', 'j-pop', 'mandopop', 'cantopop',
+        'pop-film', 'j-idol', 'synth-pop'
+    ),
+
+    'Electronic/Dance': (
+        'edm', 'electro', 'electronic', 'house', 'deep-house', 'progressive-house',
+        'techno', 'trance', 'dubstep', 'drum-and-bass', 'dub', 'garage', 'idm',
+        'club', 'dance', 'minimal-techno', 'detroit-techno', 'chicago-house',
+        'breakbeat', 'hardstyle', 'j-dance', 'trip-hop'
+    ),
+
+    'Urban': (
+        'hip-hop', 'r-n-b', 'dancehall', 'reggaeton', 'reggae'
+    ),
+
+    'Latino': (
+        'brazil', 'salsa', 'samba', 'spanish', 'pagode', 'sertanejo',
+        'mpb', 'latin', 'latino'
+    ),
+
+    'Global Sounds': (
+        'indian', 'iranian', 'malay', 'turkish', 'tango', 'afrobeat', 'french', 'german', 'british', 'swedish'
+    ),
+
+    'Jazz and Soul': (
+        'blues', 'bluegrass', 'funk', 'gospel', 'jazz', 'soul', 'groove', 'disco', 'ska'
+    ),
+
+    'Varied Themes': (
+        'children', 'disney', 'forro', 'kids', 'party', 'romance', 'show-tunes',
+        'comedy', 'anime'
+    ),
+
+    'Instrumental': (
+        'acoustic', 'classical',  'guitar', 'piano',
+        'world-music', 'opera', 'new-age'
+    ),
+
+    'Mood': (
+        'ambient', 'chill', 'happy', 'sad', 'sleep', 'study'
+    ),
+
+    'Single Genre': (
+        'country', 'honky-tonk', 'folk', 'singer-songwriter'
+    )
+})
+
+genre_category_mapping = MappingProxyType({genre: category for category, genres in genre_mapping.items() for genre in genres})
+
+# The mapped track_genre is a Categorical over the genre categories. Every known genre is a position
+# of genres_index, and genre_codes holds the code of its category at that position.
+genre_dtype = pd.CategoricalDtype(list(genre_mapping))
+genres_index = pd.Index(list(genre_category_mapping), dtype=object)
+genre_codes = genre_dtype.categories.get_indexer(list(genre_category_mapping.values())).astype(np.int8)
+genre_codes.flags.writeable = False
+
+## ----- Grammys categories and roles ----- ##
+
+# Categories filtered out when both artist and workers are null, in their original order for the SQL backends
+categories = (
+    "Best Classical Vocal Soloist Performance",
+    "Best Classical Vocal Performance",
+    "Best Small Ensemble Performance (With Or Without Conductor)",
+    "Best Classical Performance - Instrumental Soloist Or Soloists (With Or Without Orchestra)",
+    "Most Promising New Classical Recording Artist",
+    "Best Classical Performance - Vocal Soloist (With Or Without Orchestra)",
+    "Best New Classical Artist",
+    "Best Classical Vocal Soloist",
+    "Best Performance - Instrumental Soloist Or Soloists (With Or Without Orchestra)",
+    "Best Classical Performance - Vocal Soloist"
+)
+
+excluded_categories = frozenset(categories)
+
+# Roles of interest of the workers column
+roles_of_interest = (
+    "artist",
+    "artists",
+    "composer",
+    "conductor",
+    "conductor/soloist",
+    "choir director",
+    "chorus master",
+    "graphic designer",
+    "soloist",
+    "soloists",
+    "ensembles"
+)
+
+# Characters escaped in the role patterns, the ones with a meaning in Python, RE2 and PostgreSQL regexes
+special_characters = frozenset(".^$*+?{}[]\\|()")
+
+## ----- Functions ----- ##
+
+def building_alternation(words):
+    """
+    Returns a regex alternation of the words factored as a prefix trie ("artist(?:s)?|c(?:o(?:mposer|...)))"),
+    so the regex engine tries every shared prefix once per position instead of once per word.
+
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for character in word:
+            node = node.setdefault(character, {})
+        node[""] = {}
+
+    def building_node(node):
+        branches = [("\\" + character if character in special_characters else character) + building_node(child)
+                    for character, child in sorted(node.items()) if character]
+
+        if not branches:
+            return ""
+
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+        # A word ends at this node, so the rest is optional
+        return f"(?:{body})?" if "" in node else body
+
+    return building_node(trie)
+
+def mapping_genres(track_genre):
+    """
+    Maps the track genres to their categories and returns them as a Categorical of genre_dtype,
+    with nulls for the genres out of the mapping. A categorical input is remapped on its codes,
+    so only its categories are looked up; other inputs are looked up once per value.
+
+    """
+    if isinstance(track_genre.dtype, pd.CategoricalDtype):
+        positions = genres_index.get_indexer(track_genre.cat.categories)
+        category_codes = np.append(np.where(positions >= 0, genre_codes[positions], -1), -1)
+
+        # Null values have code -1, which takes the trailing -1 of category_codes
+        codes = category_codes[track_genre.cat.codes.to_numpy()]
+    else:
+        positions = genres_index.get_indexer(track_genre)
+        codes = np.where(positions >= 0, genre_codes[positions], -1)
+
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=genre_dtype), index=track_genre.index, name=track_genre.name)
+
+## ----- Patterns ----- ##
+
+roles_alternation = building_alternation(roles_of_interest)
+
+roles_contained_pattern = re.compile(roles_alternation)
+roles_extraction_pattern = re.compile(r'([^;]+)\s*,\s*(?:' + roles_alternation + r')', flags=re.IGNORECASE)
@@ -1,17 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import os
+import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import logging
 
+from transform.fuzzy_match import building_blocking_index, fuzzy_matching
+from artifacts.artifact_store import ArrowArtifactStore
+from monitoring.profiling import profiled
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 log = logging.getLogger(__name__)
 
+# Number of partitions of the left rows merged in parallel processes, 1 keeps the single in-memory merge
+merge_partitions = int(os.getenv("MERGE_PARTITIONS", "1"))
+
+# Matching the tracks without an exact match to their closest nominee (see transform.fuzzy_match)
+fuzzy_merge = os.getenv("FUZZY_MATCHING", "false").lower() == "true"
+fuzzy_merge_threshold = float(os.getenv("FUZZY_THRESHOLD", "0.9"))
+fuzzy_merge_artist_weight = float(os.getenv("FUZZY_ARTIST_WEIGHT", "0"))
+
+# Title and category of the tracks without a nomination
+not_applicable = "Not applicable"
+
 ## ---- Functions ---- ##
 
 def fill_null_values(df, columns, value):
     """
     Fills null values in specified columns with a given value.
+    Categorical columns get the value added to their categories first.
     
     """
     for column in columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and value not in df[column].cat.categories:
+            df[column] = df[column].cat.add_categories([value])
+        
         df[column] = df[column].fillna(value)
 
 def drop_columns(df, columns):
@@ -20,14 +45,101 @@ def drop_columns(df, columns):
     
     """
     df.drop(columns=columns, inplace=True, errors="ignore")
+
+def writing_keys(df, column, path):
+    """
+    Writes the join key column of a DataFrame to an Arrow IPC file, which the merge workers memory-map.
+    
+    """
+    ArrowArtifactStore().write_table(pa.Table.from_pandas(df[[column]], preserve_index=False), path)
+
+def joining_positions(task):
+    """
+    Left-joins the left keys of the rows in [low, high) with every right key. Runs inside the worker
+    processes of partitioned_merge, and returns the positions of the left and right rows of every
+    joined row, in the order of the merge, with -1 for the left rows without a match.
+    
+    """
+    left_path, right_path, low, high = task
+    store = ArrowArtifactStore()
+    
+    left = store.read_table(left_path).slice(low, high - low).to_pandas()
+    right = store.read_table(right_path).to_pandas()
+    
+    left.columns, right.columns = ["key"], ["key"]
+    left["left_position"] = np.arange(low, high)
+    right["right_position"] = np.arange(right.shape[0])
+    
+    joined = left.merge(right, how="left", on="key")
+    
+    return joined["left_position"].to_numpy(), joined["right_position"].fillna(-1).to_numpy().astype("int64")
+
+def partitioned_merge(left, right, left_on, right_on, suffixes=("_x", "_y"), partitions=4, max_workers=None, how="left"):
+    """
+    Left- (or inner-) joins two DataFrames by splitting the left rows in contiguous ranges joined in a
+    process pool. The workers only get the bounds of their range and the Arrow files of both key columns,
+    and return the positions of the joined rows, so neither side is copied or pickled. The ranges follow
+    the left rows, so the positions come back in the order of left.merge(right, how="left"), and the rows
+    are taken from both sides once, column by column, into the same rows and columns with a fresh RangeIndex.
+    The inner join keeps the matched rows of the left join, in the left row order, while pandas' inner
+    merge groups the rows of a repeated left key.
+    
+    """
+    bounds = np.linspace(0, left.shape[0], partitions + 1).astype("int64")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        left_path, right_path = os.path.join(directory, "left.arrow"), os.path.join(directory, "right.arrow")
+        writing_keys(left, left_on, left_path)
+        writing_keys(right, right_on, right_path)
+        
+        tasks = [(left_path, right_path, low, high) for low, high in zip(bounds[:-1], bounds[1:])]
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            positions = list(executor.map(joining_positions, tasks))
+    
+    left_positions = np.concatenate([left_position for left_position, _ in positions])
+    right_positions = np.concatenate([right_position for _, right_position in positions])
+    del positions
+    
+    if how == "inner":
+        matched = right_positions >= 0
+        left_positions, right_positions = left_positions[matched], right_positions[matched]
+    
+    # The right rows without a match are filled with nulls, upcasting the dtypes as the merge does
+    right = right.reset_index(drop=True)
+    index = pd.RangeIndex(left_positions.shape[0])
+    overlapping = set(left.columns) & set(right.columns)
+    
+    columns = {}
+    for column in left.columns:
+        values = left[column].take(left_positions)
+        columns[column + suffixes[0] if column in overlapping else column] = values.set_axis(index, copy=False)
+    for column in right.columns:
+        values = right[column].reindex(right_positions) if how == "left" else right[column].take(right_positions)
+        columns[column + suffixes[1] if column in overlapping else column] = values.set_axis(index, copy=False)
+    
+    return pd.DataFrame(columns, copy=False)
     
 ## ---- Merge datasets ---- ##
 
-def merging_datasets(spotify_df: pd.DataFrame, grammys_df: pd.DataFrame) -> pd.DataFrame:
+@profiled()
+def merging_datasets(spotify_df: pd.DataFrame, grammys_df: pd.DataFrame, partitions: int = None,
+                     fuzzy: bool = None, fuzzy_threshold: float = None, artist_weight: float = None,
+                     how: str = "left") -> pd.DataFrame:
     """
     Merge the two datasets based on "track_name" and "nominee".
+    With more than one partition the join runs over ranges of the Spotify rows in a process pool.
+    With fuzzy matching, the tracks without an exact match are matched against the nominees of
+    their blocking bucket (see transform.fuzzy_match), optionally weighting the artist similarity.
+    The partitions and the fuzzy matching options default to MERGE_PARTITIONS and FUZZY_* of the environment.
+    With how="inner" only the tracks with a nomination are kept, which is how the nominations
+    of an incremental run are merged.
     
     """
+    partitions = partitions or merge_partitions
+    fuzzy = fuzzy_merge if fuzzy is None else fuzzy
+    fuzzy_threshold = fuzzy_merge_threshold if fuzzy_threshold is None else fuzzy_threshold
+    artist_weight = fuzzy_merge_artist_weight if artist_weight is None else artist_weight
 
     logging.info("Starting dataset merge.")
     
@@ -38,19 +150,50 @@ def merging_datasets(spotify_df: pd.DataFrame, grammys_df: pd.DataFrame) -> pd.D
         # Clean "track_name" and "nominee" columns for better matching
         spotify_df["track_name_clean"] = spotify_df["track_name"].str.lower().str.strip()
         grammys_df["nominee_clean"] = grammys_df["nominee"].str.lower().str.strip()
+        
+        # Match the remaining tracks to their closest nominee
+        if fuzzy:
+            unmatched = ~spotify_df["track_name_clean"].isin(grammys_df["nominee_clean"])
+            
+            index = building_blocking_index(grammys_df)
+            keys = fuzzy_matching(
+                spotify_df.loc[unmatched, "track_name"],
+                index,
+                threshold=fuzzy_threshold,
+                artists=spotify_df.loc[unmatched, "artists"],
+                artist_weight=artist_weight
+            ).dropna()
+            
+            spotify_df.loc[keys.index, "track_name_clean"] = keys
+            
+            logging.info(f"{keys.shape[0]} tracks matched to a nominee by fuzzy matching.")
 
-        # Merge the datasets on the cleaned "track_name" and "nominee" columns
-        df_merged = spotify_df.merge(
-            grammys_df,
-            how="left",
-            left_on="track_name_clean",
-            right_on="nominee_clean",
-            suffixes=("", "_grammys")
-        )
+        # Merge the datasets on the cleaned "track_name" and "nominee" columns.
+        # The inner merges of the incremental runs are small, and keep the row order of pandas' inner merge
+        if partitions > 1 and how == "left":
+            logging.info(f"Merging in {partitions} partitions.")
+            
+            df_merged = partitioned_merge(
+                spotify_df,
+                grammys_df,
+                left_on="track_name_clean",
+                right_on="nominee_clean",
+                suffixes=("", "_grammys"),
+                partitions=partitions,
+                how=how
+            )
+        else:
+            df_merged = spotify_df.merge(
+                grammys_df,
+                how=how,
+                left_on="track_name_clean",
+                right_on="nominee_clean",
+                suffixes=("", "_grammys")
+            )
 
         # Fill null values in specified columns
         fill_columns = ["title", "category"]
-        fill_null_values(df_merged, fill_columns, "Not applicable")
+        fill_null_values(df_merged, fill_columns, not_applicable)
 
         fill_column = ["is_nominated"]
         fill_null_values(df_merged, fill_column, False)
@@ -0,0 +1,376 @@
+from dotenv import load_dotenv
+
+from transform.spotify_transform import derived_bins
+from transform.lookups import genre_category_mapping, categories, roles_of_interest, roles_extraction_pattern
+from monitoring.profiling import profiled
+
+import os
+import sys
+import logging
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Reading the environment variables
+load_dotenv("./env/.env")
+
+# Memory of the DuckDB engine, the operators spill to the temporary directory beyond it
+duckdb_memory_limit = os.getenv("DUCKDB_MEMORY_LIMIT", "2GB")
+duckdb_temp_directory = os.getenv("DUCKDB_TEMP_DIRECTORY", "./data/duckdb_tmp")
+duckdb_threads = os.getenv("DUCKDB_THREADS")
+
+# Spotify rows merged per ordered slice, a slice of the joined rows has to be sorted in memory
+merge_slice_rows = int(os.getenv("MERGE_SLICE_ROWS", "1000000"))
+
+# Every character removed by Python's str.strip() in the pandas path
+whitespace = "".join(character for character in map(chr, range(sys.maxunicode + 1)) if character.isspace())
+
+# Columns dropped by the pandas transforms
+spotify_dropped = ["Unnamed: 0", "loudness", "mode", "duration_ms", "key", "tempo", "valence", "speechiness",
+                   "acousticness", "instrumentalness", "liveness", "time_signature"]
+grammys_dropped = ["published_at", "updated_at", "img", "workers"]
+merge_dropped = ["year", "artist", "nominee"]
+
+## ----- Functions ----- ##
+
+def connecting_duckdb(memory_limit=None, temp_directory=None):
+    """
+    Returns an in-memory DuckDB connection whose operators spill to temp_directory beyond memory_limit.
+
+    """
+    temp_directory = temp_directory or duckdb_temp_directory
+    os.makedirs(temp_directory, exist_ok=True)
+
+    config = {"memory_limit": memory_limit or duckdb_memory_limit, "temp_directory": temp_directory}
+    if duckdb_threads:
+        config["threads"] = int(duckdb_threads)
+
+    return duckdb.connect(config=config)
+
+def quoting(value):
+    """
+    Returns a SQL string literal of the value.
+
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+def quoting_identifier(name):
+    """
+    Returns a SQL identifier of the column name.
+
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def globbing_source(source):
+    """
+    Returns the glob of the Parquet files of a source: a file, a glob, or a directory of
+    (possibly Hive-partitioned) Parquet files.
+
+    """
+    if os.path.isdir(source):
+        return os.path.join(source, "**", "*.parquet")
+    return source
+
+def scanning_source(source):
+    """
+    Returns the SQL relation of the Parquet files of a source, with the position of every row.
+    The files are numbered in name order, so the position follows the order in which the pandas
+    path reads the same files, without sorting the rows themselves.
+
+    """
+    pattern = quoting(globbing_source(source))
+
+    return f"""(
+        SELECT
+            (files.file_number << 40) + data.file_row_number AS position,
+            data.* EXCLUDE (filename, file_row_number)
+        FROM read_parquet({pattern}, filename = true, file_row_number = true, hive_partitioning = false) AS data
+        JOIN (SELECT file AS filename, row_number() OVER (ORDER BY file) AS file_number FROM glob({pattern})) AS files
+            USING (filename)
+    )"""
+
+def describing_source(connection, source):
+    """
+    Returns the column names and DuckDB types of a source, read from the Parquet footers.
+
+    """
+    rows = connection.execute(f"DESCRIBE SELECT * FROM read_parquet({quoting(globbing_source(source))})").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+def typed_literal(value, column_type):
+    """
+    Returns a threshold literal cast to the type of the column, so FLOAT columns are compared
+    with the float32 value of the threshold, as in the pandas path (see spotify_transform.as_source_dtype).
+
+    """
+    if column_type in ("FLOAT", "DOUBLE"):
+        return f"CAST({value!r} AS {column_type})"
+    return repr(value)
+
+def binning_expression(column, column_type, labels, edges):
+    """
+    Returns the CASE expression of a derived bin column.
+
+    """
+    source = quoting_identifier(column)
+    conditions = [f"WHEN {source} {'<=' if inclusive else '<'} {typed_literal(edge, column_type)} THEN {quoting(label)}"
+                  for (edge, inclusive), label in zip(edges, labels)]
+
+    return f"CASE {' '.join(conditions)} ELSE {quoting(labels[-1])} END"
+
+def slicing_positions(connection, source, slice_rows):
+    """
+    Yields the (low, high) position ranges of consecutive slices of slice_rows rows of a source,
+    numbering the files as scanning_source does. The row counts are read from the Parquet footers.
+
+    """
+    files = connection.execute(f"SELECT file FROM glob({quoting(globbing_source(source))}) ORDER BY file").fetchall()
+
+    for file_number, (file,) in enumerate(files, start=1):
+        rows = pq.read_metadata(file).num_rows
+        for start in range(0, rows, slice_rows):
+            yield (file_number << 40) + start, (file_number << 40) + min(start + slice_rows, rows)
+
+def copying_query(connection, query, destination):
+    """
+    Writes the rows of the query to a Parquet file and returns their number.
+
+    """
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    connection.execute(f"COPY ({query}) TO {quoting(destination)} (FORMAT parquet)")
+
+    return connection.execute(f"SELECT count(*) FROM read_parquet({quoting(destination)})").fetchone()[0]
+
+## ----- Queries ----- ##
+
+def building_spotify_query(source, columns):
+    """
+    Builds the DuckDB query equivalent to transforming_spotify_data. The null filter is pushed to
+    the scan, the dedup steps are hash aggregations on the row positions, which DuckDB spills
+    to disk. The popularity ties keep the earliest row, as the stable sort of the pandas path does.
+
+    """
+    values = [column for column in columns if column != "Unnamed: 0"]
+    quoted = {column: quoting_identifier(column) for column in values}
+
+    genres = ", ".join(f"({quoting(genre)}, {quoting(category)})" for genre, category in genre_category_mapping.items())
+    not_null = " AND ".join(f"{quoted[column]} IS NOT NULL" for column in values)
+
+    # Rows that only differ in track_id and album_name, comparing the mapped track_genre
+    content_columns = ", ".join(quoted[column] for column in values if column not in ["track_id", "album_name"])
+
+    derived = [f"CAST({quoted['duration_ms']} // 60000 AS BIGINT) AS duration_min"]
+    for column, spec in derived_bins.items():
+        expression = binning_expression(spec["source"], columns[spec["source"]], spec["labels"], spec["edges"])
+        derived.append(f"{expression} AS {quoting_identifier(column)}")
+    derived.append(f"{quoted['liveness']} > {typed_literal(0.8, columns['liveness'])} AS live_performance")
+
+    kept = ", ".join(quoted[column] for column in values if column not in spotify_dropped)
+
+    return f"""
+        WITH genres (genre, category) AS (VALUES {genres}),
+        complete AS (
+            SELECT source.position, {', '.join(f'source.{quoted[column]}' for column in values if column != 'track_genre')},
+                   genres.category AS track_genre
+            FROM {scanning_source(source)} AS source
+            LEFT JOIN genres ON source.track_genre = genres.genre
+            WHERE {not_null}
+        ),
+        first_ids AS (
+            SELECT * FROM complete
+            SEMI JOIN (SELECT min(position) AS position FROM complete GROUP BY track_id) USING (position)
+        ),
+        distinct_rows AS (
+            SELECT * FROM first_ids
+            SEMI JOIN (SELECT min(position) AS position FROM first_ids GROUP BY {content_columns}) USING (position)
+        ),
+        most_popular AS (
+            SELECT min(position) AS position
+            FROM distinct_rows
+            JOIN (SELECT track_name, artists, max(popularity) AS popularity FROM distinct_rows GROUP BY track_name, artists)
+                USING (track_name, artists, popularity)
+            GROUP BY track_name, artists
+        )
+        SELECT {kept}, {', '.join(derived)}
+        FROM distinct_rows
+        SEMI JOIN most_popular USING (position)
+        ORDER BY position
+    """
+
+def building_grammys_query(source, columns):
+    """
+    Builds the DuckDB query equivalent to transforming_grammys_data, with the artist cascade
+    as one CASE expression (see grammys_pushdown.building_grammys_query for the PostgreSQL one).
+
+    """
+    trimmed = quoting(whitespace)
+    excluded = ", ".join(quoting(category) for category in categories)
+    roles_contained = " OR ".join(f"contains(lower(first_part), {quoting(role)})" for role in roles_of_interest)
+    roles_pattern = quoting("(?i)" + roles_extraction_pattern.pattern)
+
+    selected = []
+    for column in columns:
+        if column in grammys_dropped:
+            continue
+        if column == "winner":
+            selected.append("winner AS is_nominated")
+        elif column == "artist":
+            selected.append("CASE WHEN artist = '(Various Artists)' THEN 'Various Artists' ELSE artist END AS artist")
+        else:
+            selected.append(quoting_identifier(column))
+
+    return f"""
+        WITH base AS (
+            SELECT *, trim(split_part(workers, ';', 1), {trimmed}) AS first_part
+            FROM {scanning_source(source)}
+            WHERE nominee IS NOT NULL
+              AND NOT (artist IS NULL AND workers IS NULL AND coalesce(category IN ({excluded}), false))
+        ),
+        resolved AS (
+            SELECT * REPLACE (
+                CASE
+                    WHEN artist IS NOT NULL THEN artist
+                    WHEN workers IS NULL THEN nominee
+                    WHEN regexp_matches(workers, '\\((.*?)\\)') THEN regexp_extract(workers, '\\((.*?)\\)', 1)
+                    WHEN NOT regexp_matches(workers, '[;,]') THEN workers
+                    WHEN NOT contains(first_part, ',') AND NOT ({roles_contained}) THEN first_part
+                    WHEN len(regexp_extract_all(workers, {roles_pattern}, 1)) > 0
+                        THEN trim(array_to_string(regexp_extract_all(workers, {roles_pattern}, 1), ', '), {trimmed})
+                END AS artist
+            )
+            FROM base
+        )
+        SELECT {', '.join(selected)}
+        FROM resolved
+        WHERE artist IS NOT NULL
+        ORDER BY position
+    """
+
+def building_merge_query(spotify_source, grammys_source, spotify_columns, grammys_columns, low=0, high=None):
+    """
+    Builds the DuckDB query equivalent to merging_datasets without fuzzy matching: a left join
+    on the lowercased and stripped titles, in the row order of pandas' left merge, without the id column.
+    Only the Spotify rows with a position in [low, high) are merged.
+
+    """
+    trimmed = quoting(whitespace)
+    filled = {"title": "'Not applicable'", "category": "'Not applicable'", "is_nominated": "false"}
+
+    selected = [f"spotify.{quoting_identifier(column)}" for column in spotify_columns]
+    for column in grammys_columns:
+        if column in merge_dropped:
+            continue
+
+        name = column + "_grammys" if column in spotify_columns else column
+        value = f"grammys.{quoting_identifier(column)}"
+        if column in filled:
+            value = f"coalesce({value}, {filled[column]})"
+        selected.append(f"{value} AS {quoting_identifier(name)}")
+
+    return f"""
+        WITH spotify AS (
+            SELECT *, lower(trim(track_name, {trimmed})) AS track_name_clean FROM {scanning_source(spotify_source)}
+            WHERE position >= {low}{f" AND position < {high}" if high is not None else ""}
+        ),
+        grammys AS (
+            SELECT *, lower(trim(nominee, {trimmed})) AS nominee_clean FROM {scanning_source(grammys_source)}
+        )
+        SELECT {', '.join(selected)}
+        FROM spotify
+        LEFT JOIN grammys ON spotify.track_name_clean = grammys.nominee_clean
+        ORDER BY spotify.position, grammys.position
+    """
+
+## ----- Out-of-core Transformations ----- ##
+
+@profiled()
+def transforming_spotify_out_of_core(source, destination):
+    """
+    Cleans and transforms the Spotify Parquet data with DuckDB and writes it to a Parquet file.
+    Produces the same rows and columns as transforming_spotify_data, without loading the data in memory.
+    Returns the number of rows written.
+
+    """
+    connection = connecting_duckdb()
+
+    try:
+        logging.info(f"Transforming the Spotify data out of core ({source}).")
+
+        rows = copying_query(connection, building_spotify_query(source, describing_source(connection, source)), destination)
+
+        logging.info(f"The Spotify data has been transformed into {destination}. {rows} rows.")
+
+        return rows
+    except Exception as e:
+        logging.error(f"An error has occurred: {e}.")
+    finally:
+        connection.close()
+
+@profiled()
+def transforming_grammys_out_of_core(source, destination):
+    """
+    Cleans and transforms the Grammy Awards Parquet data with DuckDB and writes it to a Parquet file.
+    Produces the same rows and columns as transforming_grammys_data. Returns the number of rows written.
+
+    """
+    connection = connecting_duckdb()
+
+    try:
+        logging.info(f"Transforming the Grammy Awards data out of core ({source}).")
+
+        rows = copying_query(connection, building_grammys_query(source, describing_source(connection, source)), destination)
+
+        logging.info(f"The Grammy Awards data has been transformed into {destination}. {rows} rows.")
+
+        return rows
+    except Exception as e:
+        logging.error(f"An error has occurred: {e}")
+    finally:
+        connection.close()
+
+@profiled()
+def merging_datasets_out_of_core(spotify_source, grammys_source, destination, slice_rows=None):
+    """
+    Merges the clean Spotify and Grammys Parquet data with DuckDB and writes it to a Parquet file.
+    Produces the same rows and columns as merging_datasets. The Spotify rows are merged in ordered
+    slices of slice_rows rows streamed to the file, since DuckDB cannot spill the sort of the
+    whole joined rows, and the ids are numbered while streaming. Returns the number of rows written.
+
+    """
+    slice_rows = slice_rows or merge_slice_rows
+    connection = connecting_duckdb()
+    writer = None
+
+    try:
+        logging.info("Starting dataset merge out of core.")
+
+        columns = (describing_source(connection, spotify_source), describing_source(connection, grammys_source))
+
+        schema = connection.execute(f"SELECT * FROM ({building_merge_query(spotify_source, grammys_source, *columns)}) LIMIT 0").arrow().schema
+        schema = schema.insert(0, pa.field("id", pa.int64()))
+
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        writer = pq.ParquetWriter(destination, schema)
+
+        rows = 0
+        for low, high in slicing_positions(connection, spotify_source, slice_rows):
+            query = building_merge_query(spotify_source, grammys_source, *columns, low=low, high=high)
+
+            for batch in connection.execute(query).fetch_record_batch():
+                ids = pa.array(np.arange(rows, rows + batch.num_rows, dtype="int64"))
+                writer.write_batch(pa.RecordBatch.from_arrays([ids, *batch.columns], schema=schema))
+                rows += batch.num_rows
+
+        logging.info(f"Merge process completed into {destination}. {rows} rows.")
+
+        return rows
+    except Exception as e:
+        logging.error(f"An error occurred during the merge process. {e}")
+    finally:
+        if writer is not None:
+            writer.close()
+        connection.close()
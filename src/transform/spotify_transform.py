@@ -1,3 +1,7 @@
+from monitoring.profiling import profiled
+from transform.lookups import mapping_genres
+
+import numpy as np
 import pandas as pd
 import logging
 
@@ -24,7 +28,7 @@ def categorize_popularity(popularity):
     """
     if popularity <= 30:
         return "Low Popularity"
-    elif 31 <= popularity <= 70:
+    elif popularity <= 70:
         return "Average Popularity"
     else:
         return "High Popularity"
@@ -36,13 +40,100 @@ def determine_mood(valence):
     """
     if valence <= 0.3:
         return "Sad"
-    elif 0.31 <= valence <= 0.6:
+    elif valence <= 0.6:
         return "Neutral"
     else:
         return "Happy"
+
+# Bins of the derived columns. Every bin but the last one is given by its upper edge
+# and whether that edge belongs to the bin; values above every edge fall in the last label.
+derived_bins = {
+    "duration_category": {
+        "source": "duration_ms",
+        "labels": ["Short", "Average", "Long"],
+        "edges": [(150000, False), (300000, True)]
+    },
+    "popularity_category": {
+        "source": "popularity",
+        "labels": ["Low Popularity", "Average Popularity", "High Popularity"],
+        "edges": [(30, True), (70, True)]
+    },
+    "track_mood": {
+        "source": "valence",
+        "labels": ["Sad", "Neutral", "Happy"],
+        "edges": [(0.3, True), (0.6, True)]
+    }
+}
+
+def as_source_dtype(values, threshold):
+    """
+    Casts a threshold to the dtype of float values, so that the float32 columns of the streamed
+    extract (see extract.spotify_extract.spotify_dtypes) compare against the float32 value of the
+    threshold (float32(0.3) is slightly greater than 0.3).
+    
+    """
+    if values.dtype.kind == "f":
+        return values.dtype.type(threshold)
+    return threshold
+
+def binning_column(values, labels, edges):
+    """
+    Assigns each value to its bin and returns the labels as an ordered Categorical.
+    
+    """
+    conditions = [values <= as_source_dtype(values, edge) if inclusive else values < as_source_dtype(values, edge)
+                  for edge, inclusive in edges]
+    codes = np.select(conditions, list(range(len(edges))), default=len(edges))
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+def building_derived_columns(df, bins=None):
+    """
+    Computes every derived column of the Spotify DataFrame in one vectorized pass.
+    
+    """
+    bins = bins or derived_bins
+    
+    derived = {"duration_min": (df["duration_ms"] // 60000).astype(int)}
+    
+    for column, spec in bins.items():
+        derived[column] = pd.Series(binning_column(df[spec["source"]], spec["labels"], spec["edges"]), index=df.index)
+    
+    derived["live_performance"] = df["liveness"] > as_source_dtype(df["liveness"], 0.8)
+    
+    return df.assign(**derived)
+
+def deduplicating_tracks(df, track_genre):
+    """
+    Returns the positions of the rows kept by the dedup of the Spotify DataFrame, in their original order.
+    Keeps the rows without nulls, the first row of every track_id, the first row of the rows that only
+    differ in track_id and album_name (comparing the mapped track_genre), and then the most popular row
+    of every track_name and artists pair, the earliest one among equally popular rows.
+    The steps work on positions and compare the values themselves with DataFrame.duplicated, so no hash
+    collision drops a distinct track, and only the compared columns are copied before the final take.
+    
+    """
+    positions = np.flatnonzero(df.notna().all(axis=1).to_numpy())
+    
+    # First and second steps: keeping the first row of every track_id also drops the strict duplicates
+    positions = positions[~df["track_id"].iloc[positions].duplicated().to_numpy()]
+    
+    # Fourth step: rows that only differ in track_id and album_name
+    subset_cols = [col for col in df.columns if col not in ["track_id", "album_name"]]
+    rows = df[subset_cols].assign(track_genre=track_genre).iloc[positions]
+    positions = positions[~rows.duplicated().to_numpy()]
+    
+    # Fifth step: the stable sort keeps the earliest of the equally popular rows, as the duckdb backend does
+    popularity = pd.Series(df["popularity"].to_numpy()[positions].astype("int64"))
+    order = popularity.sort_values(ascending=False, kind="stable").index.to_numpy()
+    
+    pairs = df[["track_name", "artists"]].iloc[positions[order]]
+    order = order[~pairs.duplicated().to_numpy()]
+    
+    return np.sort(positions[order])
     
 ## ----- Spotify Transformations ----- ##
         
+@profiled()
 def transforming_spotify_data(df):
     """
     Cleaning and transforming the Spotify DataFrame and return said DataFrame.
@@ -52,110 +143,21 @@ def transforming_spotify_data(df):
         logging.info(f"Cleaning and transforming the DataFrame. You currently have {df.shape[0]} rows and {df.shape[1]} columns.")
         
         # Remove Unnamed: 0 column
-        df = df.drop(columns=["Unnamed: 0"])
+        df = df.drop(columns=["Unnamed: 0"], errors="ignore")
        
-        # Remove null values  
-        df = (df
-                .dropna()
-                .reset_index(drop=True))
-        
-        # Remove duplicates - First step: drop strict duplicates
-        df = df.drop_duplicates()
-        
-        # Remove duplicates - Second step: track_id case
-        df = (df
-                .drop_duplicates(subset=["track_id"])
-                .reset_index(drop=True))
-        
-        # Remove duplicates - Third step: Mapping track_genre to its respective category
-        genre_mapping = {
-            'Rock/Metal': [
-                'alt-rock', 'alternative', 'black-metal', 'death-metal', 'emo', 'grindcore',
-                'hard-rock', 'hardcore', 'heavy-metal', 'metal', 'metalcore', 'psych-rock',
-                'punk-rock', 'punk', 'rock-n-roll', 'rock', 'grunge', 'j-rock', 'goth',
-                'industrial', 'rockabilly', 'indie'
-            ],
-            
-            'Pop': [
-                'pop', 'indie-pop', 'power-pop', 'k-pop', 'j-pop', 'mandopop', 'cantopop',
-                'pop-film', 'j-idol', 'synth-pop'
-            ],
-            
-            'Electronic/Dance': [
-                'edm', 'electro', 'electronic', 'house', 'deep-house', 'progressive-house',
-                'techno', 'trance', 'dubstep', 'drum-and-bass', 'dub', 'garage', 'idm',
-                'club', 'dance', 'minimal-techno', 'detroit-techno', 'chicago-house',
-                'breakbeat', 'hardstyle', 'j-dance', 'trip-hop'
-            ],
-            
-            'Urban': [
-                'hip-hop', 'r-n-b', 'dancehall', 'reggaeton', 'reggae'
-            ],
-            
-            'Latino': [
-                'brazil', 'salsa', 'samba', 'spanish', 'pagode', 'sertanejo',
-                'mpb', 'latin', 'latino'
-            ],
-            
-            'Global Sounds': [
-                'indian', 'iranian', 'malay', 'turkish', 'tango', 'afrobeat', 'french', 'german', 'british', 'swedish'
-            ],
-            
-            'Jazz and Soul': [
-                'blues', 'bluegrass', 'funk', 'gospel', 'jazz', 'soul', 'groove', 'disco', 'ska'
-            ],
-            
-            'Varied Themes': [
-                'children', 'disney', 'forro', 'kids', 'party', 'romance', 'show-tunes',
-                'comedy', 'anime'
-            ],
-            
-            'Instrumental': [
-                'acoustic', 'classical',  'guitar', 'piano',
-                'world-music', 'opera', 'new-age'
-            ],
-            
-            'Mood': [
-                'ambient', 'chill', 'happy', 'sad', 'sleep', 'study'
-            ],
-            
-            'Single Genre': [
-                'country', 'honky-tonk', 'folk', 'singer-songwriter'
-            ]
-        }
-        
-        genre_category_mapping = {genre: category for category, genres in genre_mapping.items() for genre in genres}
-        df["track_genre"] = df["track_genre"].map(genre_category_mapping)
+        # Mapping track_genre to its respective category (see transform.lookups)
+        track_genre = mapping_genres(df["track_genre"])
         
-        # Remove duplicates - Fourth step: track_name and artist case
-        subset_cols = [col for col in df.columns if col not in ["track_id", "album_name"]]
-        df = df.drop_duplicates(subset=subset_cols, keep="first")
+        # Remove null values and duplicates in one pass
+        positions = deduplicating_tracks(df, track_genre)
         
-        # Remove duplicate - Fifth step: duplicated rows with some differences
         df = (df
-                .sort_values(by="popularity", ascending=False)
-                .groupby(["track_name", "artists"])
-                .head(1)
-                .sort_index()
+                .take(positions)
                 .reset_index(drop=True))
+        df["track_genre"] = track_genre.take(positions).reset_index(drop=True)
         
-        # Create column - duration_min
-        df["duration_min"] = (df["duration_ms"]
-                                .apply(lambda x: f"{x // 60000}"))
-        
-        df["duration_min"] = df["duration_min"].astype(int)
-
-        # Create column - duration_category
-        df["duration_category"] = df["duration_ms"].apply(categorize_duration)
-        
-        # Create column - popularity_category
-        df["popularity_category"] = df["popularity"].apply(categorize_popularity)
-        
-        # Create column - track_mood
-        df["track_mood"] = df["valence"].apply(determine_mood)
-        
-        # Create column - live_performance
-        df["live_performance"] = df["liveness"] > 0.8
+        # Create columns - duration_min, duration_category, popularity_category, track_mood and live_performance
+        df = building_derived_columns(df)
         
         # Dropping columns
         df = df.drop(columns=["loudness", "mode", "duration_ms", "key", "tempo", "valence", "speechiness", "acousticness", "instrumentalness", "liveness", "time_signature"])
@@ -165,5 +167,41 @@ def transforming_spotify_data(df):
         return df
     except Exception as e:
         logging.error(f"An error has occurred: {e}.")
+
+@profiled()
+def transforming_spotify_chunks(chunks):
+    """
+    Cleaning and transforming the Spotify data from an iterable of DataFrame chunks and return the DataFrame.
+    Each chunk is reduced to the first row of every track_id not kept by an earlier chunk, which is the
+    same keep-first rule the full transformation applies, so the result does not change while peak memory
+    follows the chunk size and the number of distinct tracks instead of the file size.
+    
+    """
+    try:
+        reduced_chunks = []
+        seen_track_ids = set()
+        
+        for chunk in chunks:
+            chunk = (chunk
+                        .drop(columns=["Unnamed: 0"], errors="ignore")
+                        .dropna()
+                        .drop_duplicates(subset=["track_id"]))
+            
+            # The tracks of the earlier chunks already kept their first row
+            repeated = np.fromiter((track_id in seen_track_ids for track_id in chunk["track_id"]), dtype=bool, count=chunk.shape[0])
+            chunk = chunk[~repeated]
+            
+            seen_track_ids.update(chunk["track_id"])
+            reduced_chunks.append(chunk)
+        
+        df = pd.concat(reduced_chunks, ignore_index=True)
+        
+        # Chunks with different genre categories are concatenated as object
+        if not isinstance(df["track_genre"].dtype, pd.CategoricalDtype):
+            df["track_genre"] = df["track_genre"].astype("category")
         
-  
+        logging.info(f"Chunks reduced to {df.shape[0]} rows.")
+        
+        return transforming_spotify_data(df)
+    except Exception as e:
+        logging.error(f"An error has occurred: {e}.")
@@ -0,0 +1,172 @@
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+import os
+import json
+import time
+import hashlib
+import logging
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Reading the environment variables
+load_dotenv("./env/.env")
+
+cache_path = os.getenv("TRANSFORM_CACHE_PATH", "./data/cache")
+cache_max_bytes = int(os.getenv("TRANSFORM_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+## ----- Fingerprints ----- ##
+
+def fingerprinting_file(path, block_size=1024 ** 2):
+    """
+    Returns the fingerprint of a file from its size, modification time and content hash.
+
+    """
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+
+    return f"file:{stat.st_size}:{stat.st_mtime_ns}:{digest.hexdigest()}"
+
+def fingerprinting_table(engine, table_name):
+    """
+    Returns the fingerprint of a PostgreSQL table from its row count and an order-independent checksum of its rows.
+
+    """
+    table = engine.dialect.identifier_preparer.quote(table_name)
+    query = text(f"SELECT count(*), coalesce(sum(hashtext(t::text)::bigint), 0) FROM {table} AS t")
+
+    with engine.connect() as connection:
+        rows, checksum = connection.execute(query).one()
+
+    return f"table:{table_name}:{rows}:{checksum}"
+
+def fingerprinting_code(*modules):
+    """
+    Returns the version of the transform code: a hash of the source files of the given modules,
+    which include the lookup tables (see transform.lookups) and the bins.
+
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    for module in modules:
+        with open(module.__file__, "rb") as file:
+            digest.update(file.read())
+
+    return f"code:{digest.hexdigest()}"
+
+## ----- Transform cache ----- ##
+
+class TransformCache:
+    """
+    Content-addressed cache of transform results stored as Parquet files.
+    Entries are keyed on the fingerprints of the inputs and of the transform code, and the
+    least recently used entries are evicted once the cache grows beyond max_bytes.
+
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or cache_path
+        self.max_bytes = max_bytes or cache_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, *fingerprints):
+        return hashlib.sha256("|".join(fingerprints).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.parquet")
+
+    def get(self, key):
+        path = self.path(key)
+
+        if not os.path.exists(path):
+            self.misses += 1
+            self.record_event("miss", key)
+            return None
+
+        df = pd.read_parquet(path)
+
+        # Touching the entry marks it as recently used
+        os.utime(path)
+
+        self.hits += 1
+        self.record_event("hit", key)
+
+        return df
+
+    def put(self, key, df):
+        path = self.path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+
+        df.to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, path)
+
+        self.evict()
+
+    def evict(self):
+        entries = [os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".parquet")]
+        entries = sorted(entries, key=os.path.getmtime)
+
+        total_bytes = sum(os.path.getsize(entry) for entry in entries)
+
+        # The newest entry is kept even when it is larger than the cache on its own
+        while total_bytes > self.max_bytes and len(entries) > 1:
+            entry = entries.pop(0)
+            total_bytes -= os.path.getsize(entry)
+            os.remove(entry)
+
+            self.evictions += 1
+            self.record_event("eviction", os.path.basename(entry)[:-len(".parquet")])
+
+    def record_event(self, event, key):
+        # Appending one line per event keeps the metrics of concurrent tasks apart
+        with open(os.path.join(self.root, "metrics.jsonl"), "a") as file:
+            file.write(json.dumps({"time": time.time(), "event": event, "key": key}) + "\n")
+
+    def metrics(self):
+        """
+        Returns the hit, miss and eviction counts recorded by every process using the cache.
+
+        """
+        counts = {"hit": 0, "miss": 0, "eviction": 0}
+        metrics_file = os.path.join(self.root, "metrics.jsonl")
+
+        if os.path.exists(metrics_file):
+            with open(metrics_file) as file:
+                for line in file:
+                    counts[json.loads(line)["event"]] += 1
+
+        requests = counts["hit"] + counts["miss"]
+        counts["hit_ratio"] = counts["hit"] / requests if requests else 0.0
+
+        return counts
+
+def cached_transform(cache, function, df_loader, *fingerprints):
+    """
+    Returns the cached result of function for the given input fingerprints, or runs
+    function on the DataFrame returned by df_loader and caches its result.
+
+    """
+    key = cache.key(*fingerprints)
+
+    df = cache.get(key)
+    if df is not None:
+        logging.info(f"Transform cache hit for {function.__name__} ({key[:12]}).")
+        return df
+
+    logging.info(f"Transform cache miss for {function.__name__} ({key[:12]}).")
+
+    df = function(df_loader())
+    if df is not None:
+        cache.put(key, df)
+
+    return df
@@ -0,0 +1,278 @@
+from dotenv import load_dotenv
+from monitoring.profiling import profiling
+from transform.compact import compact_frame
+
+import os
+import time
+import logging
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+# Reading the environment variables
+load_dotenv("./env/.env")
+
+# Checking every frame handed over between the stages, "false" skips the checks
+validation_enabled = os.getenv("PIPELINE_VALIDATION", "true").lower() == "true"
+
+# Kinds of the schema rules, every kind accepts the dtypes the pipeline gives its columns
+# (compact_frame turns strings into categories and downcasts the numbers)
+dtype_kinds = {
+    "numeric": lambda dtype: pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype),
+    "text": lambda dtype: pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype),
+    "boolean": lambda dtype: pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_object_dtype(dtype)
+}
+
+spotify_columns = {
+    "track_id": "text", "artists": "text", "album_name": "text", "track_name": "text",
+    "popularity": "numeric", "explicit": "boolean", "danceability": "numeric", "energy": "numeric", "track_genre": "text"
+}
+
+spotify_ranges = [
+    {"rule": "range", "column": "popularity", "min": 0, "max": 100},
+    {"rule": "range", "column": "danceability", "min": 0, "max": 1}
+]
+
+grammys_columns = {"year": "numeric", "title": "text", "category": "text", "nominee": "text", "artist": "text"}
+
+# Rules of every frame handed over between the stages, keyed on the artifact name
+validation_rules = {
+    "spotify_raw": [
+        {"rule": "schema", "columns": {**spotify_columns, "duration_ms": "numeric", "valence": "numeric", "liveness": "numeric"}},
+        {"rule": "null_ratio", "columns": ["track_id", "track_name", "artists"], "max": 0.05},
+        *spotify_ranges
+    ],
+    "spotify_clean": [
+        {"rule": "schema", "columns": {**spotify_columns, "duration_min": "numeric", "track_mood": "text"}},
+        # Genres out of the genre mapping stay null (see transform.lookups)
+        {"rule": "null_ratio", "columns": [column for column in spotify_columns if column != "track_genre"], "max": 0},
+        *spotify_ranges,
+        {"rule": "unique", "columns": ["track_id"]}
+    ],
+    "grammys_raw": [
+        {"rule": "schema", "columns": {**grammys_columns, "workers": "text", "winner": "boolean"}},
+        {"rule": "null_ratio", "columns": ["nominee", "category"], "max": 0.05}
+    ],
+    "grammys_clean": [
+        {"rule": "schema", "columns": {**grammys_columns, "is_nominated": "boolean"}},
+        {"rule": "null_ratio", "columns": ["nominee", "artist", "category"], "max": 0}
+    ],
+    "merged_data": [
+        {"rule": "schema", "columns": {"id": "numeric", **spotify_columns, "title": "text", "category": "text", "is_nominated": "boolean"}},
+        {"rule": "null_ratio", "columns": ["track_id", "track_name", "title", "category", "is_nominated"], "max": 0},
+        *spotify_ranges,
+        {"rule": "unique", "columns": ["id"]}
+    ]
+}
+
+# The new Grammy rows of an incremental run are checked like the whole table
+validation_rules["grammys_delta"] = validation_rules["grammys_raw"]
+
+class ValidationError(ValueError):
+    """
+    Raised when a frame breaks one of its validation rules, so the task fails instead of handing bad data over.
+
+    """
+
+## ----- Summary ----- ##
+
+def summarizing_frame(df, rules):
+    """
+    Computes in one vectorized pass over the checked columns the statistics shared by the rules of a frame:
+    the null ratio of every checked column and the bounds of every ranged column. The columns are read
+    one by one, so the frame is never copied (categorical columns are checked on their codes).
+
+    """
+    null_columns = set()
+    range_columns = set()
+
+    for rule in rules:
+        if rule["rule"] == "null_ratio":
+            null_columns.update(df.columns if rule["columns"] is None else rule["columns"])
+        elif rule["rule"] == "range":
+            range_columns.add(rule["column"])
+
+    rows = df.shape[0]
+
+    # An empty frame has no nulls and no bounds
+    null_ratios = pd.Series({column: df[column].isna().sum() / rows if rows else 0.0
+                             for column in df.columns if column in null_columns}, dtype="float64")
+    bounds = {column: (df[column].min(), df[column].max())
+              for column in df.columns if column in range_columns and rows and pd.api.types.is_numeric_dtype(df[column].dtype)}
+
+    return {"null_ratios": null_ratios, "bounds": bounds}
+
+## ----- Rules ----- ##
+
+def checking_schema(df, rule, summary):
+    """
+    Checks that the frame has every column of the rule, with a dtype of its kind.
+    The dtypes of an empty frame are not checked, an empty query result has only object columns.
+
+    """
+    missing = [column for column in rule["columns"] if column not in df.columns]
+    wrong = [f"{column} ({df[column].dtype})" for column, kind in rule["columns"].items()
+             if column in df.columns and df.shape[0] and not dtype_kinds[kind](df[column].dtype)]
+
+    problems = ([f"missing {', '.join(missing)}"] if missing else []) + ([f"wrong dtype {', '.join(wrong)}"] if wrong else [])
+
+    return not problems, "; ".join(problems) or None
+
+def checking_null_ratio(df, rule, summary):
+    """
+    Checks that the null ratio of every column of the rule (every column when None) is at most max.
+
+    """
+    columns = df.columns if rule["columns"] is None else rule["columns"]
+    ratios = summary["null_ratios"].reindex(columns)
+
+    if ratios.isna().any():
+        return False, f"missing {', '.join(ratios.index[ratios.isna()])}"
+
+    exceeded = ratios[ratios > rule["max"]]
+
+    return exceeded.empty, ", ".join(f"{column} {ratio:.2%}" for column, ratio in exceeded.items()) or None
+
+def checking_range(df, rule, summary):
+    """
+    Checks that the values of the column are between min and max, both included.
+
+    """
+    column = rule["column"]
+
+    if column not in df.columns:
+        return False, f"missing {column}"
+
+    if df.shape[0] == 0:
+        return True, None
+
+    if column not in summary["bounds"]:
+        return False, f"{column} is not numeric ({df[column].dtype})"
+
+    low, high = summary["bounds"][column]
+
+    if pd.isna(low):
+        return True, None
+
+    passed = low >= rule["min"] and high <= rule["max"]
+
+    return passed, None if passed else f"{column} in [{low}, {high}], expected [{rule['min']}, {rule['max']}]"
+
+def checking_unique(df, rule, summary):
+    """
+    Checks that the key columns of the rule identify every row.
+
+    """
+    missing = [column for column in rule["columns"] if column not in df.columns]
+
+    if missing:
+        return False, f"missing {', '.join(missing)}"
+
+    keys = df[rule["columns"][0]] if len(rule["columns"]) == 1 else df[rule["columns"]]
+    duplicated = int(keys.duplicated().sum())
+
+    return duplicated == 0, f"{duplicated} duplicated keys" if duplicated else None
+
+# New rule kinds are plugged in by adding a function (df, rule, summary) -> (passed, detail) here
+rule_checks = {
+    "schema": checking_schema,
+    "null_ratio": checking_null_ratio,
+    "range": checking_range,
+    "unique": checking_unique
+}
+
+def get_rule_check(kind):
+    """
+    Returns the function that checks the given kind of rule.
+
+    """
+    if kind not in rule_checks:
+        raise ValueError(f"Unknown validation rule: {kind}. Available rules: {list(rule_checks)}.")
+    return rule_checks[kind]
+
+## ----- Validation ----- ##
+
+def labeling_rule(rule):
+    """
+    Returns the label of a rule in the results: its kind and, but for the schema, the columns it checks.
+
+    """
+    if rule["rule"] == "schema":
+        return "schema"
+
+    columns = [rule["column"]] if "column" in rule else rule["columns"]
+
+    return f"{rule['rule']}:{','.join(columns) if columns is not None else '*'}"
+
+def evaluating_rules(df, rules):
+    """
+    Evaluates the rules over the frame and returns one result per rule (rule, passed, detail and seconds),
+    after the shared summary, whose time is returned apart.
+
+    """
+    start = time.perf_counter()
+    summary = summarizing_frame(df, rules)
+    summary_seconds = time.perf_counter() - start
+
+    results = []
+    for rule in rules:
+        check = get_rule_check(rule["rule"])
+
+        start = time.perf_counter()
+        passed, detail = check(df, rule, summary)
+        seconds = time.perf_counter() - start
+
+        results.append({
+            "rule": labeling_rule(rule),
+            "passed": bool(passed),
+            "detail": detail,
+            "seconds": round(seconds, 6)
+        })
+
+    return results, round(summary_seconds, 6)
+
+def validating_frame(df, name, rules=None):
+    """
+    Validates the frame handed over as the artifact name and returns it unchanged, so the check can wrap
+    the output of a stage. The per-rule results and timings are emitted with the metrics of the
+    validating_<name> stage (see monitoring.profiling). Raises ValidationError when a rule fails or when
+    the stage returned no data.
+
+    """
+    if not validation_enabled:
+        return df
+
+    if df is None:
+        raise ValidationError(f"The stage that produces {name} returned no data, check the log above.")
+
+    rules = validation_rules.get(name, []) if rules is None else rules
+
+    with profiling(f"validating_{name}", rows_in=df.shape[0]) as metrics:
+        results, summary_seconds = evaluating_rules(df, rules)
+
+        metrics["rows_out"] = df.shape[0]
+        metrics["summary_seconds"] = summary_seconds
+        metrics["rules"] = results
+
+        failed = [result for result in results if not result["passed"]]
+
+        if failed:
+            raise ValidationError(f"{name} failed {len(failed)} validation rules: "
+                                  + "; ".join(f"{result['rule']} ({result['detail']})" for result in failed))
+
+    logging.info(f"{name} passed {len(results)} validation rules in {metrics['wall_seconds']:.3f} seconds.")
+
+    return df
+
+def compacting_and_validating(df, name, exclude=None):
+    """
+    Compacts the DataFrame produced by a stage (see transform.compact) and validates it as the artifact name,
+    as every stage of the DAG and of the local runner does. The rules run on the compacted columns,
+    where the null checks of the categories only read their codes.
+
+    """
+    if df is None:
+        return validating_frame(None, name)
+
+    return validating_frame(compact_frame(df, exclude=exclude, name=name), name)
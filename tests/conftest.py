@@ -0,0 +1,42 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# The pipeline modules import each other relative to src (and the DAG tasks relative to airflow/dags)
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(root, "src"), os.path.join(root, "airflow", "dags")]
+
+## ----- Fixtures ----- ##
+
+@pytest.fixture(scope="session")
+def database_engine():
+    """
+    Engine of the PostgreSQL database given by TEST_DATABASE_URL. The tests that need it are skipped without it.
+
+    """
+    url = os.getenv("TEST_DATABASE_URL")
+
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set.")
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def table_name(database_engine):
+    """
+    Name of a scratch table, dropped after the test.
+
+    """
+    from sqlalchemy import text
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    yield name
+
+    with database_engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
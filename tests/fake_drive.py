@@ -0,0 +1,131 @@
+import hashlib
+import itertools
+import re
+import threading
+
+## ----- Fake Drive v2 client ----- ##
+
+class FakeStatus:
+    """
+    Progress of a resumable upload, as returned by next_chunk while chunks are left.
+
+    """
+
+    def __init__(self, progress):
+        self.value = progress
+
+    def progress(self):
+        return self.value
+
+class FakeUploadRequest:
+    """
+    Resumable insert or update request: every next_chunk call reads one chunk of the media.
+
+    """
+
+    def __init__(self, drive, media, body=None, file_id=None):
+        self.drive = drive
+        self.media = media
+        self.body = body
+        self.file_id = file_id
+        self.offset = 0
+        self.data = b""
+
+    def next_chunk(self, http=None, num_retries=0):
+        chunk = self.media.getbytes(self.offset, self.media.chunksize())
+        self.drive.connections.append((threading.get_ident(), http))
+
+        self.data += chunk
+        self.offset += len(chunk)
+        self.drive.chunks += 1
+
+        if self.offset < self.media.size():
+            return FakeStatus(self.offset / self.media.size()), None
+
+        if self.file_id is None:
+            number = next(self.drive.ids)
+            self.file_id = f"file{number}"
+            self.drive.files_by_id[self.file_id] = {"title": self.body["title"], "parents": [parent["id"] for parent in self.body["parents"]],
+                                                    "createdDate": f"2024-01-01T00:00:{number:02d}.000Z"}
+
+        stored = self.drive.files_by_id[self.file_id]
+        stored.update(id=self.file_id, data=self.data, md5Checksum=hashlib.md5(self.data).hexdigest())
+
+        return None, {"id": self.file_id, "title": stored["title"], "md5Checksum": stored["md5Checksum"]}
+
+class FakeExecutable:
+    """
+    Request whose result is known when it is built.
+
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, http=None):
+        return self.result
+
+class FakeFiles:
+    """
+    The files() resource: list by title (exact or contained) and folder, insert, update, download and delete.
+
+    """
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q, fields=None):
+        operator, title, folder = re.match(r"title (=|contains) '((?:[^'\\]|\\.)*)' and '([^']*)' in parents", q).groups()
+        title = re.sub(r"\\(.)", r"\1", title)
+
+        matching = (lambda stored: stored == title) if operator == "=" else (lambda stored: title in stored)
+
+        keys = re.match(r"items\((.*)\)", fields).group(1).split(", ")
+
+        items = [{key: file[key] for key in keys} for file in self.drive.files_by_id.values()
+                 if matching(file["title"]) and folder in file["parents"]]
+
+        return FakeExecutable({"items": items})
+
+    def get_media(self, fileId):
+        return FakeExecutable(self.drive.files_by_id[fileId]["data"])
+
+    def delete(self, fileId):
+        self.drive.deletes += 1
+        del self.drive.files_by_id[fileId]
+        return FakeExecutable(None)
+
+    def insert(self, body, media_body):
+        self.drive.inserts += 1
+        return FakeUploadRequest(self.drive, media_body, body=body)
+
+    def update(self, fileId, media_body):
+        self.drive.updates += 1
+        return FakeUploadRequest(self.drive, media_body, file_id=fileId)
+
+class FakeDrive:
+    """
+    In-memory stand-in of the Google Drive v2 service used by load_and_store.store.
+    Keeps the uploaded files with their content and MD5, counts the inserts, updates, deletes and chunks,
+    and records the thread and the HTTP connection of every uploaded chunk.
+
+    """
+
+    def __init__(self):
+        self.files_by_id = {}
+        self.ids = itertools.count(1)
+        self.inserts = 0
+        self.updates = 0
+        self.deletes = 0
+        self.chunks = 0
+        self.connections = []
+
+    def files(self):
+        return FakeFiles(self)
+
+    def content(self, title):
+        """
+        Returns the content of the file with the given title.
+
+        """
+        return next(file["data"] for file in self.files_by_id.values() if file["title"] == title)
@@ -0,0 +1,28 @@
+import os
+import time
+
+import pandas as pd
+
+from artifacts.artifact_store import writing_artifact, reading_artifact, removing_run_artifacts, pruning_artifacts, run_directory
+
+## ----- Tests ----- ##
+
+def test_removing_run_artifacts(tmp_path):
+    ref = writing_artifact(pd.DataFrame({"track_id": ["t1", "t2"]}), "spotify_raw", "run 1", root=str(tmp_path))
+
+    assert reading_artifact(ref).shape == (2, 1)
+
+    removing_run_artifacts("run 1", root=str(tmp_path))
+
+    assert not os.path.exists(run_directory("run 1", root=str(tmp_path)))
+
+def test_pruning_keeps_the_recent_runs(tmp_path):
+    for run_id in ["old", "recent"]:
+        writing_artifact(pd.DataFrame({"track_id": ["t1"]}), "spotify_raw", run_id, root=str(tmp_path))
+
+    # The run that failed eight days ago
+    eight_days_ago = time.time() - 8 * 24 * 3600
+    os.utime(run_directory("old", root=str(tmp_path)), (eight_days_ago, eight_days_ago))
+
+    assert pruning_artifacts(7, root=str(tmp_path)) == ["old"]
+    assert os.listdir(tmp_path) == ["recent"]
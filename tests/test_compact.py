@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from transform.compact import compact_frame
+
+## ----- Tests ----- ##
+
+def test_compacting_keeps_the_floats_float32_cannot_hold():
+    df = pd.DataFrame({
+        "valence": [0.3, 0.6000001, 0.8],
+        "loudness": [-5.5, -12.25, np.nan],
+        "energy": np.array([0.25, 0.5, 0.75], dtype="float32")
+    })
+
+    compacted = compact_frame(df)
+
+    # 0.3 has no exact float32 value, while halves and quarters do
+    assert compacted.dtypes.astype(str).tolist() == ["float64", "float32", "float32"]
+    pd.testing.assert_frame_equal(compacted.astype("float64"), df.astype("float64"))
+
+def test_compacting_the_other_columns():
+    df = pd.DataFrame({"popularity": [73, 55, 55, 55], "explicit": pd.Series([True, False, True, False], dtype=object),
+                       "genre": ["Pop", "Pop", "Pop", "Rock"]})
+
+    compacted = compact_frame(df, exclude=["genre"])
+
+    assert compacted.dtypes.astype(str).tolist() == ["int8", "bool", "object"]
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import tasks.etl as etl
+from artifacts.artifact_store import writing_artifact
+
+## ----- Fixtures ----- ##
+
+class FailingSink:
+    """
+    Sink whose load logs its error and returns no result, as loading_merged_data does.
+
+    """
+
+    def write(self, df):
+        return None
+
+class BrokenSink:
+    """
+    Sink whose upload raises.
+
+    """
+
+    def write(self, df):
+        raise ConnectionError("Drive is unreachable")
+
+@pytest.fixture
+def merged_ref(tmp_path):
+    return writing_artifact(pd.DataFrame({"id": [0], "track_id": ["t1"]}), "merged_data", "run 1", root=str(tmp_path))
+
+## ----- Tests ----- ##
+
+@pytest.mark.parametrize("sink", [FailingSink, BrokenSink])
+def test_sink_data_fails_the_task_of_a_failed_sink(merged_ref, monkeypatch, sink):
+    monkeypatch.setattr(etl, "get_sink", lambda name: sink())
+
+    with pytest.raises((RuntimeError, ConnectionError)):
+        etl.sink_data(merged_ref, "database", "run 1")
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from transform.fuzzy_match import normalizing_titles, building_blocking_index, fuzzy_matching
+from transform.merge import merging_datasets
+
+## ----- Data ----- ##
+
+grammys = pd.DataFrame({
+    "nominee": ["Love Song", "Hotline Bling", "Day Tripper", "Love Songs"],
+    "artist": ["Adele", None, "The Beatles", "Kim"]
+}).assign(nominee_clean=lambda df: df["nominee"].str.lower())
+
+## ----- Tests ----- ##
+
+def test_normalizing_titles_before_blocking():
+    titles = pd.Series(["The Love Song (Remastered)", "feat. Drake - Hotline Bling", "Hotline Bling feat. Jay-Z", "A Day Tripper - 2011 Remaster", None])
+
+    assert normalizing_titles(titles).tolist() == ["love song", "hotline bling", "hotline bling", "day tripper", None]
+
+def test_fuzzy_matching_sees_past_articles_and_featured_artists():
+    titles = pd.Series(["The Love Song", "feat. Drake - Hotline Bling", "Day Triper", "Nothing Alike", None], index=[7, 3, 9, 1, 4])
+
+    keys = fuzzy_matching(titles, building_blocking_index(grammys))
+
+    assert keys.index.equals(titles.index)
+    assert keys.tolist() == ["love song", "hotline bling", "day tripper", None, None]
+
+def test_fuzzy_matching_weights_the_artists():
+    titles = pd.Series(["Love Song", "Love Song", "Hotline Bling"])
+    artists = pd.Series(["Adele", "Kim", "Drake"])
+
+    keys = fuzzy_matching(titles, building_blocking_index(grammys), threshold=0.8, artists=artists, artist_weight=0.3)
+
+    # The second track is closer to the nominee of its artist, and the nominee without an artist cannot reach the threshold
+    assert keys.tolist() == ["love song", "love songs", None]
+
+def test_merging_datasets_matches_the_fuzzy_titles():
+    spotify = pd.DataFrame({"track_id": ["t1", "t2"], "track_name": ["The Love Song - Radio Edit", "Nothing Alike"], "artists": ["Adele", "Kim"]})
+    grammys_df = grammys.drop(columns="nominee_clean").assign(title="62nd Annual GRAMMY Awards (2019)", category="Song Of The Year", is_nominated=True, year=2019)
+
+    df = merging_datasets(spotify, grammys_df, fuzzy=True)
+
+    assert df[["track_id", "category"]].values.tolist() == [["t1", "Song Of The Year"], ["t2", "Not applicable"]]
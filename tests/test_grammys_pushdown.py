@@ -0,0 +1,65 @@
+from transform.grammys_transform import transforming_grammys_data
+from transform.grammys_pushdown import building_grammys_query
+
+import pandas as pd
+
+# Raw rows that go through every step of the artist cascade. Several names end in "v" and the
+# separators are padded with spaces, tabs, vertical tabs and Unicode spaces (NBSP, NEL, em space,
+# information separators), which btrim has to strip like str.strip()
+raw_rows = [
+    ("Valery Gergiev", None, "Record Of The Year", "Song A"),
+    (None, "Valery Gergiev; Kirov Orchestra", "Record Of The Year", "Song B"),
+    (None, "  Valery Gergiev  ;Kirov Orchestra", "Record Of The Year", "Song C"),
+    (None, "\tVladimir Ashkenazy\x0b ; Other Name", "Album Of The Year", "Song D"),
+    (None, "Mstislav Rostropovich, conductor; Lev Vlassenko ,soloist", "Album Of The Year", "Song E"),
+    (None, "Pavel Lisitsian, Composer;  Ivan Kozlovsky , ARTIST ", "Album Of The Year", "Song F"),
+    (None, "Engineer (Yuri Temirkanov)", "Album Of The Year", "Song G"),
+    (None, "Igor Oistrakh", "Best New Artist", "Song H"),
+    (None, "Pavel Kogan conductor; Someone Else", "Best New Artist", "Song I"),
+    (None, "John Smith, producer; Jane Doe, engineer", "Best New Artist", "Song J"),
+    (None, None, "Best Classical Vocal Performance", "Song K"),
+    (None, None, "Best Rock Album", "Nominee Lev"),
+    ("(Various Artists)", None, "Best Rock Album", "Song L"),
+    ("Someone", "Someone Else", "Best Rock Album", None),
+    (None, "\xa0Valery Gergiev\u2003\x1c; Kirov Orchestra", "Album Of The Year", "Song M"),
+    (None, "Ivan Kozlovsky\x85, artist; Lev Vlassenko, soloist\xa0", "Album Of The Year", "Song N")
+]
+
+def building_raw_frame():
+    """
+    Returns the raw Grammys rows with the columns of grammy_awards_raw.
+
+    """
+    df = pd.DataFrame(raw_rows, columns=["artist", "workers", "category", "nominee"])
+    df["year"] = range(2000, 2000 + df.shape[0])
+    df["title"] = "Grammy Awards"
+    df["winner"] = [number % 2 == 0 for number in range(df.shape[0])]
+
+    return df[["year", "title", "category", "nominee", "artist", "workers", "winner"]]
+
+def sorting_frame(df):
+    return df.sort_values(["year", "nominee"]).reset_index(drop=True)
+
+def test_pushdown_matches_pandas_transform(database_engine, table_name):
+    raw = building_raw_frame()
+    raw.to_sql(table_name, database_engine, index=False)
+
+    expected = sorting_frame(transforming_grammys_data(raw.copy()))
+
+    with database_engine.connect() as connection:
+        result = sorting_frame(pd.read_sql(building_grammys_query(table_name), connection))
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_pushdown_keeps_trailing_v(database_engine, table_name):
+    building_raw_frame().to_sql(table_name, database_engine, index=False)
+
+    with database_engine.connect() as connection:
+        result = pd.read_sql(building_grammys_query(table_name), connection)
+
+    artists = dict(zip(result["nominee"], result["artist"]))
+
+    assert artists["Song B"] == "Valery Gergiev"
+    assert artists["Song C"] == "Valery Gergiev"
+    assert artists["Song D"] == "Vladimir Ashkenazy"
+    assert artists["Song M"] == "Valery Gergiev"
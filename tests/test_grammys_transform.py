@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from transform.grammys_transform import (resolving_artists, extract_artist, move_workers_to_artist,
+                                         extract_artists_before_semicolon, extract_roles_based_on_interest)
+from transform.lookups import roles_of_interest
+
+## ----- Data ----- ##
+
+# (artist, workers) pairs for every step of the cascade and its edge cases
+cases = [
+    ("Adele", "Paul Epworth, producer"),                    # artist already given
+    (None, None),                                           # nothing to resolve
+    (np.nan, "Jane Doe"),                                   # workers without separators
+    (None, "(Various Artists)"),                            # artist within parentheses
+    (None, "()"),                                           # empty parentheses
+    (None, "John Smith; Ana Lopez, engineer"),              # first segment before the semicolon
+    (None, " John Smith ;Ana Lopez"),                       # padded first segment
+    (None, "John Smith, CONDUCTOR; Ana Lopez, Soloist"),    # mixed-case roles
+    (None, "Berliner Philharmoniker, Artist"),              # mixed-case role in the first segment
+    (None, "Ana Lopez, producer; Jane Doe, engineer"),      # no role of interest
+    (None, "Choir Director Smith; Ana Lopez"),              # role of interest in the first segment
+    (None, "Ana Lopez ,conductors; John Smith, composer")   # role as a prefix of a longer word
+]
+
+def applying_row_helpers(df):
+    """
+    Resolves the artists with the four row-wise helpers applied one after the other, as the transform did before resolving_artists.
+
+    """
+    df = df.copy()
+    df["artist"] = df.apply(lambda row: extract_artist(row["workers"]) if pd.isna(row["artist"]) else row["artist"], axis=1)
+    df["artist"] = df.apply(move_workers_to_artist, axis=1)
+    df["artist"] = df.apply(lambda row: extract_artists_before_semicolon(row["workers"], roles_of_interest) if pd.isna(row["artist"]) else row["artist"], axis=1)
+    df["artist"] = df.apply(lambda row: extract_roles_based_on_interest(row["workers"], roles_of_interest) if pd.isna(row["artist"]) else row["artist"], axis=1)
+    return df["artist"]
+
+def generating_workers(rng, size):
+    """
+    Generates size (artist, workers) pairs mixing names, roles of any case, parentheses and separators.
+
+    """
+    names = ["John Smith", "Ana Lopez", " ", "", "Berliner Philharmoniker", "Jane (Doe)", "()", "X Y"]
+    roles = list(roles_of_interest) + ["producer", "engineer", "Conductor", "ARTIST", "mixer"]
+
+    def worker():
+        if rng.random() < 0.1:
+            return None
+
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            name = rng.choice(names)
+            kind = rng.random()
+            if kind < 0.3:
+                parts.append(f"{name}, {rng.choice(roles)}")
+            elif kind < 0.4:
+                parts.append(f"({name})")
+            elif kind < 0.5:
+                parts.append(f"{name} ,{rng.choice(roles)}s")
+            else:
+                parts.append(name)
+        return rng.choice(["; ", ";", " ; "]).join(parts)
+
+    return [(rng.choice([None, np.nan, "Someone"]) if rng.random() < 0.5 else None, worker()) for _ in range(size)]
+
+def asserting_same_artists(df):
+    expected = applying_row_helpers(df)
+    result = resolving_artists(df)
+
+    # The row-wise helpers give None where the vectorized steps may give NaN
+    pd.testing.assert_series_equal(result.fillna(np.nan).astype(object), expected.fillna(np.nan).astype(object), check_names=False)
+
+## ----- Tests ----- ##
+
+def test_resolving_artists_matches_the_row_helpers():
+    asserting_same_artists(pd.DataFrame(cases, columns=["artist", "workers"]))
+
+def test_resolving_artists_keeps_the_index():
+    df = pd.DataFrame(cases, columns=["artist", "workers"], index=[40, 3, 17, 8, 99, 0, 5, 12, 61, 7, 2, 30])
+
+    asserting_same_artists(df)
+    assert resolving_artists(df).index.equals(df.index)
+
+def test_resolving_artists_matches_the_row_helpers_on_generated_workers():
+    rng = random.Random(7)
+    df = pd.DataFrame(generating_workers(rng, 2000), columns=["artist", "workers"], index=rng.sample(range(20000), 2000))
+
+    asserting_same_artists(df)
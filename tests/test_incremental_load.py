@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+
+from database.db_operations import load_clean_data, load_incremental_data
+from load_and_store.load import keying_merged_rows
+
+## ----- Data ----- ##
+
+def building_merged_frame():
+    """
+    Merged rows with the positional ids of merging_datasets. The first two rows share their key,
+    as the repeated nominations of the Grammys table do.
+
+    """
+    return pd.DataFrame({
+        "id": [0, 1, 2, 3],
+        "track_id": ["t1", "t1", "t1", "t2"],
+        "track_name": ["Song A", "Song A", "Song A", "Song B"],
+        "title": ["62nd Annual GRAMMY Awards (2019)"] * 3 + ["Not applicable"],
+        "category": ["Song Of The Year", "Song Of The Year", "Record Of The Year", "Not applicable"],
+        "is_nominated": [True, False, True, False]
+    })
+
+## ----- Tests ----- ##
+
+def test_keying_is_stable_across_runs():
+    df = keying_merged_rows(building_merged_frame())
+
+    # A later merge returns the rows in another order, with other positional ids and categorical columns
+    rerun = building_merged_frame().iloc[::-1].assign(id=[7, 8, 9, 10])
+    rerun = keying_merged_rows(rerun.astype({"title": "category", "category": "category"}))
+
+    # The rows keep their labels, so every row is compared with itself
+    assert df["id"].is_unique
+    assert df["id"].equals(rerun["id"].sort_index())
+
+def test_incremental_load_keeps_ids_of_a_rerun(database_engine, table_name):
+    first = load_incremental_data(database_engine, keying_merged_rows(building_merged_frame()), table_name, ["id"])
+
+    rerun = building_merged_frame().iloc[::-1].assign(id=[7, 8, 9, 10])
+    second = load_incremental_data(database_engine, keying_merged_rows(rerun), table_name, ["id"])
+
+    assert first == {"inserted": 4, "updated": 0, "unchanged": 0}
+    assert second == {"inserted": 0, "updated": 0, "unchanged": 4}
+
+def test_incremental_load_rejects_repeated_keys(database_engine, table_name):
+    with pytest.raises(ValueError, match="repeat the key"):
+        load_incremental_data(database_engine, building_merged_frame(), table_name, ["track_id", "title", "category"])
+
+def test_snapshot_load_deletes_the_rows_missing_from_the_merge(database_engine, table_name):
+    df = keying_merged_rows(building_merged_frame())
+    load_incremental_data(database_engine, df, table_name, ["id"], snapshot=True)
+
+    # t2 got a nomination, so its "Not applicable" row is gone from the next merge
+    nominated = building_merged_frame().iloc[[3]].assign(title="63rd Annual GRAMMY Awards (2020)", category="Song Of The Year", is_nominated=True)
+    rerun = keying_merged_rows(pd.concat([building_merged_frame().iloc[:3], nominated], ignore_index=True))
+    stats = load_incremental_data(database_engine, rerun, table_name, ["id"], snapshot=True)
+
+    rows = pd.read_sql(f"SELECT id FROM {table_name}", database_engine)
+
+    assert stats == {"inserted": 1, "updated": 0, "unchanged": 3, "deleted": 1}
+    assert sorted(rows["id"]) == sorted(rerun["id"])
+
+def test_snapshot_load_creates_a_clean_data_table_again(database_engine, table_name):
+    load_clean_data(database_engine, building_merged_frame(), table_name)
+
+    # The table of load_clean_data has no row_hash column, only a full load may replace it
+    with pytest.raises(ValueError, match="no row_hash column"):
+        load_incremental_data(database_engine, keying_merged_rows(building_merged_frame()), table_name, ["id"])
+
+    stats = load_incremental_data(database_engine, keying_merged_rows(building_merged_frame()), table_name, ["id"], snapshot=True)
+    columns = pd.read_sql(f"SELECT * FROM {table_name}", database_engine).columns
+
+    assert stats == {"inserted": 4, "updated": 0, "unchanged": 0, "deleted": 0}
+    assert "row_hash" in columns
+
+def test_delta_replaces_the_rows_of_its_events(database_engine, table_name, monkeypatch):
+    import load_and_store.load as load
+
+    monkeypatch.setattr(load, "creating_engine", lambda: database_engine)
+
+    df = building_merged_frame()
+    load_incremental_data(database_engine, keying_merged_rows(df), table_name, ["id"])
+
+    # The event was updated: the nominee of the Record Of The Year row no longer matches t1, and
+    # the second Song Of The Year row is gone, so t1 keeps one nomination of the event
+    stats = load.loading_merged_delta(df.iloc[[0]], table_name, events=["62nd Annual GRAMMY Awards (2019)"])
+    rows = pd.read_sql(f"SELECT track_id, title, category FROM {table_name} ORDER BY track_id, category", database_engine)
+
+    assert stats["deleted"] == 2 and stats["restored"] == 0
+    assert rows.values.tolist() == [
+        ["t1", "62nd Annual GRAMMY Awards (2019)", "Song Of The Year"],
+        ["t2", "Not applicable", "Not applicable"]
+    ]
+
+def test_delta_restores_the_tracks_left_without_a_nomination(database_engine, table_name, monkeypatch):
+    import load_and_store.load as load
+
+    monkeypatch.setattr(load, "creating_engine", lambda: database_engine)
+
+    df = building_merged_frame()
+    load_incremental_data(database_engine, keying_merged_rows(df), table_name, ["id"])
+
+    # No nominee of the event matches a track anymore
+    stats = load.loading_merged_delta(df.iloc[0:0], table_name, events=["62nd Annual GRAMMY Awards (2019)"])
+    rows = pd.read_sql(f"SELECT id, track_id, title, category, is_nominated FROM {table_name} ORDER BY track_id", database_engine)
+
+    placeholder = keying_merged_rows(df.iloc[[0]].assign(title="Not applicable", category="Not applicable", is_nominated=False))
+
+    assert stats["deleted"] == 3 and stats["restored"] == 1
+    assert rows[["track_id", "title", "category", "is_nominated"]].values.tolist() == [
+        ["t1", "Not applicable", "Not applicable", False],
+        ["t2", "Not applicable", "Not applicable", False]
+    ]
+    # The same id as the row of a full merge
+    assert rows["id"].iloc[0] == placeholder["id"].iloc[0]
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from benchmark.generators import generating_spotify_data, generating_grammys_data
+from transform.spotify_transform import transforming_spotify_data
+from transform.grammys_transform import transforming_grammys_data
+from transform.merge import merging_datasets, partitioned_merge
+
+## ----- Tests ----- ##
+
+def test_partitioned_merge_matches_the_single_merge():
+    spotify_df = transforming_spotify_data(generating_spotify_data(20000, seed=2))
+    grammys_df = transforming_grammys_data(generating_grammys_data(4000, seed=2, title_numbers=2000))
+
+    # An index that is not a RangeIndex, as the rows kept by a transform have
+    spotify_df.index = spotify_df.index * 3 + 5
+
+    expected = merging_datasets(spotify_df.copy(), grammys_df.copy(), partitions=1)
+    result = merging_datasets(spotify_df.copy(), grammys_df.copy(), partitions=3)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_partitioned_merge_fills_the_unmatched_rows_as_the_merge_does():
+    left = pd.DataFrame({"key": ["a", "b", None, "c", "a"], "value": [1, 2, 3, 4, 5]}, index=[9, 8, 7, 6, 5])
+    right = pd.DataFrame({
+        "nominee": ["a", "a", None, "z"],
+        "value": [1, 2, 3, 4],
+        "winner": [True, False, True, True],
+        "category": pd.Categorical(["u", "v", "u", "v"])
+    })
+
+    expected = left.merge(right, how="left", left_on="key", right_on="nominee", suffixes=("", "_right"))
+    result = partitioned_merge(left, right, "key", "nominee", suffixes=("", "_right"), partitions=2)
+
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from benchmark.generators import generating_spotify_data, generating_grammys_data
+from transform.spotify_transform import transforming_spotify_data
+from transform.grammys_transform import transforming_grammys_data
+from transform.merge import merging_datasets
+from transform.out_of_core import transforming_spotify_out_of_core, transforming_grammys_out_of_core, merging_datasets_out_of_core
+
+## ----- Fixtures ----- ##
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    """
+    Parquet files of generated Spotify and Grammys data, with popularity ties among the duplicated tracks
+    and nominees sharing the titles of the tracks.
+
+    """
+    directory = tmp_path_factory.mktemp("sources")
+    paths = {"spotify": str(directory / "spotify.parquet"), "grammys": str(directory / "grammys.parquet")}
+
+    generating_spotify_data(20000, seed=1).to_parquet(paths["spotify"])
+    generating_grammys_data(4000, seed=1, title_numbers=2000).to_parquet(paths["grammys"])
+
+    return paths
+
+@pytest.fixture(scope="module")
+def results(sources, tmp_path_factory):
+    """
+    The clean and merged data of both backends, keyed on the stage.
+
+    """
+    directory = tmp_path_factory.mktemp("out_of_core")
+    paths = {name: str(directory / f"{name}.parquet") for name in ["spotify", "grammys", "merged"]}
+
+    transforming_spotify_out_of_core(sources["spotify"], paths["spotify"])
+    transforming_grammys_out_of_core(sources["grammys"], paths["grammys"])
+    merging_datasets_out_of_core(paths["spotify"], paths["grammys"], paths["merged"], slice_rows=5000)
+
+    spotify_df = transforming_spotify_data(pd.read_parquet(sources["spotify"]))
+    grammys_df = transforming_grammys_data(pd.read_parquet(sources["grammys"]))
+
+    return {
+        "spotify": (spotify_df, pd.read_parquet(paths["spotify"])),
+        "grammys": (grammys_df, pd.read_parquet(paths["grammys"])),
+        "merged": (merging_datasets(spotify_df.copy(), grammys_df.copy()), pd.read_parquet(paths["merged"]))
+    }
+
+def comparable(df):
+    """
+    Returns the values of the DataFrame as objects, so the categories of the pandas path compare with the strings of DuckDB.
+
+    """
+    return df.astype(object).where(df.notna(), None).reset_index(drop=True)
+
+## ----- Tests ----- ##
+
+@pytest.mark.parametrize("stage", ["spotify", "grammys", "merged"])
+def test_duckdb_backend_matches_pandas(results, stage):
+    expected, result = results[stage]
+
+    pd.testing.assert_frame_equal(comparable(result), comparable(expected))
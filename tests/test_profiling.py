@@ -0,0 +1,35 @@
+import json
+import time
+import logging
+
+import numpy as np
+
+from monitoring.profiling import profiling, rss_sample_seconds
+
+## ----- Tests ----- ##
+
+def test_profiling_reports_the_peak_of_the_stage(caplog):
+    # A large earlier allocation raises the peak of the process, not the one of the stage
+    np.ones(200 * 1024 ** 2 // 8).sum()
+
+    with caplog.at_level(logging.INFO, logger="pipeline.metrics"):
+        with profiling("small") as metrics:
+            np.ones(20 * 1024 ** 2 // 8).sum()
+
+    logged = json.loads(caplog.records[-1].getMessage())
+
+    assert logged["stage"] == "small"
+    assert metrics["peak_rss_delta_bytes"] < 100 * 1024 ** 2
+    assert metrics["process_peak_rss_bytes"] - metrics["rss_before_bytes"] > 150 * 1024 ** 2
+    assert metrics["peak_rss_bytes"] == metrics["rss_before_bytes"] + metrics["peak_rss_delta_bytes"]
+
+def test_profiling_samples_the_peak_while_the_stage_runs():
+    with profiling("large") as metrics:
+        block = np.ones(100 * 1024 ** 2 // 8)
+        block.sum()
+        time.sleep(10 * rss_sample_seconds)
+        del block
+
+    # The block is freed before the stage ends, so only the sampler sees it
+    assert metrics["peak_rss_delta_bytes"] > 50 * 1024 ** 2
+    assert metrics["rss_after_bytes"] < metrics["peak_rss_bytes"]
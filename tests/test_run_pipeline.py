@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import run_pipeline
+
+## ----- Fixtures ----- ##
+
+class FailingSink:
+    """
+    Sink whose load logs its error and returns no result, as loading_merged_data does.
+
+    """
+
+    def write(self, df):
+        return None
+
+class CountingSink:
+    """
+    Sink that keeps the frames written to it.
+
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def write(self, df):
+        self.frames.append(df)
+        return {"inserted": df.shape[0]}
+
+@pytest.fixture
+def branches(monkeypatch):
+    """
+    Runs the merge of the runner on two small clean frames instead of the extract and transform branches.
+
+    """
+    spotify_df = pd.DataFrame({
+        "track_id": ["t1", "t2"], "artists": ["Adele", "Kim"], "album_name": ["A", "B"], "track_name": ["Hello", "Other"],
+        "popularity": [80, 20], "explicit": [False, True], "danceability": [0.5, 0.25], "energy": [0.5, 0.75],
+        "track_genre": ["Pop", "Pop"], "duration_min": [4, 3], "track_mood": ["Sad", "Happy"]
+    })
+    grammys_df = pd.DataFrame({
+        "year": [2016], "title": ["59th Annual GRAMMY Awards (2016)"], "category": ["Song Of The Year"],
+        "nominee": ["Hello"], "artist": ["Adele"], "is_nominated": [True]
+    })
+
+    # The branches are patched in this process, so they run in threads instead of worker processes
+    monkeypatch.setattr(run_pipeline, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(run_pipeline, "running_spotify_branch", lambda path, chunksize=None: (spotify_df, {}))
+    monkeypatch.setattr(run_pipeline, "running_grammys_branch", lambda: (grammys_df, {}))
+
+## ----- Tests ----- ##
+
+def test_runner_compacts_and_loads_incrementally(branches, monkeypatch):
+    created = {}
+    sink = CountingSink()
+
+    def getting_sink(name, **options):
+        created[name] = options
+        return sink
+
+    monkeypatch.setattr(run_pipeline, "get_sink", getting_sink)
+
+    df, _ = run_pipeline.running_pipeline("spotify.csv", store=False)
+
+    assert created["database"]["mode"] == "incremental"
+    assert sink.frames[0]["popularity"].dtype == "int8"
+    assert df["category"].tolist() == ["Song Of The Year", "Not applicable"]
+
+def test_runner_exits_non_zero_when_a_sink_fails(branches, monkeypatch):
+    monkeypatch.setattr(run_pipeline, "get_sink", lambda name, **options: FailingSink())
+    monkeypatch.setattr("sys.argv", ["run_pipeline.py", "--skip-store"])
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_pipeline.main()
+
+    assert exit_info.value.code == 1
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+import transform.spotify_transform as spotify_transform
+from benchmark.generators import generating_spotify_data
+from extract.spotify_extract import streaming_spotify_data, spotify_dtypes
+
+## ----- Fixtures ----- ##
+
+@pytest.fixture(scope="module")
+def spotify_path(tmp_path_factory):
+    """
+    CSV file of generated Spotify data, where about a third of the rows repeat an earlier track_id.
+
+    """
+    path = str(tmp_path_factory.mktemp("spotify") / "spotify_dataset.csv")
+    generating_spotify_data(20000, seed=3).to_csv(path, index=False)
+    return path
+
+## ----- Tests ----- ##
+
+def test_streamed_transform_matches_the_whole_file(spotify_path):
+    expected = spotify_transform.transforming_spotify_data(pd.read_csv(spotify_path, usecols=list(spotify_dtypes), dtype=spotify_dtypes))
+    result = spotify_transform.transforming_spotify_chunks(streaming_spotify_data(spotify_path, 3000))
+
+    pd.testing.assert_frame_equal(result.astype({"track_genre": object}), expected.astype({"track_genre": object}))
+
+def test_streamed_chunks_keep_every_track_once(spotify_path, monkeypatch):
+    reduced = []
+    transforming = spotify_transform.transforming_spotify_data
+    monkeypatch.setattr(spotify_transform, "transforming_spotify_data", lambda df: reduced.append(df) or transforming(df))
+
+    spotify_transform.transforming_spotify_chunks(streaming_spotify_data(spotify_path, 3000))
+
+    # The rows kept from the chunks grow with the distinct tracks, not with the file
+    assert reduced[0]["track_id"].is_unique
+
+def test_dedup_keeps_distinct_tracks_with_colliding_hashes(spotify_path, monkeypatch):
+    df = pd.read_csv(spotify_path, usecols=list(spotify_dtypes), dtype=spotify_dtypes, nrows=50)
+    expected = spotify_transform.transforming_spotify_data(df.copy())
+
+    # Every row hashes to the same value, only a comparison of the values tells the tracks apart
+    monkeypatch.setattr(pd.util, "hash_pandas_object", lambda obj, index=True: pd.Series(0, index=obj.index, dtype="uint64"))
+
+    pd.testing.assert_frame_equal(spotify_transform.transforming_spotify_data(df.copy()), expected)
@@ -0,0 +1,188 @@
+import gzip
+import io
+import threading
+
+import pandas as pd
+import pytest
+
+import load_and_store.store as store
+from fake_drive import FakeDrive
+
+## ----- Fixtures ----- ##
+
+@pytest.fixture
+def drive(monkeypatch):
+    """
+    Fake Drive service, with the uploads going to the "folder" folder in chunks of 256 KB.
+
+    """
+    monkeypatch.setattr(store, "folder_id", "folder")
+    monkeypatch.setattr(store, "upload_chunksize", 256 * 1024)
+
+    return FakeDrive()
+
+def reading_csv(data):
+    return pd.read_csv(io.BytesIO(gzip.decompress(data)))
+
+merged = pd.DataFrame({"id": [0, 1], "track_id": ["t1", "t2"], "popularity": [73, 55]})
+
+# Merged rows of three tracks, t2 and t3 without a nomination
+nominations = pd.DataFrame({
+    "id": [0, 1, 2, 3],
+    "track_id": ["t1", "t2", "t1", "t3"],
+    "title": ["62nd Annual GRAMMY Awards (2019)", "Not applicable", "63rd Annual GRAMMY Awards (2020)", "Not applicable"],
+    "category": ["Song Of The Year", "Not applicable", "Record Of The Year", "Not applicable"],
+    "is_nominated": [True, False, True, False]
+})
+
+## ----- Tests ----- ##
+
+def test_storing_inserts_a_new_file(drive):
+    response = store.storing_merged_data("merged_data", merged, service=drive)
+
+    assert (drive.inserts, drive.updates) == (1, 0)
+    assert response["title"] == "merged_data.csv.gz"
+    pd.testing.assert_frame_equal(reading_csv(drive.content("merged_data.csv.gz")), merged)
+
+def test_storing_skips_an_unchanged_file(drive):
+    first = store.storing_merged_data("merged_data", merged, service=drive)
+    second = store.storing_merged_data("merged_data", merged.copy(), service=drive)
+
+    assert (drive.inserts, drive.updates) == (1, 0)
+    assert second == {"id": first["id"], "md5Checksum": first["md5Checksum"]}
+
+def test_storing_updates_a_changed_file(drive):
+    first = store.storing_merged_data("merged_data", merged, service=drive)
+    changed = merged.assign(popularity=[74, 55])
+    second = store.storing_merged_data("merged_data", changed, service=drive)
+
+    assert (drive.inserts, drive.updates) == (1, 1)
+    assert second["id"] == first["id"] and second["md5Checksum"] != first["md5Checksum"]
+    pd.testing.assert_frame_equal(reading_csv(drive.content("merged_data.csv.gz")), changed)
+
+def test_storing_an_empty_frame(drive):
+    store.storing_merged_data("merged_data", merged.iloc[0:0], service=drive)
+    store.storing_merged_data("merged_data", merged.iloc[0:0], fmt="parquet", service=drive)
+
+    # The files keep the header and the schema of the columns
+    assert list(reading_csv(drive.content("merged_data.csv.gz")).columns) == list(merged.columns)
+    assert pd.read_parquet(io.BytesIO(drive.content("merged_data.parquet"))).columns.tolist() == list(merged.columns)
+
+def test_storing_uploads_in_chunks(drive):
+    large = pd.DataFrame({"track_id": [f"track {number} {number ** 3}" for number in range(100000)]})
+
+    store.storing_merged_data("merged_data", large, service=drive, chunksize=10000)
+
+    assert drive.chunks > 1
+    pd.testing.assert_frame_equal(reading_csv(drive.content("merged_data.csv.gz")), large)
+
+def test_storing_datasets_gives_every_thread_its_own_connection(drive, monkeypatch):
+    class FakeAuth:
+        service = None
+
+        def Get_Http_Object(self):
+            return object()
+
+    monkeypatch.setattr(store, "getting_drive_auth", lambda: FakeAuth())
+    monkeypatch.setattr(store, "thread_connections", threading.local())
+
+    frames = {f"merged_data_{number}": merged.assign(popularity=number) for number in range(8)}
+    store.storing_datasets(frames, service=drive, max_workers=4)
+
+    threads_by_connection = {}
+    for thread, http in drive.connections:
+        threads_by_connection.setdefault(id(http), set()).add(thread)
+
+    assert all(http is not None for _, http in drive.connections)
+    assert all(len(threads) == 1 for threads in threads_by_connection.values())
+
+def test_token_expiring_compares_naive_utc_times():
+    from datetime import datetime, timedelta, timezone
+
+    class FakeCredentials:
+        access_token = "token"
+        token_expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+    class FakeAuth:
+        credentials = FakeCredentials()
+
+    assert not store.token_expiring(FakeAuth())
+
+    FakeCredentials.token_expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=1)
+
+    assert store.token_expiring(FakeAuth())
+
+def test_drive_sink_applies_the_delta_to_the_merged_file(drive, monkeypatch):
+    from load_and_store.sinks import get_sink
+
+    monkeypatch.setattr(store, "getting_drive_service", lambda: (drive, None))
+
+    sink = get_sink("drive")
+    sink.write(nominations)
+
+    # The 2020 event was updated: t1 lost its nomination and t3 got one, in place of its "Not applicable" row
+    sink.write_delta(nominations.iloc[[2]].assign(track_id="t3"), "scheduled__2024-08-14T00:00:00+00:00",
+                     events=["63rd Annual GRAMMY Awards (2020)"])
+
+    stored = reading_csv(drive.content("merged_data.csv.gz"))
+
+    assert [file["title"] for file in drive.files_by_id.values()] == ["merged_data.csv.gz"]
+    assert (drive.inserts, drive.updates) == (1, 1)
+    assert stored[["track_id", "title", "category"]].values.tolist() == [
+        ["t1", "62nd Annual GRAMMY Awards (2019)", "Song Of The Year"],
+        ["t2", "Not applicable", "Not applicable"],
+        ["t3", "63rd Annual GRAMMY Awards (2020)", "Record Of The Year"]
+    ]
+    assert stored["id"].tolist() == [0, 1, 2]
+
+def test_drive_sink_restores_the_tracks_left_without_a_nomination(drive, monkeypatch):
+    from load_and_store.sinks import get_sink
+
+    monkeypatch.setattr(store, "getting_drive_service", lambda: (drive, None))
+
+    sink = get_sink("drive")
+    sink.write(nominations)
+    sink.write_delta(nominations.iloc[0:0], "scheduled__2024-08-14T00:00:00+00:00",
+                     events=["62nd Annual GRAMMY Awards (2019)", "63rd Annual GRAMMY Awards (2020)"])
+
+    stored = reading_csv(drive.content("merged_data.csv.gz"))
+
+    assert stored[["track_id", "title", "category", "is_nominated"]].values.tolist() == [
+        ["t2", "Not applicable", "Not applicable", False],
+        ["t3", "Not applicable", "Not applicable", False],
+        ["t1", "Not applicable", "Not applicable", False]
+    ]
+
+def test_drive_sink_applies_and_prunes_the_delta_files_of_earlier_runs(drive, monkeypatch):
+    from load_and_store.sinks import get_sink
+
+    monkeypatch.setattr(store, "getting_drive_service", lambda: (drive, None))
+
+    sink = get_sink("drive")
+    sink.write(nominations)
+
+    # Delta file uploaded by an earlier release, never applied to the merged file
+    store.storing_merged_data("merged_data_delta_scheduled__2024-08-13T00_00_00_00_00",
+                              nominations.iloc[[1]].assign(title="64th Annual GRAMMY Awards (2021)", category="Song Of The Year", is_nominated=True),
+                              service=drive)
+
+    sink.write_delta(nominations.iloc[0:0], "scheduled__2024-08-14T00:00:00+00:00", events=[])
+
+    stored = reading_csv(drive.content("merged_data.csv.gz"))
+
+    assert [file["title"] for file in drive.files_by_id.values()] == ["merged_data.csv.gz"]
+    assert drive.deletes == 1
+    assert stored[["track_id", "title"]].values.tolist() == [
+        ["t1", "62nd Annual GRAMMY Awards (2019)"],
+        ["t1", "63rd Annual GRAMMY Awards (2020)"],
+        ["t3", "Not applicable"],
+        ["t2", "64th Annual GRAMMY Awards (2021)"]
+    ]
+
+def test_drive_sink_needs_the_merged_file_for_a_delta(drive, monkeypatch):
+    from load_and_store.sinks import get_sink
+
+    monkeypatch.setattr(store, "getting_drive_service", lambda: (drive, None))
+
+    with pytest.raises(ValueError, match="run a full load first"):
+        get_sink("drive").write_delta(nominations, "scheduled__2024-08-14T00:00:00+00:00")